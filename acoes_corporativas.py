@@ -0,0 +1,143 @@
+"""Índice local de ações corporativas (dividendos e desdobramentos) em SQLite.
+
+Eventos mudam poucas vezes por ano, então cada símbolo é consultado no provedor no máximo a
+cada INTERVALO_ATUALIZACAO; no resto do tempo a exibição lê só do banco. Uma consulta que
+traz um evento ainda não indexado indica que o histórico ajustado (`auto_adjust=True`)
+mudou: `atualizar` devolve esses símbolos para o histórico de preços deles ser reajustado.
+"""
+import sqlite3
+
+import pandas as pd
+
+from armazenamento import CAMINHO_PADRAO, INICIO_HISTORICO
+from dados import eh_rate_limit, executar_em_paralelo, provedor_padrao
+
+# Intervalo mínimo entre duas consultas ao provedor para o mesmo símbolo
+INTERVALO_ATUALIZACAO = pd.Timedelta(days=7)
+COLUNAS_ACOES = ['Dividends', 'Stock Splits']
+
+
+def _conectar(caminho):
+    conn = sqlite3.connect(caminho or CAMINHO_PADRAO, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS acoes_corporativas (
+            simbolo TEXT NOT NULL,
+            data TEXT NOT NULL,
+            dividendos REAL,
+            desdobramento REAL,
+            PRIMARY KEY (simbolo, data)
+        ) WITHOUT ROWID"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS acoes_corporativas_consultas (
+            simbolo TEXT PRIMARY KEY,
+            consultado_em TEXT NOT NULL
+        )"""
+    )
+    return conn
+
+
+def _consultar(simbolo, provedor):
+    """Ações corporativas de um símbolo no provedor: (DataFrame, possivelmente vazio, ou None se falhou; rate_limit)."""
+    try:
+        acoes = provedor.Ticker(simbolo).actions
+    except Exception as e:
+        return None, eh_rate_limit(e)
+    if acoes is None or acoes.empty:
+        return pd.DataFrame(columns=COLUNAS_ACOES), False
+    return acoes, False
+
+
+def _linhas(simbolo, acoes):
+    """Converte o DataFrame do provedor em linhas (símbolo, data, dividendos, desdobramento)."""
+    acoes = acoes.reindex(columns=COLUNAS_ACOES).fillna(0.0)
+    indice = acoes.index.tz_localize(None) if getattr(acoes.index, 'tz', None) is not None else acoes.index
+    datas = pd.DatetimeIndex(indice).strftime('%Y-%m-%d')
+    return [
+        (simbolo, data, float(dividendos), float(desdobramento))
+        for data, (dividendos, desdobramento) in zip(datas, acoes.to_numpy(dtype=float))
+        if dividendos or desdobramento
+    ]
+
+
+class IndiceAcoesCorporativas:
+    """Eventos por símbolo gravados localmente e atualizados com intervalo longo."""
+
+    def __init__(self, caminho=None, provedor=None, intervalo=INTERVALO_ATUALIZACAO):
+        self.caminho = caminho or CAMINHO_PADRAO
+        self.provedor = provedor
+        self.intervalo = intervalo
+        with _conectar(self.caminho) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    def pendentes(self, simbolos, agora=None):
+        """Símbolos nunca consultados ou consultados há mais de `intervalo`."""
+        agora = pd.Timestamp.now(tz='UTC') if agora is None else pd.Timestamp(agora)
+        limite = (agora - self.intervalo).isoformat()
+        simbolos = list(dict.fromkeys(simbolos))
+        with _conectar(self.caminho) as conn:
+            recentes = {
+                s for (s,) in conn.execute(
+                    f"SELECT simbolo FROM acoes_corporativas_consultas WHERE consultado_em >= ? "
+                    f"AND simbolo IN ({','.join('?' * len(simbolos))})",
+                    (limite, *simbolos),
+                )
+            } if simbolos else set()
+        return [s for s in simbolos if s not in recentes]
+
+    def eventos(self, simbolos):
+        """{símbolo: DataFrame de 'Dividends'/'Stock Splits' desde 2016, ou None se não houver eventos}."""
+        simbolos = list(dict.fromkeys(simbolos))
+        resultado = dict.fromkeys(simbolos)
+        if not simbolos:
+            return resultado
+        with _conectar(self.caminho) as conn:
+            linhas = conn.execute(
+                f"SELECT simbolo, data, dividendos, desdobramento FROM acoes_corporativas "
+                f"WHERE data >= ? AND simbolo IN ({','.join('?' * len(simbolos))}) ORDER BY simbolo, data",
+                (INICIO_HISTORICO, *simbolos),
+            ).fetchall()
+        if linhas:
+            tabela = pd.DataFrame(linhas, columns=['Símbolo', 'Date', *COLUNAS_ACOES])
+            tabela['Date'] = pd.to_datetime(tabela['Date'])
+            for simbolo, grupo in tabela.groupby('Símbolo', sort=False):
+                resultado[simbolo] = grupo.set_index('Date')[COLUNAS_ACOES]
+        return resultado
+
+    def atualizar(self, simbolos, agora=None):
+        """Consulta os símbolos pendentes e grava os eventos; devolve (com eventos novos, com rate limit).
+
+        Na primeira consulta de um símbolo os eventos só formam a base do índice (o histórico
+        gravado até ali já veio ajustado por eles). Falhas não marcam o símbolo como
+        consultado, para ele ser tentado de novo na próxima vez.
+        """
+        agora = pd.Timestamp.now(tz='UTC') if agora is None else pd.Timestamp(agora)
+        pendentes = self.pendentes(simbolos, agora)
+        if not pendentes:
+            return [], []
+        provedor = self.provedor or provedor_padrao()
+        consultas = executar_em_paralelo({s: (_consultar, s, provedor) for s in pendentes})
+
+        novos, limitados = [], []
+        with _conectar(self.caminho) as conn:
+            for simbolo, (acoes, limitado) in consultas.items():
+                if acoes is None:
+                    if limitado:
+                        limitados.append(simbolo)
+                    continue
+                ja_consultado = conn.execute(
+                    "SELECT 1 FROM acoes_corporativas_consultas WHERE simbolo = ?", (simbolo,)
+                ).fetchone() is not None
+                gravados = {
+                    data: desdobramento for data, desdobramento in conn.execute(
+                        "SELECT data, desdobramento FROM acoes_corporativas WHERE simbolo = ?", (simbolo,)
+                    )
+                }
+                linhas = _linhas(simbolo, acoes)
+                # Evento novo: data ainda não indexada ou desdobramento diferente do gravado
+                if ja_consultado and any(data not in gravados or gravados[data] != desdobramento
+                                         for _, data, _, desdobramento in linhas):
+                    novos.append(simbolo)
+                conn.executemany("INSERT OR REPLACE INTO acoes_corporativas VALUES (?, ?, ?, ?)", linhas)
+                conn.execute("INSERT OR REPLACE INTO acoes_corporativas_consultas VALUES (?, ?)", (simbolo, agora.isoformat()))
+        return novos, limitados
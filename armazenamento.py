@@ -0,0 +1,169 @@
+"""Armazenamento local incremental de barras OHLCV diárias em SQLite."""
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from dados import baixar_lote
+
+# O dashboard nunca mostra dados anteriores a 2016 ("Desde 2016")
+INICIO_HISTORICO = '2016-01-01'
+CAMINHO_PADRAO = os.environ.get(
+    'ARBITRAGEM_BANCO', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mercado.sqlite')
+)
+# Diferença relativa no fechamento sobreposto que indica reajuste (split/dividendo)
+TOLERANCIA_AJUSTE = 1e-4
+
+COLUNAS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Deslocamentos equivalentes aos períodos aceitos pelo yfinance
+DESLOCAMENTOS_PERIODO = {
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+}
+
+
+def inicio_periodo(periodo, hoje=None):
+    """Converte um período do yfinance ('1mo', '1y', 'max'...) na data inicial correspondente."""
+    if periodo == 'max':
+        return pd.Timestamp(INICIO_HISTORICO)
+    hoje = pd.Timestamp.today().normalize() if hoje is None else pd.Timestamp(hoje)
+    return hoje - DESLOCAMENTOS_PERIODO[periodo]
+
+
+class ArmazemOHLCV:
+    """Banco local de barras diárias por símbolo que só baixa os dias que faltam.
+
+    A cada atualização, rebaixa a partir da penúltima barra gravada (a última pode ser um
+    pregão ainda em andamento). Se o fechamento dessa barra mudou, o provedor reajustou o
+    histórico (`auto_adjust=True`) e o símbolo é baixado novamente desde 2016.
+    """
+
+    def __init__(self, caminho=None, provedor=None):
+        self.caminho = caminho or CAMINHO_PADRAO
+        self.provedor = provedor
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS barras (
+                    simbolo TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (simbolo, data)
+                ) WITHOUT ROWID"""
+            )
+
+    def _conectar(self):
+        # Uma conexão por operação: as sessões do Streamlit rodam em threads diferentes
+        return sqlite3.connect(self.caminho, timeout=30)
+
+    def datas_referencia(self, simbolos):
+        """Devolve {símbolo: data a partir da qual a atualização incremental deve baixar}."""
+        referencias = {}
+        with self._conectar() as conn:
+            for simbolo in simbolos:
+                datas = conn.execute(
+                    "SELECT data FROM barras WHERE simbolo = ? ORDER BY data DESC LIMIT 2", (simbolo,)
+                ).fetchall()
+                if datas:
+                    referencias[simbolo] = datas[-1][0]
+        return referencias
+
+    def gravar(self, simbolo, dados, substituir=False):
+        """Grava (ou sobrescreve, por data) as barras de um símbolo."""
+        dados = dados.loc[INICIO_HISTORICO:]
+        indice = dados.index.tz_localize(None) if dados.index.tz is not None else dados.index
+        linhas = zip(
+            [simbolo] * len(dados),
+            indice.strftime('%Y-%m-%d'),
+            *(dados[col].astype(float).where(dados[col].notna(), None) for col in COLUNAS),
+        )
+        with self._conectar() as conn:
+            if substituir:
+                conn.execute("DELETE FROM barras WHERE simbolo = ?", (simbolo,))
+            conn.executemany("INSERT OR REPLACE INTO barras VALUES (?, ?, ?, ?, ?, ?, ?)", linhas)
+
+    def ler(self, simbolo, inicio=None):
+        """Lê as barras gravadas de um símbolo (opcionalmente a partir de `inicio`)."""
+        inicio = pd.Timestamp(inicio or INICIO_HISTORICO).strftime('%Y-%m-%d')
+        with self._conectar() as conn:
+            linhas = conn.execute(
+                "SELECT data, open, high, low, close, volume FROM barras "
+                "WHERE simbolo = ? AND data >= ? ORDER BY data",
+                (simbolo, inicio),
+            ).fetchall()
+        if not linhas:
+            return None
+        datas, *valores = zip(*linhas)
+        dados = pd.DataFrame(
+            {col: np.asarray(v, dtype=float) for col, v in zip(COLUNAS, valores)},
+            index=pd.DatetimeIndex(datas, name='Date'),
+        )
+        return dados
+
+    def ultima_barra(self, simbolo):
+        """Devolve (data, fechamento) da barra mais recente gravada, ou None."""
+        with self._conectar() as conn:
+            linha = conn.execute(
+                "SELECT data, close FROM barras WHERE simbolo = ? ORDER BY data DESC LIMIT 1", (simbolo,)
+            ).fetchone()
+        if linha is None or linha[1] is None:
+            return None
+        return pd.Timestamp(linha[0]), float(linha[1])
+
+    def _ajuste_detectado(self, simbolo, referencia, novos):
+        """Compara o fechamento gravado na data de referência com o recém-baixado."""
+        gravado = self.ler(simbolo, inicio=referencia)
+        if gravado is None or novos is None:
+            return False
+        data = pd.Timestamp(referencia)
+        indice = novos.index.tz_localize(None) if novos.index.tz is not None else novos.index
+        posicao = indice.get_indexer([data])[0]
+        if posicao < 0 or data not in gravado.index:
+            return False
+        antigo = gravado.at[data, 'Close']
+        novo = float(novos['Close'].iloc[posicao])
+        return abs(novo - antigo) > TOLERANCIA_AJUSTE * abs(antigo)
+
+    def atualizar(self, simbolos):
+        """Baixa só os dias faltantes de cada símbolo, agrupando os downloads por data inicial.
+
+        Os símbolos já processados ficam gravados mesmo se um download posterior levantar
+        `LimiteRequisicoes`.
+        """
+        simbolos = list(dict.fromkeys(simbolos))
+        referencias = self.datas_referencia(simbolos)
+        completos = [s for s in simbolos if s not in referencias]
+
+        grupos = {}
+        for simbolo, referencia in referencias.items():
+            grupos.setdefault(referencia, []).append(simbolo)
+        for referencia, grupo in grupos.items():
+            frames = baixar_lote(grupo, inicio=referencia, provedor=self.provedor)
+            for simbolo, novos in frames.items():
+                if novos is None:
+                    continue
+                if self._ajuste_detectado(simbolo, referencia, novos):
+                    completos.append(simbolo)
+                else:
+                    self.gravar(simbolo, novos)
+
+        if completos:
+            self.reajustar(completos)
+
+    def reajustar(self, simbolos):
+        """Baixa de novo desde 2016 e substitui o histórico dos símbolos (ex.: após um desdobramento)."""
+        frames = baixar_lote(simbolos, inicio=INICIO_HISTORICO, provedor=self.provedor)
+        for simbolo, dados in frames.items():
+            if dados is not None:
+                self.gravar(simbolo, dados, substituir=True)
+
+    def series(self, simbolos, periodo='1y'):
+        """Devolve {símbolo: DataFrame ou None} lido do banco local para o período pedido."""
+        inicio = inicio_periodo(periodo)
+        return {simbolo: self.ler(simbolo, inicio=inicio) for simbolo in dict.fromkeys(simbolos)}
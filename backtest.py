@@ -0,0 +1,288 @@
+"""Backtest vetorizado da regra de z-score do ratio e varredura paralela de parâmetros.
+
+A regra é a mesma do dashboard: com z acima de +limite vende a ação 1 e compra a ação 2,
+abaixo de -limite faz o inverso. A posição é encerrada quando o z volta para dentro da
+banda de saída (0 = cruzamento da média). Posições são sempre montadas com o mesmo
+financeiro nas duas pontas e executadas na barra seguinte ao sinal.
+
+O walk-forward divide o histórico em dobras móveis de treino/teste: os parâmetros são
+escolhidos no treino de cada dobra e avaliados só no teste seguinte (fora da amostra).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from intradiario import DIAS_UTEIS_ANO
+from motor_zscore import JANELA_MOVEL, calcular_zscore
+
+# Tamanho padrão das dobras do walk-forward, em barras
+BARRAS_TREINO = 252
+BARRAS_TESTE = 63
+
+
+def _preencher_adiante(valores):
+    """Forward-fill de um array (T, K) com NaNs ao longo do eixo 0, sem laço em Python."""
+    validos = ~np.isnan(valores)
+    indices = np.where(validos, np.arange(valores.shape[0])[:, None], 0)
+    np.maximum.accumulate(indices, axis=0, out=indices)
+    preenchido = np.take_along_axis(valores, indices, axis=0)
+    # Antes do primeiro evento não há posição
+    preenchido[~np.maximum.accumulate(validos, axis=0)] = 0.0
+    return preenchido
+
+
+def posicoes(z, limites, saidas):
+    """Posição no ratio (+1 comprado, -1 vendido, 0 zerado) para cada combinação.
+
+    `z` tem forma (T,) e `limites`/`saidas` forma (K,); devolve um array (T, K) com a
+    posição decidida no fechamento de cada barra.
+    """
+    z = np.asarray(z, dtype=np.float64)[:, None]
+    limites = np.asarray(limites, dtype=np.float64)[None, :]
+    saidas = np.asarray(saidas, dtype=np.float64)[None, :]
+    eventos = np.full((z.shape[0], limites.shape[1]), np.nan)
+
+    # Saída: z dentro da banda ou atravessou a média de uma barra para outra
+    z_anterior = np.vstack([np.full((1, 1), np.nan), z[:-1]])
+    cruzou_media = np.sign(z) * np.sign(z_anterior) < 0
+    eventos[(np.abs(z) <= saidas) | cruzou_media] = 0.0
+    # Entradas têm prioridade (permite virar a mão de +limite para -limite direto)
+    eventos[np.broadcast_to(z > limites, eventos.shape)] = -1.0
+    eventos[np.broadcast_to(z < -limites, eventos.shape)] = 1.0
+    # Sem z definido (aquecimento da janela) não se abre nem mantém posição
+    eventos[np.broadcast_to(np.isnan(z), eventos.shape)] = 0.0
+    return _preencher_adiante(eventos)
+
+
+def custos_relativos(taxa_aluguel_aa=5.0, corretagem=10.0, taxas_b3=5.0, capital=100_000.0):
+    """Converte os custos do simulador em frações do financeiro por ponta.
+
+    Corretagem e taxas B3 são valores totais de entrada+saída, como no simulador; metade
+    é cobrada a cada mudança unitária de posição.
+    """
+    return {
+        'aluguel_diario': (taxa_aluguel_aa / 100.0) / 365.0,
+        'custo_por_troca': (corretagem + taxas_b3) / 2.0 / capital,
+    }
+
+
+def simular(precos1, precos2, z, limites, saidas, aluguel_diario=0.0, custo_por_troca=0.0):
+    """Resultado líquido por barra (T, K), em fração do financeiro de cada ponta.
+
+    `precos1`, `precos2` e `z` são Series alinhadas no mesmo índice de datas.
+    Devolve também a posição efetivamente carregada em cada barra.
+    """
+    p1 = precos1.to_numpy(dtype=np.float64)
+    p2 = precos2.to_numpy(dtype=np.float64)
+    pos = posicoes(z.to_numpy(dtype=np.float64), limites, saidas)
+    # Executa na barra seguinte ao sinal (sem usar o fechamento que gerou o sinal)
+    zeros = np.zeros((1, pos.shape[1]))
+    pos_exec = np.vstack([zeros, pos[:-1]])
+
+    retorno1 = np.concatenate([[0.0], p1[1:] / p1[:-1] - 1.0])
+    retorno2 = np.concatenate([[0.0], p2[1:] / p2[:-1] - 1.0])
+    bruto = pos_exec * (retorno1 - retorno2)[:, None]
+
+    # Aluguel da ponta vendida por dia corrido entre as barras
+    dias_corridos = np.concatenate([[0.0], np.diff(precos1.index.values).astype('timedelta64[s]').astype(np.float64) / 86_400.0])
+    aluguel = np.abs(pos_exec) * aluguel_diario * dias_corridos[:, None]
+    # Corretagem e taxas a cada montagem/desmontagem (virar a mão conta duas vezes)
+    trocas = np.abs(np.diff(np.vstack([zeros, pos_exec]), axis=0))
+    return bruto - aluguel - trocas * custo_por_troca, pos_exec
+
+
+def metricas(resultado, pos_exec, barras_ano=DIAS_UTEIS_ANO):
+    """Métricas de desempenho por coluna de um resultado (T, K).
+
+    O Sharpe é anualizado por `barras_ano` (barras por ano na frequência dos preços).
+    """
+    acumulado = np.cumsum(resultado, axis=0)
+    pico = np.maximum.accumulate(np.maximum(acumulado, 0.0), axis=0)
+    media = resultado.mean(axis=0)
+    desvio = resultado.std(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe = np.where(desvio > 0, media / desvio * np.sqrt(barras_ano), np.nan)
+    entradas = ((pos_exec != 0) & (np.vstack([np.zeros((1, pos_exec.shape[1])), pos_exec[:-1]]) != pos_exec)).sum(axis=0)
+    return {
+        'Retorno Total (%)': acumulado[-1] * 100.0,
+        'Sharpe': sharpe,
+        'Drawdown Máx. (%)': (acumulado - pico).min(axis=0) * 100.0,
+        'Operações': entradas,
+        'Tempo Posicionado (%)': (pos_exec != 0).mean(axis=0) * 100.0,
+    }
+
+
+def _avaliar_janela(args):
+    """Avalia todas as combinações de limite x saída para uma janela (roda em subprocesso)."""
+    precos1, precos2, janela, limites, saidas, custos, barras_ano = args
+    ratio = precos1 / precos2
+    z = calcular_zscore(ratio, modo=JANELA_MOVEL, janela=janela)['Z-Score'].reindex(ratio.index)
+    grade_limites, grade_saidas = (np.ravel(g) for g in np.meshgrid(limites, saidas, indexing='ij'))
+    resultado, pos_exec = simular(precos1, precos2, z, grade_limites, grade_saidas, **custos)
+    tabela = pd.DataFrame(metricas(resultado, pos_exec, barras_ano))
+    tabela.insert(0, 'Saída (z)', grade_saidas)
+    tabela.insert(0, 'Limite (z)', grade_limites)
+    tabela.insert(0, 'Janela', janela)
+    return tabela
+
+
+def varrer_parametros(precos1, precos2, janelas, limites, saidas, custos=None, processos=None,
+                      barras_ano=DIAS_UTEIS_ANO):
+    """Backtest de todas as combinações janela x limite x saída, ordenado pelo Sharpe.
+
+    Cada janela é um job do pool de processos; dentro dele os limites e saídas são
+    avaliados juntos como colunas de um único array. `processos=1` roda no próprio processo.
+    """
+    custos = custos or custos_relativos()
+    precos1, precos2 = precos1.align(precos2, join='inner')
+    jobs = [(precos1, precos2, int(janela), list(limites), list(saidas), custos, barras_ano) for janela in janelas]
+    processos = processos or min(len(jobs), os.cpu_count() or 1)
+    if processos <= 1 or len(jobs) <= 1:
+        tabelas = [_avaliar_janela(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            tabelas = list(executor.map(_avaliar_janela, jobs))
+    resultado = pd.concat(tabelas, ignore_index=True)
+    # Descarta combinações inválidas (saída maior que o limite nunca zera após entrar)
+    resultado = resultado[resultado['Saída (z)'] < resultado['Limite (z)']]
+    return resultado.sort_values('Sharpe', ascending=False, na_position='last').reset_index(drop=True)
+
+
+def zscores_janelas(ratio, janelas):
+    """Z-score da janela móvel do ratio para várias janelas de uma vez: array (T, W).
+
+    Médias e desvios de todas as janelas saem das mesmas somas acumuladas de x e x²,
+    calculadas uma única vez; cada data só usa as barras até ela (igual a `calcular_zscore`
+    no modo janela móvel). As dobras do walk-forward recortam esse array em vez de recalcular.
+    Como em `calcular_zscore`, datas sem ratio ficam fora das janelas e têm z NaN, em vez de
+    contaminar as somas acumuladas de todas as datas seguintes.
+    """
+    x = ratio.to_numpy(dtype=np.float64)
+    validos = ~np.isnan(x)
+    janelas = np.asarray(janelas, dtype=np.intp)[None, :]
+    z = np.full((len(x), janelas.shape[1]), np.nan)
+    x = x[validos]
+    if not len(x):
+        return z
+    # Centraliza para evitar cancelamento numérico em E[x²] - E[x]²
+    x = x - x.mean()
+    soma = np.concatenate([[0.0], np.cumsum(x)])
+    quadrados = np.concatenate([[0.0], np.cumsum(x * x)])
+    fim = np.arange(1, len(x) + 1)[:, None]
+    inicio = fim - janelas
+    completas = inicio >= 0
+    inicio = np.maximum(inicio, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = (soma[fim] - soma[inicio]) / janelas
+        variancia = np.maximum((quadrados[fim] - quadrados[inicio]) / janelas - media * media, 0.0)
+        desvio = np.sqrt(variancia)
+        z_validos = (x[:, None] - media) / np.where(desvio > 0, desvio, np.nan)
+    z_validos[~completas] = np.nan
+    z[validos] = z_validos
+    return z
+
+
+def dobras_walk_forward(n_barras, treino=BARRAS_TREINO, teste=BARRAS_TESTE):
+    """Limites [(início do treino, início do teste, fim do teste), ...] das dobras móveis.
+
+    Cada dobra treina nas `treino` barras anteriores ao teste e os testes se sucedem sem
+    sobreposição; a última dobra pode ter um teste mais curto.
+    """
+    return [
+        (inicio_teste - treino, inicio_teste, min(inicio_teste + teste, n_barras))
+        for inicio_teste in range(treino, n_barras, teste)
+    ]
+
+
+def _otimizar_dobra(args):
+    """Escolhe janela, limite e saída pelo Sharpe no treino e avalia no teste (roda em subprocesso)."""
+    precos1, precos2, z, inicio_teste, janelas, grade_limites, grade_saidas, custos, barras_ano = args
+    melhor = None
+    for coluna, janela in enumerate(janelas):
+        z_treino = pd.Series(z[:inicio_teste, coluna], index=precos1.index[:inicio_teste])
+        resultado, pos_exec = simular(precos1.iloc[:inicio_teste], precos2.iloc[:inicio_teste], z_treino,
+                                      grade_limites, grade_saidas, **custos)
+        sharpe = metricas(resultado, pos_exec, barras_ano)['Sharpe']
+        sharpe = np.where(np.isnan(sharpe), -np.inf, sharpe)
+        k = int(np.argmax(sharpe))
+        if melhor is None or sharpe[k] > melhor[0]:
+            melhor = (sharpe[k], coluna, janela, grade_limites[k], grade_saidas[k])
+    _, coluna, janela, limite, saida = melhor
+
+    # Fora da amostra: começa zerado no início do teste, com o z que só usa barras passadas
+    z_teste = pd.Series(z[inicio_teste:, coluna], index=precos1.index[inicio_teste:])
+    resultado, pos_exec = simular(precos1.iloc[inicio_teste:], precos2.iloc[inicio_teste:], z_teste,
+                                  [limite], [saida], **custos)
+    return {
+        'Janela': janela, 'Limite (z)': limite, 'Saída (z)': saida,
+        'Sharpe Treino': melhor[0] if np.isfinite(melhor[0]) else np.nan,
+        'Z-Score': z_teste.to_numpy(), 'Posição': pos_exec[:, 0], 'Resultado': resultado[:, 0],
+    }
+
+
+def walk_forward(precos1, precos2, janelas, limites, saidas, treino=BARRAS_TREINO, teste=BARRAS_TESTE,
+                 custos=None, processos=None, barras_ano=DIAS_UTEIS_ANO):
+    """Otimização walk-forward da regra de z-score; devolve (dobras, resultado fora da amostra, métricas).
+
+    `dobras` tem, por dobra, as datas, os parâmetros escolhidos no treino e as métricas do
+    teste; o resultado fora da amostra junta os testes em sequência (mesmas colunas de
+    `backtest`) e as métricas são as dele. Os z-scores de todas as janelas são calculados uma
+    vez para o histórico inteiro e cada dobra é um job do pool de processos.
+    """
+    custos = custos or custos_relativos()
+    precos1, precos2 = precos1.align(precos2, join='inner')
+    janelas = [int(janela) for janela in janelas]
+    z = zscores_janelas(precos1 / precos2, janelas)
+    grade_limites, grade_saidas = (np.ravel(g) for g in np.meshgrid(limites, saidas, indexing='ij'))
+    # Saída maior ou igual ao limite nunca zera após entrar
+    validas = grade_saidas < grade_limites
+    grade_limites, grade_saidas = grade_limites[validas], grade_saidas[validas]
+
+    limites_dobras = dobras_walk_forward(len(precos1), treino, teste)
+    jobs = [
+        (precos1.iloc[inicio:fim], precos2.iloc[inicio:fim], z[inicio:fim], inicio_teste - inicio,
+         janelas, grade_limites, grade_saidas, custos, barras_ano)
+        for inicio, inicio_teste, fim in limites_dobras
+    ]
+    processos = processos or min(len(jobs), os.cpu_count() or 1)
+    if processos <= 1 or len(jobs) <= 1:
+        escolhas = [_otimizar_dobra(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            escolhas = list(executor.map(_otimizar_dobra, jobs))
+
+    linhas, partes = [], []
+    for numero, ((inicio, inicio_teste, fim), escolha) in enumerate(zip(limites_dobras, escolhas), start=1):
+        indice = precos1.index[inicio_teste:fim]
+        parte = pd.DataFrame({coluna: escolha[coluna] for coluna in ('Z-Score', 'Posição', 'Resultado')}, index=indice)
+        partes.append(parte)
+        metricas_teste = metricas(parte[['Resultado']].to_numpy(), parte[['Posição']].to_numpy(), barras_ano)
+        linhas.append({
+            'Dobra': numero, 'Início Treino': precos1.index[inicio], 'Início Teste': indice[0], 'Fim Teste': indice[-1],
+            'Janela': escolha['Janela'], 'Limite (z)': escolha['Limite (z)'], 'Saída (z)': escolha['Saída (z)'],
+            'Sharpe Treino': escolha['Sharpe Treino'],
+            **{f'{nome} Teste': valor[0] for nome, valor in metricas_teste.items() if nome != 'Tempo Posicionado (%)'},
+        })
+    dobras = pd.DataFrame(linhas)
+    if not partes:
+        return dobras, pd.DataFrame(columns=['Z-Score', 'Posição', 'Resultado', 'Acumulado']), {}
+    fora_amostra = pd.concat(partes)
+    fora_amostra['Acumulado'] = fora_amostra['Resultado'].cumsum()
+    return dobras, fora_amostra, metricas(fora_amostra[['Resultado']].to_numpy(), fora_amostra[['Posição']].to_numpy(),
+                                          barras_ano)
+
+
+def backtest(precos1, precos2, janela=60, limite=1.0, saida=0.0, custos=None, barras_ano=DIAS_UTEIS_ANO):
+    """Backtest de uma única combinação; devolve posição, resultado e curva acumulada por data."""
+    custos = custos or custos_relativos()
+    precos1, precos2 = precos1.align(precos2, join='inner')
+    z = calcular_zscore(precos1 / precos2, modo=JANELA_MOVEL, janela=janela)['Z-Score'].reindex(precos1.index)
+    resultado, pos_exec = simular(precos1, precos2, z, [limite], [saida], **custos)
+    return pd.DataFrame({
+        'Z-Score': z,
+        'Posição': pos_exec[:, 0],
+        'Resultado': resultado[:, 0],
+        'Acumulado': np.cumsum(resultado[:, 0]),
+    }, index=precos1.index), metricas(resultado, pos_exec, barras_ano)
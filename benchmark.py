@@ -0,0 +1,184 @@
+"""Benchmark de vazão e latência de cada etapa do pipeline com 1, 100 e 10 mil pares.
+
+Os preços vêm do `ProvedorSintetico` (determinístico, sem rede), então duas execuções na
+mesma máquina medem exatamente o mesmo trabalho. Etapas por par (alinhamento, z-score,
+gráfico, exportação) rodam em uma amostra espaçada dos pares para manter o tempo total
+viável; as vetorizadas (coleta, varredura, simulador) rodam sobre todos os pares de uma vez.
+Com `--referencia`, compara a latência p95 com um resultado gravado antes (`--saida`) e
+termina com código 1 se alguma etapa piorou além da tolerância.
+
+    python benchmark.py --saida referencia.json
+    python benchmark.py --referencia referencia.json --tolerancia 0.25
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from itertools import combinations, islice
+
+import numpy as np
+import pandas as pd
+
+from dados import baixar_lote
+from exportacao import exportar, tabela_historica
+from graficos import dados_grafico, reduzir_para_tela, renderizar_png
+from motor_zscore import JANELA_MOVEL, calcular_zscore
+from paineis import montar_matriz_fechamentos, painel_fechamentos
+from provedores import ProvedorSintetico
+from simulador import quantidades, resultado_operacao
+from varredura import varrer_pares
+
+ESCALAS = (1, 100, 10_000)
+PERIODO = '2y'
+# Pares medidos um a um por etapa; gráfico e exportação são caros e usam amostras menores
+AMOSTRA_PADRAO = 200
+AMOSTRA_GRAFICO = 10
+AMOSTRA_EXPORTACAO = 50
+# Etapas vetorizadas rodam uma vez sobre todos os pares; repetir reduz o ruído do p95
+REPETICOES = 5
+# Piora relativa da latência p95 aceita na comparação com a referência
+TOLERANCIA_PADRAO = 0.25
+FIM_SINTETICO = '2026-10-16'
+
+COLUNAS_RESULTADO = ['Etapa', 'Pares', 'Execuções', 'Total (s)', 'Média (ms)', 'p95 (ms)', 'Pares/s']
+
+
+def universo_sintetico(n_pares):
+    """Símbolos sintéticos (em duplas cointegradas) suficientes para `n_pares` pares distintos."""
+    n_simbolos = max(2, math.ceil((1 + math.sqrt(1 + 8 * n_pares)) / 2))
+    simbolos = [f'S{k:04d}.SA' for k in range(n_simbolos)]
+    grupos = {simbolo: k // 2 for k, simbolo in enumerate(simbolos)}
+    return simbolos, grupos, list(islice(combinations(simbolos, 2), n_pares))
+
+
+def _amostra(itens, tamanho):
+    """Até `tamanho` itens espaçados uniformemente (determinístico)."""
+    if len(itens) <= tamanho:
+        return list(itens)
+    return [itens[k] for k in np.linspace(0, len(itens) - 1, tamanho).astype(int)]
+
+
+def _medir(funcao, argumentos):
+    """Chama `funcao(*args)` para cada item e devolve os tempos, em segundos."""
+    tempos = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+    return np.asarray(tempos)
+
+
+def _linha(etapa, n_pares, tempos, pares_cobertos):
+    total = float(tempos.sum())
+    return {
+        'Etapa': etapa,
+        'Pares': n_pares,
+        'Execuções': len(tempos),
+        'Total (s)': total,
+        'Média (ms)': 1e3 * float(tempos.mean()),
+        'p95 (ms)': 1e3 * float(np.percentile(tempos, 95)),
+        'Pares/s': pares_cobertos / total if total > 0 else float('nan'),
+    }
+
+
+def _grafico(painel, acao1, acao2):
+    ratio = painel[acao1] / painel[acao2]
+    dados = reduzir_para_tela(dados_grafico(ratio, calcular_zscore(ratio, JANELA_MOVEL, 60)))
+    return renderizar_png(dados, 1.0, None, f'{acao1} / {acao2}')
+
+
+def _exportacao(painel, acao1, acao2):
+    ratio = painel[acao1] / painel[acao2]
+    z_score = calcular_zscore(ratio, JANELA_MOVEL, 60)['Z-Score']
+    return exportar(tabela_historica(painel, acao1, acao2, None, ratio, z_score))
+
+
+def _simulador(ultimos, pares):
+    """Resultado de uma operação em cada par, todos em uma única chamada vetorizada."""
+    entrada1 = ultimos[[a for a, _ in pares]].to_numpy()
+    entrada2 = ultimos[[b for _, b in pares]].to_numpy()
+    qtd1, qtd2 = quantidades(entrada1, entrada2, 1000)
+    return resultado_operacao(entrada1, entrada2, entrada1 * 1.02, entrada2 * 0.99, qtd1, qtd2,
+                              True, 20, 2.0, 10.0, 5.0)
+
+
+def medir_escala(n_pares, amostra=AMOSTRA_PADRAO, provedor=None):
+    """Mede todas as etapas com `n_pares` pares; devolve uma linha por etapa."""
+    simbolos, grupos, pares = universo_sintetico(n_pares)
+    provedor = provedor or ProvedorSintetico(grupos=grupos, fim=FIM_SINTETICO)
+    # Gera os preços antes, para a coleta medir só download, junção e separação por símbolo
+    for simbolo in simbolos:
+        provedor.barras(simbolo)
+
+    linhas = []
+    series = {}
+    tempos = _medir(lambda: series.update(baixar_lote(simbolos, periodo=PERIODO, provedor=provedor)), [()] * REPETICOES)
+    linhas.append(_linha('Coleta', n_pares, tempos, n_pares * REPETICOES))
+
+    medidos = _amostra(pares, amostra)
+    tempos = _medir(lambda a, b: painel_fechamentos(series, (a, b)), medidos)
+    linhas.append(_linha('Alinhamento', n_pares, tempos, len(medidos)))
+
+    paineis = {par: painel_fechamentos(series, par) for par in medidos}
+    ratios = [(paineis[(a, b)][a] / paineis[(a, b)][b],) for a, b in medidos]
+    tempos = _medir(lambda ratio: calcular_zscore(ratio, JANELA_MOVEL, 60), ratios)
+    linhas.append(_linha('Z-score', n_pares, tempos, len(medidos)))
+
+    tempos = _medir(lambda: varrer_pares(montar_matriz_fechamentos(series), limite_zscore=0.0, pares=pares), [()] * REPETICOES)
+    linhas.append(_linha('Z-score (varredura)', n_pares, tempos, n_pares * REPETICOES))
+
+    graficos = _amostra(medidos, AMOSTRA_GRAFICO)
+    tempos = _medir(lambda a, b: _grafico(paineis[(a, b)], a, b), graficos)
+    linhas.append(_linha('Gráfico', n_pares, tempos, len(graficos)))
+
+    ultimos = pd.Series({s: float(df['Close'].iloc[-1]) for s, df in series.items()})
+    tempos = _medir(lambda: _simulador(ultimos, pares), [()] * REPETICOES)
+    linhas.append(_linha('Simulador', n_pares, tempos, n_pares * REPETICOES))
+
+    exportados = _amostra(medidos, AMOSTRA_EXPORTACAO)
+    tempos = _medir(lambda a, b: _exportacao(paineis[(a, b)], a, b), exportados)
+    linhas.append(_linha('Exportação', n_pares, tempos, len(exportados)))
+    return linhas
+
+
+def executar_benchmark(escalas=ESCALAS, amostra=AMOSTRA_PADRAO):
+    """Roda todas as escalas e devolve o DataFrame de resultados (COLUNAS_RESULTADO)."""
+    linhas = [linha for n_pares in escalas for linha in medir_escala(n_pares, amostra)]
+    return pd.DataFrame(linhas, columns=COLUNAS_RESULTADO)
+
+
+def comparar(resultado, referencia, tolerancia=TOLERANCIA_PADRAO):
+    """Etapas cuja latência p95 piorou mais que `tolerancia` (relativa) em relação à referência."""
+    juntos = resultado.merge(referencia, on=['Etapa', 'Pares'], suffixes=('', ' (ref)'))
+    juntos['Variação'] = juntos['p95 (ms)'] / juntos['p95 (ms) (ref)'] - 1.0
+    return juntos.loc[juntos['Variação'] > tolerancia, ['Etapa', 'Pares', 'p95 (ms) (ref)', 'p95 (ms)', 'Variação']]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do pipeline com preços sintéticos.")
+    parser.add_argument('--escalas', type=int, nargs='+', default=list(ESCALAS), help="quantidades de pares")
+    parser.add_argument('--amostra', type=int, default=AMOSTRA_PADRAO, help="pares medidos um a um por etapa")
+    parser.add_argument('--saida', default=None, help="grava o resultado em JSON (para usar como referência)")
+    parser.add_argument('--referencia', default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO, help="piora relativa aceita no p95")
+    args = parser.parse_args(argv)
+
+    resultado = executar_benchmark(args.escalas, args.amostra)
+    print(resultado.to_string(index=False, float_format=lambda v: f'{v:,.3f}'))
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado.to_dict(orient='records'), arquivo, ensure_ascii=False, indent=2)
+    if args.referencia:
+        with open(args.referencia, encoding='utf-8') as arquivo:
+            referencia = pd.DataFrame(json.load(arquivo))
+        regressoes = comparar(resultado, referencia, args.tolerancia)
+        if not regressoes.empty:
+            print("\nRegressões de latência (p95):", file=sys.stderr)
+            print(regressoes.to_string(index=False, float_format=lambda v: f'{v:,.3f}'), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
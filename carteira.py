@@ -0,0 +1,226 @@
+"""Livro de posições com várias operações de pares abertas e agregação de risco vetorizada.
+
+Cada posição é uma operação long/short do simulador (duas pontas com quantidade, preço de
+entrada, taxa de aluguel e custos) gravada em SQLite. Como várias operações podem usar o
+mesmo ativo (PETR4 comprada num par e vendida em outro), a exposição e o aluguel são
+calculados por ativo, líquidos entre as posições. Todas as agregações são operações de
+array sobre as pernas de todas as posições de uma vez (bincount por ativo e produtos
+matriciais para o risco), então centenas de posições custam milissegundos.
+"""
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import CAMINHO_PADRAO
+
+COLUNAS_POSICOES = [
+    'ID', 'Ação 1', 'Ação 2', 'Qtd Ação 1', 'Qtd Ação 2', 'Compra Ação 1',
+    'Entrada Ação 1', 'Entrada Ação 2', 'Data Entrada', 'Taxa Aluguel (%)', 'Custos',
+]
+COLUNAS_EXPOSICAO = ['Ativo', 'Quantidade Líquida', 'Financeiro Líquido', 'Financeiro Comprado', 'Financeiro Vendido', 'Posições']
+
+
+def _conectar(caminho):
+    conn = sqlite3.connect(caminho or CAMINHO_PADRAO, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS posicoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            acao1 TEXT NOT NULL,
+            acao2 TEXT NOT NULL,
+            qtd_acao1 INTEGER NOT NULL,
+            qtd_acao2 INTEGER NOT NULL,
+            compra_acao1 INTEGER NOT NULL,
+            preco_entrada_acao1 REAL NOT NULL,
+            preco_entrada_acao2 REAL NOT NULL,
+            data_entrada TEXT NOT NULL,
+            taxa_aluguel_aa REAL NOT NULL,
+            custos REAL NOT NULL,
+            data_saida TEXT
+        )"""
+    )
+    return conn
+
+
+class LivroPosicoes:
+    """Posições de pares abertas, gravadas no banco local (o mesmo do histórico e do monitor)."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or CAMINHO_PADRAO
+        with _conectar(self.caminho) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    def abrir(self, acao1, acao2, qtd_acao1, qtd_acao2, compra_acao1, preco_entrada_acao1, preco_entrada_acao2,
+              taxa_aluguel_aa=0.0, custos=0.0, data_entrada=None):
+        """Registra uma operação aberta e devolve o ID dela."""
+        data_entrada = pd.Timestamp.now(tz='UTC') if data_entrada is None else pd.Timestamp(data_entrada)
+        with _conectar(self.caminho) as conn:
+            cursor = conn.execute(
+                "INSERT INTO posicoes (acao1, acao2, qtd_acao1, qtd_acao2, compra_acao1, preco_entrada_acao1, "
+                "preco_entrada_acao2, data_entrada, taxa_aluguel_aa, custos) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (acao1, acao2, int(qtd_acao1), int(qtd_acao2), int(bool(compra_acao1)), float(preco_entrada_acao1),
+                 float(preco_entrada_acao2), data_entrada.isoformat(), float(taxa_aluguel_aa), float(custos)),
+            )
+            return cursor.lastrowid
+
+    def encerrar(self, ids, data_saida=None):
+        """Marca as posições como encerradas (continuam no banco, fora do livro aberto)."""
+        data_saida = pd.Timestamp.now(tz='UTC') if data_saida is None else pd.Timestamp(data_saida)
+        with _conectar(self.caminho) as conn:
+            conn.executemany("UPDATE posicoes SET data_saida = ? WHERE id = ?", [(data_saida.isoformat(), int(i)) for i in ids])
+
+    def posicoes(self):
+        """Posições abertas como DataFrame (colunas `COLUNAS_POSICOES`)."""
+        with _conectar(self.caminho) as conn:
+            linhas = conn.execute(
+                "SELECT id, acao1, acao2, qtd_acao1, qtd_acao2, compra_acao1, preco_entrada_acao1, preco_entrada_acao2, "
+                "data_entrada, taxa_aluguel_aa, custos FROM posicoes WHERE data_saida IS NULL ORDER BY id"
+            ).fetchall()
+        posicoes = pd.DataFrame(linhas, columns=COLUNAS_POSICOES)
+        posicoes['Compra Ação 1'] = posicoes['Compra Ação 1'].astype(bool)
+        posicoes['Data Entrada'] = pd.to_datetime(posicoes['Data Entrada'], utc=True, format='ISO8601')
+        return posicoes
+
+
+def pernas(posicoes):
+    """Pernas de todas as posições: (ativos, códigos por perna, quantidades com sinal, preços de entrada).
+
+    A perna i está na posição i % P (primeiro as ações 1, depois as ações 2); quantidade
+    positiva é comprada e negativa vendida. `codigos` indexa `ativos`.
+    """
+    compra1 = posicoes['Compra Ação 1'].to_numpy(dtype=bool)
+    sinal1 = np.where(compra1, 1.0, -1.0)
+    quantidades = np.concatenate([
+        sinal1 * posicoes['Qtd Ação 1'].to_numpy(dtype=np.float64),
+        -sinal1 * posicoes['Qtd Ação 2'].to_numpy(dtype=np.float64),
+    ])
+    codigos, ativos = pd.factorize(np.concatenate([posicoes['Ação 1'].to_numpy(), posicoes['Ação 2'].to_numpy()]))
+    entradas = np.concatenate([
+        posicoes['Entrada Ação 1'].to_numpy(dtype=np.float64), posicoes['Entrada Ação 2'].to_numpy(dtype=np.float64),
+    ])
+    return np.asarray(ativos), codigos, quantidades, entradas
+
+
+def _precos_atuais(ativos, precos, codigos, entradas):
+    """Preço atual por perna; sem cotação, a perna é marcada no preço de entrada."""
+    por_ativo = np.array([precos.get(ativo) for ativo in ativos], dtype=np.float64)
+    atuais = por_ativo[codigos]
+    return np.where(np.isfinite(atuais), atuais, entradas)
+
+
+def exposicao_liquida(posicoes, precos):
+    """Exposição por ativo somando todas as posições (DataFrame `COLUNAS_EXPOSICAO`).
+
+    `precos` é {ativo: preço atual}. O financeiro líquido compensa pontas opostas do mesmo
+    ativo; comprado e vendido mostram o bruto de cada lado.
+    """
+    if posicoes.empty:
+        return pd.DataFrame(columns=COLUNAS_EXPOSICAO)
+    ativos, codigos, quantidades, entradas = pernas(posicoes)
+    financeiro = quantidades * _precos_atuais(ativos, precos, codigos, entradas)
+    n = len(ativos)
+    return pd.DataFrame({
+        'Ativo': ativos,
+        'Quantidade Líquida': np.bincount(codigos, weights=quantidades, minlength=n),
+        'Financeiro Líquido': np.bincount(codigos, weights=financeiro, minlength=n),
+        'Financeiro Comprado': np.bincount(codigos, weights=np.maximum(financeiro, 0.0), minlength=n),
+        'Financeiro Vendido': np.bincount(codigos, weights=np.minimum(financeiro, 0.0), minlength=n),
+        'Posições': np.bincount(codigos, minlength=n),
+    }, columns=COLUNAS_EXPOSICAO).sort_values('Financeiro Líquido', key=np.abs, ascending=False, ignore_index=True)
+
+
+def carrego_aluguel(posicoes, precos):
+    """Custo diário de aluguel da carteira, bruto (soma das posições) e líquido (só o saldo vendido de cada ativo).
+
+    O aluguel de cada ativo usa a taxa média das posições que o vendem, ponderada pela
+    quantidade vendida. Devolve {'bruto_diario', 'liquido_diario'} em R$/dia.
+    """
+    if posicoes.empty:
+        return {'bruto_diario': 0.0, 'liquido_diario': 0.0}
+    ativos, codigos, quantidades, entradas = pernas(posicoes)
+    precos_pernas = _precos_atuais(ativos, precos, codigos, entradas)
+    taxas = np.tile(posicoes['Taxa Aluguel (%)'].to_numpy(dtype=np.float64), 2) / 100.0 / 365.0
+    vendidas = np.maximum(-quantidades, 0.0)
+    bruto = float((vendidas * precos_pernas * taxas).sum())
+
+    n = len(ativos)
+    vendido_por_ativo = np.bincount(codigos, weights=vendidas, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        taxa_media = np.bincount(codigos, weights=vendidas * taxas, minlength=n) / vendido_por_ativo
+        preco_por_ativo = np.bincount(codigos, weights=precos_pernas, minlength=n) / np.bincount(codigos, minlength=n)
+    saldo_vendido = np.maximum(-np.bincount(codigos, weights=quantidades, minlength=n), 0.0)
+    liquido = float(np.nansum(saldo_vendido * preco_por_ativo * taxa_media))
+    return {'bruto_diario': bruto, 'liquido_diario': liquido}
+
+
+def marcacao_mercado(posicoes, precos, agora=None):
+    """Resultado de cada posição a mercado: DataFrame 'ID', 'Resultado Bruto', 'Aluguel Acumulado', 'Resultado Líquido'.
+
+    O aluguel acumulado é o da ponta vendida sobre o financeiro de entrada, por dia corrido
+    desde a entrada, como no simulador.
+    """
+    colunas = ['ID', 'Resultado Bruto', 'Aluguel Acumulado', 'Resultado Líquido']
+    if posicoes.empty:
+        return pd.DataFrame(columns=colunas)
+    agora = pd.Timestamp.now(tz='UTC') if agora is None else pd.Timestamp(agora)
+    ativos, codigos, quantidades, entradas = pernas(posicoes)
+    n_posicoes = len(posicoes)
+    resultado_pernas = quantidades * (_precos_atuais(ativos, precos, codigos, entradas) - entradas)
+    bruto = resultado_pernas[:n_posicoes] + resultado_pernas[n_posicoes:]
+    vendido_entrada = (np.maximum(-quantidades, 0.0) * entradas)
+    vendido_entrada = vendido_entrada[:n_posicoes] + vendido_entrada[n_posicoes:]
+    dias = ((agora - posicoes['Data Entrada']).dt.total_seconds() / 86_400.0).clip(lower=0.0).to_numpy()
+    aluguel = vendido_entrada * posicoes['Taxa Aluguel (%)'].to_numpy(dtype=np.float64) / 100.0 / 365.0 * dias
+    return pd.DataFrame({
+        'ID': posicoes['ID'].to_numpy(),
+        'Resultado Bruto': bruto,
+        'Aluguel Acumulado': aluguel,
+        'Resultado Líquido': bruto - aluguel - posicoes['Custos'].to_numpy(dtype=np.float64),
+    }, columns=colunas)
+
+
+def risco_spreads(posicoes, matriz):
+    """Risco dos spreads a partir do histórico de fechamentos (`matriz` datas x ativos).
+
+    O resultado diário de cada posição é ΔP @ Q, com Q a matriz ativos x posições das
+    quantidades com sinal; a correlação entre posições e a volatilidade da carteira saem
+    desse único produto. Devolve {'correlacao' (DataFrame P x P por ID), 'volatilidade'
+    (R$/dia por posição), 'volatilidade_carteira', 'soma_volatilidades'}; posições com
+    ativos fora da matriz ficam com volatilidade NaN e fora da carteira.
+    """
+    ids = posicoes['ID'].to_numpy()
+    if posicoes.empty or matriz.empty:
+        return {'correlacao': pd.DataFrame(index=ids, columns=ids, dtype=float),
+                'volatilidade': pd.Series(np.nan, index=ids), 'volatilidade_carteira': np.nan, 'soma_volatilidades': np.nan}
+    ativos, codigos, quantidades, _ = pernas(posicoes)
+    n_posicoes = len(posicoes)
+    colunas = matriz.columns.get_indexer(ativos)
+    # Variação diária em R$ por ação (feriados de um mercado contam como variação zero)
+    presentes = np.unique(colunas[colunas >= 0])
+    variacoes = np.diff(matriz.ffill().to_numpy(dtype=np.float64)[:, presentes], axis=0)
+    variacoes = variacoes[np.isfinite(variacoes).all(axis=1)]
+    posicao_coluna = np.full(matriz.shape[1], -1)
+    posicao_coluna[presentes] = np.arange(len(presentes))
+
+    cobertas = (colunas[codigos[:n_posicoes]] >= 0) & (colunas[codigos[n_posicoes:]] >= 0)
+    pesos = np.zeros((len(presentes), n_posicoes))
+    linhas = posicao_coluna[np.maximum(colunas[codigos], 0)]
+    colunas_posicao = np.tile(np.arange(n_posicoes), 2)
+    validas = np.tile(cobertas, 2)
+    np.add.at(pesos, (linhas[validas], colunas_posicao[validas]), quantidades[validas])
+
+    resultado = variacoes @ pesos
+    volatilidade = np.where(cobertas, resultado.std(axis=0), np.nan) if len(resultado) > 1 else np.full(n_posicoes, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centrado = resultado - resultado.mean(axis=0)
+        padronizado = centrado / (volatilidade * np.sqrt(len(resultado)))
+        correlacao = padronizado.T @ padronizado
+    correlacao[~cobertas, :] = np.nan
+    correlacao[:, ~cobertas] = np.nan
+    carteira = resultado[:, cobertas].sum(axis=1)
+    return {
+        'correlacao': pd.DataFrame(correlacao, index=ids, columns=ids),
+        'volatilidade': pd.Series(volatilidade, index=ids),
+        'volatilidade_carteira': float(carteira.std()) if len(carteira) > 1 else np.nan,
+        'soma_volatilidades': float(np.nansum(volatilidade)),
+    }
@@ -0,0 +1,151 @@
+"""Triagem de cointegração (Engle-Granger/ADF) e meia-vida de reversão para muitos pares.
+
+O z-score do ratio só faz sentido se o par reverter à média. Para cada par e janela:
+1. regressão log P1 = a + b log P2 (hedge ratio `b`);
+2. ADF sem constante nos resíduos, com uma defasagem, comparado aos valores críticos de
+   MacKinnon (2010) para cointegração com duas variáveis;
+3. meia-vida do resíduo por AR(1), como no ajuste Ornstein-Uhlenbeck do simulador.
+
+Os pares são avaliados em lotes num pool de processos e o resultado fica em cache por
+(par, janela, versão dos dados), então só os pares com barras novas são recalculados.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Superfície de resposta de MacKinnon (2010), N=2 com constante: (tau_inf, b1, b2) por nível
+CRITICOS_MACKINNON = {
+    '1%': (-3.89644, -10.9519, -33.527),
+    '5%': (-3.33613, -6.1101, -6.823),
+    '10%': (-3.04445, -4.2412, -2.720),
+}
+DEFASAGENS_ADF = 1
+MIN_OBSERVACOES = 30
+# Pares por job do pool; abaixo de um lote o cálculo roda no próprio processo
+TAMANHO_LOTE = 32
+MAX_ENTRADAS_CACHE = 20_000
+
+COLUNAS = ['Ação 1', 'Ação 2', 'Janela', 'Observações', 'Beta', 'ADF', 'Crítico 5%', 'Cointegrado', 'Meia-Vida (dias)']
+
+
+def valor_critico(n_obs, nivel='5%'):
+    """Valor crítico do ADF de Engle-Granger para `n_obs` observações."""
+    tau, b1, b2 = CRITICOS_MACKINNON[nivel]
+    return tau + b1 / n_obs + b2 / n_obs ** 2
+
+
+def estatistica_adf(serie, defasagens=DEFASAGENS_ADF):
+    """Estatística t do ADF sem constante: Δe_t = γ e_{t-1} + Σ φ_i Δe_{t-i} + ε."""
+    delta = np.diff(serie)
+    y = delta[defasagens:]
+    colunas = [serie[defasagens:-1]]
+    for i in range(1, defasagens + 1):
+        colunas.append(delta[defasagens - i:-i])
+    X = np.column_stack(colunas)
+    coef, _, _, _ = np.linalg.lstsq(X, y, rcond=None)
+    residuos = y - X @ coef
+    graus = len(y) - X.shape[1]
+    if graus <= 0:
+        return np.nan
+    variancia = residuos @ residuos / graus
+    erro_padrao = np.sqrt(variancia * np.linalg.pinv(X.T @ X)[0, 0])
+    return coef[0] / erro_padrao if erro_padrao > 0 else np.nan
+
+
+def meia_vida(serie):
+    """Meia-vida, em barras, do AR(1) ajustado à série (infinita se não houver reversão)."""
+    phi, _ = np.polyfit(serie[:-1], serie[1:], 1)
+    return -np.log(2.0) / np.log(phi) if 0.0 < phi < 1.0 else np.inf
+
+
+def engle_granger(precos1, precos2):
+    """Teste de Engle-Granger de um par (arrays de preços alinhados, sem NaN)."""
+    log1 = np.log(np.asarray(precos1, dtype=np.float64))
+    log2 = np.log(np.asarray(precos2, dtype=np.float64))
+    n_obs = len(log1)
+    resultado = {'Observações': n_obs, 'Beta': np.nan, 'ADF': np.nan, 'Crítico 5%': np.nan,
+                 'Cointegrado': False, 'Meia-Vida (dias)': np.nan}
+    if n_obs < MIN_OBSERVACOES or np.std(log2) == 0:
+        return resultado
+    beta, alfa = np.polyfit(log2, log1, 1)
+    residuos = log1 - alfa - beta * log2
+    adf = estatistica_adf(residuos)
+    critico = valor_critico(n_obs)
+    resultado.update({
+        'Beta': beta, 'ADF': adf, 'Crítico 5%': critico,
+        'Cointegrado': bool(adf < critico), 'Meia-Vida (dias)': meia_vida(residuos),
+    })
+    return resultado
+
+
+def _testar_lote(tarefas):
+    """Avalia um lote [(chave, preços 1, preços 2), ...] (roda em subprocesso)."""
+    return [(chave, engle_granger(precos1, precos2)) for chave, precos1, precos2 in tarefas]
+
+
+def versao_coluna(serie):
+    """Identifica o conteúdo de uma coluna de fechamentos: (observações, última data, último valor)."""
+    validos = serie.dropna()
+    if validos.empty:
+        return None
+    return (len(validos), str(validos.index[-1]), float(validos.iloc[-1]))
+
+
+class CacheCointegracao:
+    """Cache LRU, seguro entre threads, de resultados por (ação 1, ação 2, janela, versões dos dados)."""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_CACHE):
+        self.max_entradas = max_entradas
+        self._valores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def testar_pares(self, matriz, pares, janelas=(None,), processos=None):
+        """Resultados de cointegração para cada par x janela como DataFrame (colunas `COLUNAS`).
+
+        `matriz` é datas x símbolos com fechamentos; cada par usa as datas em que os dois
+        têm preço e, com `janela`, só as últimas `janela` delas (None = todas).
+        """
+        versoes = {s: versao_coluna(matriz[s]) for s in dict.fromkeys(s for par in pares for s in par)}
+        chaves = [(a1, a2, janela, versoes[a1], versoes[a2]) for a1, a2 in pares for janela in janelas]
+        with self._lock:
+            faltantes = [chave for chave in dict.fromkeys(chaves) if chave not in self._valores]
+
+        if faltantes:
+            valores = matriz.to_numpy(dtype=np.float64)
+            validos = np.isfinite(valores)
+            colunas = {s: i for i, s in enumerate(matriz.columns)}
+            tarefas = []
+            for chave in faltantes:
+                i, j = colunas[chave[0]], colunas[chave[1]]
+                comuns = validos[:, i] & validos[:, j]
+                precos1, precos2 = valores[comuns, i], valores[comuns, j]
+                if chave[2] is not None:
+                    precos1, precos2 = precos1[-int(chave[2]):], precos2[-int(chave[2]):]
+                tarefas.append((chave, precos1, precos2))
+            lotes = [tarefas[i:i + TAMANHO_LOTE] for i in range(0, len(tarefas), TAMANHO_LOTE)]
+            processos = processos or min(len(lotes), os.cpu_count() or 1)
+            if processos <= 1 or len(lotes) <= 1:
+                resultados = [_testar_lote(lote) for lote in lotes]
+            else:
+                with ProcessPoolExecutor(max_workers=processos) as executor:
+                    resultados = list(executor.map(_testar_lote, lotes))
+            with self._lock:
+                for lote in resultados:
+                    for chave, resultado in lote:
+                        self._valores[chave] = resultado
+                while len(self._valores) > self.max_entradas:
+                    self._valores.popitem(last=False)
+
+        linhas = []
+        with self._lock:
+            for chave in chaves:
+                resultado = self._valores.get(chave)
+                if resultado is None:
+                    continue
+                self._valores.move_to_end(chave)
+                linhas.append({'Ação 1': chave[0], 'Ação 2': chave[1], 'Janela': chave[2], **resultado})
+        return pd.DataFrame(linhas, columns=COLUNAS)
@@ -0,0 +1,175 @@
+"""Camada de coleta de dados de mercado em lote (cotações e séries históricas)."""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Máximo de requisições simultâneas ao provedor
+MAX_CONCORRENCIA = 4
+
+
+def provedor_padrao():
+    """Módulo `yfinance`, importado só quando alguma coleta realmente acontece.
+
+    Com ARBITRAGEM_PROVEDOR definida ('sintetico' ou um diretório de fixtures gravadas),
+    devolve o provedor local correspondente (ver `provedores`), sem acesso à rede.
+    """
+    local = os.environ.get('ARBITRAGEM_PROVEDOR')
+    if local:
+        from provedores import provedor_local
+        return provedor_local(local)
+    import yfinance
+    return yfinance
+
+
+class LimiteRequisicoes(Exception):
+    """O provedor recusou a requisição por excesso de chamadas (rate limit)."""
+
+    def __init__(self, simbolos):
+        self.simbolos = list(simbolos)
+        super().__init__(f"Too many requests: {', '.join(self.simbolos)}")
+
+
+def eh_rate_limit(erro):
+    """Indica se a mensagem de erro do provedor corresponde a um rate limit."""
+    err_msg = str(erro).lower()
+    return "too many requests" in err_msg or "rate limited" in err_msg
+
+
+def _separar_por_simbolo(dados, simbolos):
+    """Divide o DataFrame de colunas (símbolo, campo) em um DataFrame por símbolo."""
+    frames = {}
+    for simbolo in simbolos:
+        if dados is None or dados.empty:
+            frames[simbolo] = None
+            continue
+        if isinstance(dados.columns, pd.MultiIndex):
+            if simbolo not in dados.columns.get_level_values(0):
+                frames[simbolo] = None
+                continue
+            df = dados[simbolo]
+        elif len(simbolos) == 1:
+            df = dados
+        else:
+            frames[simbolo] = None
+            continue
+        # Mercados diferentes (B3 x EUA) geram linhas vazias no download conjunto
+        df = df.dropna(how='all')
+        if 'Close' in df.columns:
+            df = df[df['Close'].notna()]
+        frames[simbolo] = df if not df.empty else None
+    return frames
+
+
+def baixar_lote(simbolos, periodo='1y', intervalo='1d', provedor=None, inicio=None):
+    """Baixa vários símbolos em uma única requisição e devolve {símbolo: DataFrame ou None}.
+
+    `provedor` precisa expor `download` com a mesma assinatura de `yfinance.download`
+    (o próprio módulo `yfinance` é o padrão), o que permite testes com um provedor local.
+    Se `inicio` for informado, baixa a partir dessa data em vez de usar `periodo`.
+    Levanta `LimiteRequisicoes` quando o provedor sinaliza rate limit.
+    """
+    provedor = provedor or provedor_padrao()
+    simbolos = list(dict.fromkeys(simbolos))  # Remove duplicados mantendo a ordem
+    if not simbolos:
+        return {}
+    janela = {'start': inicio} if inicio is not None else {'period': periodo}
+    try:
+        dados = provedor.download(
+            simbolos,
+            interval=intervalo,
+            auto_adjust=True,
+            group_by='ticker',
+            threads=True,
+            progress=False,
+            **janela,
+        )
+    except Exception as e:
+        if eh_rate_limit(e):
+            raise LimiteRequisicoes(simbolos) from e
+        raise
+
+    # O yfinance não propaga exceções do download em lote; registra-as por símbolo
+    erros = getattr(getattr(provedor, 'shared', None), '_ERRORS', None) or {}
+    limitados = [s for s in simbolos if s in erros and eh_rate_limit(erros[s])]
+    if limitados:
+        raise LimiteRequisicoes(limitados)
+
+    return _separar_por_simbolo(dados, simbolos)
+
+
+def executar_em_paralelo(tarefas, max_concorrencia=MAX_CONCORRENCIA, inicializador=None):
+    """Executa {chave: (função, *args)} em um pool de threads limitado e devolve {chave: resultado}.
+
+    As tarefas devem tratar os próprios erros (devolvendo None, como as funções de coleta);
+    exceções não tratadas são propagadas. `inicializador` roda em cada thread do pool.
+    """
+    if not tarefas:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_concorrencia, len(tarefas)), initializer=inicializador) as executor:
+        futuros = {chave: executor.submit(funcao, *args) for chave, (funcao, *args) in tarefas.items()}
+        return {chave: futuro.result() for chave, futuro in futuros.items()}
+
+
+def _baixar_acoes_corporativas(simbolo, provedor):
+    """Ações corporativas de um símbolo, ou None se não houver ou a consulta falhar."""
+    try:
+        acoes_corporativas = provedor.Ticker(simbolo).actions
+    except Exception:
+        # Ações corporativas não são críticas para a análise
+        return None
+    if acoes_corporativas is None or acoes_corporativas.empty:
+        return None
+    return acoes_corporativas
+
+
+def baixar_acoes_corporativas(simbolos, provedor=None, max_concorrencia=MAX_CONCORRENCIA):
+    """Obtém {símbolo: DataFrame de dividendos/desdobramentos ou None} com requisições simultâneas."""
+    provedor = provedor or provedor_padrao()
+    tarefas = {s: (_baixar_acoes_corporativas, s, provedor) for s in dict.fromkeys(simbolos)}
+    return executar_em_paralelo(tarefas, max_concorrencia)
+
+
+def _ultimo_preco(simbolo, provedor):
+    """Último preço e horário de um símbolo a partir de uma única barra diária e seus metadados.
+
+    O endpoint de gráfico devolve `regularMarketPrice`/`regularMarketTime` junto com a barra,
+    então a consulta custa poucos bytes. Devolve (preço, horário, rate_limit).
+    """
+    try:
+        ticker = provedor.Ticker(simbolo)
+        barra = ticker.history(period='1d', interval='1d')
+        metadados = ticker.get_history_metadata() or {}
+    except Exception as e:
+        return None, None, eh_rate_limit(e)
+    preco = metadados.get('regularMarketPrice')
+    horario = metadados.get('regularMarketTime')
+    if preco is not None and horario is not None:
+        return float(preco), pd.Timestamp(horario, unit='s', tz='UTC'), False
+    if barra is not None and not barra.empty:
+        return float(barra['Close'].iloc[-1]), pd.Timestamp(barra.index[-1]), False
+    return None, None, False
+
+
+def baixar_ultimos_precos(simbolos, provedor=None, armazem=None, max_concorrencia=MAX_CONCORRENCIA):
+    """Snapshot do último preço de cada símbolo: DataFrame indexado por símbolo com 'Preço', 'Horário' e 'Origem'.
+
+    Símbolos sem cotação usam o último fechamento gravado em `armazem` (se informado).
+    Devolve também a lista de símbolos que bateram no rate limit.
+    """
+    provedor = provedor or provedor_padrao()
+    tarefas = {s: (_ultimo_preco, s, provedor) for s in dict.fromkeys(simbolos)}
+    linhas = []
+    limitados = []
+    for simbolo, (preco, horario, limitado) in executar_em_paralelo(tarefas, max_concorrencia).items():
+        if limitado:
+            limitados.append(simbolo)
+        origem = 'Cotação'
+        if preco is None and armazem is not None:
+            ultima_barra = armazem.ultima_barra(simbolo)
+            if ultima_barra is not None:
+                horario, preco = ultima_barra
+                origem = 'Fechamento local'
+        linhas.append({'Símbolo': simbolo, 'Preço': preco, 'Horário': horario, 'Origem': origem if preco is not None else None})
+    snapshot = pd.DataFrame(linhas, columns=['Símbolo', 'Preço', 'Horário', 'Origem']).set_index('Símbolo')
+    return snapshot, limitados
@@ -0,0 +1,96 @@
+"""Exportação da tabela histórica do par em CSV ou Parquet, gerada em blocos sob demanda.
+
+A geração é preguiçosa, não em streaming: o dashboard só monta e serializa a tabela
+(`exportar_par`) quando o botão de download é clicado, mas o arquivo inteiro fica em memória (o `st.download_button` guarda
+o conteúdo como bytes). Os blocos limitam a memória da conversão do pandas/pyarrow; para
+gravar em disco sem passar pela memória, use `destino` com um arquivo aberto em modo binário.
+"""
+import importlib.util
+import io
+
+import pandas as pd
+
+from metricas import cronometrar
+
+# Linhas serializadas por vez (CSV) ou por row group (Parquet)
+LINHAS_POR_BLOCO = 50_000
+
+FORMATO_CSV = 'CSV'
+FORMATO_PARQUET = 'Parquet'
+# Parquet depende do pyarrow, que é opcional
+PARQUET_DISPONIVEL = importlib.util.find_spec('pyarrow') is not None
+FORMATOS = (FORMATO_CSV, FORMATO_PARQUET) if PARQUET_DISPONIVEL else (FORMATO_CSV,)
+
+EXTENSOES = {FORMATO_CSV: 'csv', FORMATO_PARQUET: 'parquet'}
+MIMES = {FORMATO_CSV: 'text/csv', FORMATO_PARQUET: 'application/vnd.apache.parquet'}
+
+
+def tabela_historica(painel, acao1, acao2, commodity, ratio, z_score):
+    """Tabela do par (fechamentos, ratio, z-score e commodity) a partir do painel de fechamentos."""
+    tabela = pd.DataFrame({
+        acao1: painel[acao1],
+        acao2: painel[acao2],
+        'Ratio': ratio,
+        'Z-Score': z_score,
+    })
+    if commodity in painel.columns and painel[commodity].notna().any():
+        tabela[commodity] = painel[commodity]
+    return tabela
+
+
+def tabela_par(analise, acao1, acao2, commodity, linhas=None):
+    """Tabela histórica do par a partir do resultado de `analisar_par` (com spread e hedge no
+    modelo de Kalman); com `linhas`, monta só as últimas linhas do painel."""
+    painel = analise['painel'] if linhas is None else analise['painel'].iloc[-linhas:]
+
+    def recortar(serie):
+        return serie if linhas is None else serie.reindex(painel.index)
+
+    tabela = tabela_historica(painel, acao1, acao2, commodity, recortar(analise['ratio']),
+                              recortar(analise['estatisticas']['Z-Score']))
+    if analise['hedge'] is not None:
+        tabela['Spread'] = recortar(analise['spread'])
+        tabela['Hedge (β)'] = recortar(analise['hedge'])
+    return tabela
+
+
+def escrever_csv(tabela, destino, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Escreve a tabela em CSV (UTF-8) no arquivo binário `destino`, um bloco de linhas por vez."""
+    for inicio in range(0, max(len(tabela), 1), linhas_por_bloco):
+        bloco = tabela.iloc[inicio:inicio + linhas_por_bloco]
+        destino.write(bloco.to_csv(header=inicio == 0).encode('utf-8'))
+
+
+def escrever_parquet(tabela, destino, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Escreve a tabela em Parquet (zstd) no arquivo binário `destino`, um row group por bloco."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for inicio in range(0, max(len(tabela), 1), linhas_por_bloco):
+            bloco = pa.Table.from_pandas(tabela.iloc[inicio:inicio + linhas_por_bloco], preserve_index=True)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, bloco.schema, compression='zstd')
+            escritor.write_table(bloco)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def exportar(tabela, formato=FORMATO_CSV, destino=None):
+    """Serializa a tabela no formato pedido; sem `destino`, devolve um BytesIO (o arquivo inteiro) no início."""
+    buffer = destino if destino is not None else io.BytesIO()
+    with cronometrar(f'exportacao_{formato.lower()}'):
+        if formato == FORMATO_PARQUET:
+            escrever_parquet(tabela, buffer)
+        else:
+            escrever_csv(tabela, buffer)
+    if destino is None:
+        buffer.seek(0)
+    return buffer
+
+
+def exportar_par(analise, acao1, acao2, commodity, formato=FORMATO_CSV):
+    """Monta a tabela histórica completa do par e a serializa (ver `exportar`)."""
+    return exportar(tabela_par(analise, acao1, acao2, commodity), formato)
@@ -0,0 +1,138 @@
+"""Gráfico do ratio com a commodity, reduzido à resolução da tela antes de desenhar.
+
+A redução é por baldes min/max (M4): em cada balde ficam o primeiro, o último, o mínimo e
+o máximo de cada série, o que preserva picos e cruzamentos das bandas mesmo com poucos
+pontos. O gráfico estático é devolvido como PNG (a figura é sempre fechada); o interativo
+é um gráfico Altair renderizado no navegador, com zoom sem voltar ao servidor.
+"""
+import io
+
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+# Aproximadamente a largura útil do gráfico em pixels
+PONTOS_TELA = 1200
+# No interativo o zoom é feito no navegador, então vale mandar mais detalhe
+PONTOS_INTERATIVO = 5000
+
+
+def indices_min_max(valores, n_baldes):
+    """Posições do primeiro, último, mínimo e máximo de cada um dos `n_baldes` baldes."""
+    valores = np.asarray(valores, dtype=np.float64)
+    n = len(valores)
+    if n <= 4 * n_baldes:
+        return np.arange(n)
+    tamanho = -(-n // n_baldes)
+    preenchido = np.full(n_baldes * tamanho, np.nan)
+    preenchido[:n] = valores
+    baldes = preenchido.reshape(n_baldes, tamanho)
+    vazios = np.isnan(baldes)
+    inicio = np.arange(n_baldes) * tamanho
+    minimos = inicio + np.where(vazios, np.inf, baldes).argmin(axis=1)
+    maximos = inicio + np.where(vazios, -np.inf, baldes).argmax(axis=1)
+    ultimos = np.minimum(inicio + tamanho - 1, n - 1)
+    indices = np.unique(np.concatenate([inicio, ultimos, minimos, maximos]))
+    return indices[indices < n]
+
+
+def reduzir_para_tela(dados, pontos=PONTOS_TELA):
+    """Reduz um DataFrame de séries no mesmo índice a cerca de `pontos` linhas por coluna.
+
+    Cada coluna escolhe seus pontos (min/max por balde) e todas usam a união deles, para
+    as linhas continuarem alinhadas no eixo de datas.
+    """
+    if len(dados) <= pontos:
+        return dados
+    n_baldes = max(pontos // 4, 1)
+    indices = np.unique(np.concatenate([
+        indices_min_max(dados[coluna].to_numpy(dtype=np.float64), n_baldes) for coluna in dados.columns
+    ]))
+    return dados.iloc[indices]
+
+
+def dados_grafico(ratio, estatisticas, commodity=None):
+    """Junta spread (ratio), média, desvio e (opcionalmente) a commodity em um DataFrame para o gráfico."""
+    dados = pd.DataFrame({
+        'Ratio': ratio,
+        'Média': estatisticas['Média'],
+        'Desvio': estatisticas['Desvio'],
+    })
+    if commodity is not None and commodity.notna().any():
+        dados['Commodity'] = commodity
+    return dados
+
+
+def renderizar_png(dados, limite, commodity_symbol, titulo, rotulo='Ratio'):
+    """Desenha o gráfico do spread (bandas de ±`limite` desvios) e devolve os bytes do PNG."""
+    fig, ax1 = plt.subplots(figsize=(12, 6))
+    try:
+        ax1.plot(dados.index, dados['Ratio'].values, label=rotulo, color='blue', linewidth=1.5)
+        media = dados['Média']
+        if media.notna().any():
+            # Linhas constantes na amostra completa; variam no tempo na janela móvel/EWMA
+            desvio = dados['Desvio']
+            ax1.plot(dados.index, media.values, color='green', linestyle='-', label='Média', linewidth=1)
+            ax1.plot(dados.index, (media + limite * desvio).values, color='red', linestyle='--', label=f'+{limite:.1f}σ', linewidth=1)
+            ax1.plot(dados.index, (media - limite * desvio).values, color='red', linestyle='--', label=f'{-limite:.1f}σ', linewidth=1)
+
+        ax1.set_xlabel('Data')
+        ax1.set_ylabel(rotulo, color='blue')
+        ax1.tick_params(axis='y', labelcolor='blue')
+        ax1.grid(True, axis='y', linestyle=':', alpha=0.6)
+
+        # Eixo Y secundário para commodity
+        linhas, rotulos = ax1.get_legend_handles_labels()
+        if 'Commodity' in dados.columns:
+            commodity = dados['Commodity'].dropna()
+            ax2 = ax1.twinx()
+            ax2.plot(commodity.index, commodity.values, color='orange', linestyle='-.', label=commodity_symbol, linewidth=1.5)
+            ax2.set_ylabel(f'{commodity_symbol} (USD)', color='orange')
+            ax2.tick_params(axis='y', labelcolor='orange')
+            linhas2, rotulos2 = ax2.get_legend_handles_labels()
+            linhas, rotulos = linhas + linhas2, rotulos + rotulos2
+        ax1.legend(linhas, rotulos, loc='best')
+
+        ax1.set_title(titulo, fontsize=14)
+        # Barras intradiárias mostram também o horário
+        intradiario = len(dados) > 0 and not (dados.index == dados.index.normalize()).all()
+        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M' if intradiario else '%Y-%m-%d'))
+        plt.setp(ax1.get_xticklabels(), rotation=30, ha='right')
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=100)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def grafico_interativo(dados, limite, commodity_symbol, titulo, rotulo='Ratio'):
+    """Mesmo gráfico em Altair (Vega-Lite), com zoom e tooltip processados no navegador."""
+    import altair as alt
+
+    base = dados.rename(columns={'Ratio': rotulo}).rename_axis('Data').reset_index()
+    base[f'+{limite:.1f}σ'] = base['Média'] + limite * base['Desvio']
+    base[f'{-limite:.1f}σ'] = base['Média'] - limite * base['Desvio']
+    series_ratio = [rotulo, 'Média', f'+{limite:.1f}σ', f'{-limite:.1f}σ']
+    longo = base.melt(id_vars='Data', value_vars=series_ratio, var_name='Série', value_name='Valor').dropna()
+
+    zoom = alt.selection_interval(bind='scales', encodings=['x'])
+    camada_ratio = alt.Chart(longo).mark_line(strokeWidth=1.2).encode(
+        x=alt.X('Data:T', title='Data'),
+        y=alt.Y('Valor:Q', title=rotulo, scale=alt.Scale(zero=False)),
+        color=alt.Color('Série:N', scale=alt.Scale(domain=series_ratio, range=['blue', 'green', 'red', 'red'])),
+        strokeDash=alt.StrokeDash('Série:N', scale=alt.Scale(domain=series_ratio, range=[[1, 0], [1, 0], [5, 3], [5, 3]]), legend=None),
+        tooltip=['Data:T', 'Série:N', alt.Tooltip('Valor:Q', format='.4f')],
+    ).add_params(zoom)
+    if 'Commodity' not in base.columns:
+        return camada_ratio.properties(title=titulo, height=450)
+
+    camada_commodity = alt.Chart(base.dropna(subset=['Commodity'])).mark_line(
+        color='orange', strokeDash=[6, 2, 2, 2], strokeWidth=1.2,
+    ).encode(
+        x='Data:T',
+        y=alt.Y('Commodity:Q', title=f'{commodity_symbol} (USD)', scale=alt.Scale(zero=False)),
+        tooltip=['Data:T', alt.Tooltip('Commodity:Q', title=commodity_symbol, format='.2f')],
+    )
+    return alt.layer(camada_ratio, camada_commodity).resolve_scale(y='independent').properties(title=titulo, height=450)
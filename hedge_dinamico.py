@@ -0,0 +1,78 @@
+"""Hedge ratio dinâmico estimado por filtro de Kalman sobre os log-preços do par.
+
+Modelo: log P1_t = α_t + β_t log P2_t + ε_t, com α e β seguindo passeios aleatórios. O
+spread de cada barra é a inovação do filtro (log P1 menos a previsão feita com α e β da
+barra anterior), então não há look-ahead. Cada barra custa O(1): o estado é um vetor 2x1
+e uma covariância 2x2 atualizados com aritmética escalar.
+
+Com β, uma posição neutra em retorno tem na ação 2 um financeiro β vezes o da ação 1.
+"""
+import numpy as np
+import pandas as pd
+
+SPREAD_RATIO = 'Ratio (financeiro igual)'
+SPREAD_KALMAN = 'Hedge dinâmico (Kalman)'
+MODELOS_SPREAD = (SPREAD_RATIO, SPREAD_KALMAN)
+
+# Variância relativa do passeio aleatório de α e β e variância do erro de observação
+DELTA = 1e-5
+VARIANCIA_OBSERVACAO = 1e-4
+# Barras iniciais descartadas enquanto o filtro converge
+AQUECIMENTO = 20
+
+
+class FiltroKalmanHedge:
+    """Filtro de Kalman de (α, β) atualizado uma barra por vez."""
+
+    def __init__(self, delta=DELTA, variancia_observacao=VARIANCIA_OBSERVACAO):
+        self.ruido_estado = delta / (1.0 - delta)
+        self.variancia_observacao = variancia_observacao
+        self.alfa = 0.0
+        self.beta = 0.0
+        # Covariância do estado [[p_aa, p_ab], [p_ab, p_bb]], começando difusa
+        self._p_aa, self._p_ab, self._p_bb = 1.0, 0.0, 1.0
+        self.n = 0
+
+    def spread(self, log_preco1, log_preco2):
+        """Resíduo de log P1 contra a previsão atual, sem alterar o estado."""
+        return log_preco1 - (self.alfa + self.beta * log_preco2)
+
+    def atualizar(self, log_preco1, log_preco2):
+        """Incorpora uma barra e devolve o spread (inovação) dela; NaN durante o aquecimento."""
+        x = log_preco2
+        # Previsão: o estado é um passeio aleatório
+        r_aa = self._p_aa + self.ruido_estado
+        r_ab = self._p_ab
+        r_bb = self._p_bb + self.ruido_estado
+        erro = self.spread(log_preco1, x)
+        # Variância da inovação e ganho de Kalman
+        rx_a = r_aa + r_ab * x
+        rx_b = r_ab + r_bb * x
+        variancia = rx_a + rx_b * x + self.variancia_observacao
+        ganho_a = rx_a / variancia
+        ganho_b = rx_b / variancia
+        self.alfa += ganho_a * erro
+        self.beta += ganho_b * erro
+        self._p_aa = r_aa - ganho_a * rx_a
+        self._p_ab = r_ab - ganho_a * rx_b
+        self._p_bb = r_bb - ganho_b * rx_b
+        self.n += 1
+        return erro if self.n > AQUECIMENTO else np.nan
+
+
+def filtrar_hedge(precos1, precos2, delta=DELTA, variancia_observacao=VARIANCIA_OBSERVACAO):
+    """Roda o filtro sobre o histórico alinhado; devolve (DataFrame 'Alfa'/'Beta'/'Spread', filtro no fim).
+
+    'Alfa' e 'Beta' de cada data são os usados para calcular o 'Spread' daquela data
+    (estimados até a barra anterior).
+    """
+    filtro = FiltroKalmanHedge(delta, variancia_observacao)
+    log1 = np.log(precos1.to_numpy(dtype=np.float64))
+    log2 = np.log(precos2.to_numpy(dtype=np.float64))
+    alfas = np.empty(len(log1))
+    betas = np.empty(len(log1))
+    spreads = np.empty(len(log1))
+    for i in range(len(log1)):
+        alfas[i], betas[i] = filtro.alfa, filtro.beta
+        spreads[i] = filtro.atualizar(log1[i], log2[i])
+    return pd.DataFrame({'Alfa': alfas, 'Beta': betas, 'Spread': spreads}, index=precos1.index), filtro
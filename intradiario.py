@@ -0,0 +1,258 @@
+"""Barras intradiárias (1 e 5 minutos) em armazenamento colunar mapeado em memória, só de anexação.
+
+Cada símbolo/intervalo é uma pasta com um arquivo binário por coluna: 'tempo' (int64,
+nanossegundos UTC) e os OHLCV em float32. Gravar é anexar bytes ao fim dos arquivos; ler é
+`np.memmap`, então meses de barras de minuto de muitos símbolos abrem sem copiar nada e só
+as páginas realmente usadas entram na RAM. O recorte por data é uma busca binária na
+coluna de tempo.
+
+O arquivo de tempo é o último a ser anexado e define quantas barras existem: uma gravação
+interrompida deixa no máximo bytes sobrando nas outras colunas, descartados na próxima.
+
+B3 e os ETFs de commodity dos EUA negociam em horários diferentes. O alinhamento usa só as
+barras do pregão regular de cada mercado: as ações são completadas com o último preço do
+mesmo pregão e a commodity só aparece nos minutos em que o mercado americano está aberto.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import inicio_periodo
+from dados import baixar_lote
+
+DIRETORIO_PADRAO = os.environ.get(
+    'ARBITRAGEM_INTRADIARIO', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intradiario')
+)
+
+INTERVALO_DIARIO = '1d'
+FREQUENCIAS = {'Diária': INTERVALO_DIARIO, '5 minutos': '5m', '1 minuto': '1m'}
+DURACOES = {'1m': pd.Timedelta(minutes=1), '5m': pd.Timedelta(minutes=5)}
+# Histórico que o provedor aceita devolver por requisição para cada intervalo
+PERIODOS_PROVEDOR = {'1m': '7d', '5m': '60d'}
+ALCANCE_PROVEDOR = {'1m': pd.Timedelta(days=7), '5m': pd.Timedelta(days=59)}
+
+COLUNA_TEMPO = 'tempo'
+COLUNAS = ['Open', 'High', 'Low', 'Close', 'Volume']
+TIPO_TEMPO = np.dtype('<i8')
+TIPO_VALOR = np.dtype('<f4')
+
+# Pregão regular de cada mercado: (fuso, abertura, fechamento), em minutos desde a meia-noite local
+SESSOES = {
+    'B3': ('America/Sao_Paulo', 10 * 60, 17 * 60),
+    'EUA': ('America/New_York', 9 * 60 + 30, 16 * 60),
+}
+FUSO_EXIBICAO = 'America/Sao_Paulo'
+# Pregões por ano, usados para anualizar métricas
+DIAS_UTEIS_ANO = 252
+NS_POR_MINUTO = 60 * 10 ** 9
+NS_POR_DIA = 24 * 60 * NS_POR_MINUTO
+
+
+def barras_por_ano(intervalo, sessao='B3'):
+    """Barras de `intervalo` em um ano de pregões regulares, para anualizar métricas por barra."""
+    if intervalo not in DURACOES:
+        return DIAS_UTEIS_ANO
+    _, abertura, fechamento = SESSOES[sessao]
+    return DIAS_UTEIS_ANO * (fechamento - abertura) // int(DURACOES[intervalo] / pd.Timedelta(minutes=1))
+
+
+def sessao_do_simbolo(simbolo):
+    """Mercado do símbolo: 'B3' para os tickers '.SA', 'EUA' para os demais (ETFs de commodity)."""
+    return 'B3' if simbolo.upper().endswith('.SA') else 'EUA'
+
+
+def _indice_utc(indice):
+    """Índice em UTC com resolução de nanossegundos (a das colunas de tempo gravadas)."""
+    indice = indice.tz_convert('UTC') if indice.tz is not None else indice.tz_localize('UTC')
+    return indice.as_unit('ns')
+
+
+def _relogio_local(indice_utc, sessao):
+    """(dia local, minuto do dia local) de cada horário no fuso do mercado."""
+    local = indice_utc.tz_convert(SESSOES[sessao][0]).tz_localize(None).as_unit('ns').asi8
+    return local // NS_POR_DIA, (local % NS_POR_DIA) // NS_POR_MINUTO
+
+
+def _posicoes_na_sessao(indice_origem, grade, sessao, exigir_aberto=False):
+    """Posição, em `indice_origem`, da última barra do mesmo pregão em cada horário da `grade` (-1 se não houver).
+
+    Com `exigir_aberto`, horários da grade fora do pregão do mercado também ficam sem barra.
+    """
+    posicoes = np.searchsorted(indice_origem.asi8, grade.asi8, side='right') - 1
+    dia_grade, minuto_grade = _relogio_local(grade, sessao)
+    dia_origem, _ = _relogio_local(indice_origem, sessao)
+    validas = posicoes >= 0
+    validas[validas] = dia_origem[posicoes[validas]] == dia_grade[validas]
+    if exigir_aberto:
+        _, abertura, fechamento = SESSOES[sessao]
+        validas &= (minuto_grade >= abertura) & (minuto_grade < fechamento)
+    return np.where(validas, posicoes, -1)
+
+
+def barras_do_pregao(df, sessao):
+    """Só as barras do pregão regular do mercado (sem leilões e after-market), com índice em UTC."""
+    indice = _indice_utc(df.index)
+    _, minutos = _relogio_local(indice, sessao)
+    _, abertura, fechamento = SESSOES[sessao]
+    dentro = (minutos >= abertura) & (minutos < fechamento)
+    return df.set_axis(indice).iloc[np.flatnonzero(dentro)]
+
+
+def painel_intradiario(series, pernas, extras=(), dtype=np.float32):
+    """Painel horários x símbolos com os fechamentos intradiários alinhados por pregão.
+
+    A grade são os horários de pregão em que alguma perna negociou; em cada horário, cada
+    perna usa o último preço do mesmo pregão (minutos sem negócio não derrubam a barra) e
+    os horários anteriores ao primeiro negócio de alguma perna no dia são descartados. Os
+    `extras` seguem a mesma regra no pregão do seu mercado e ficam NaN fora dele. O índice
+    sai no horário de Brasília, sem fuso, como as datas do painel diário. Mesmo formato de
+    `painel_fechamentos`; devolve None se faltar perna ou horário em comum.
+    """
+    frames = {}
+    for simbolo in pernas:
+        df = series.get(simbolo)
+        if df is None or df.empty:
+            return None
+        frames[simbolo] = barras_do_pregao(df, sessao_do_simbolo(simbolo))
+    grade = frames[pernas[0]].index
+    for simbolo in pernas[1:]:
+        grade = grade.union(frames[simbolo].index)
+    if grade.empty:
+        return None
+
+    simbolos = list(dict.fromkeys([*pernas, *extras]))
+    valores = np.full((len(grade), len(simbolos)), np.nan, dtype=dtype)
+    completas = np.ones(len(grade), dtype=bool)
+    for coluna, simbolo in enumerate(simbolos):
+        perna = simbolo in frames
+        df = frames[simbolo] if perna else series.get(simbolo)
+        if df is None or df.empty:
+            continue
+        if not perna:
+            df = barras_do_pregao(df, sessao_do_simbolo(simbolo))
+        posicoes = _posicoes_na_sessao(df.index, grade, sessao_do_simbolo(simbolo), exigir_aberto=not perna)
+        encontradas = posicoes >= 0
+        valores[encontradas, coluna] = df['Close'].to_numpy()[posicoes[encontradas]]
+        if perna:
+            completas &= encontradas
+    if not completas.any():
+        return None
+    indice = grade[completas].tz_convert(FUSO_EXIBICAO).tz_localize(None).rename('Datetime')
+    return pd.DataFrame(valores[completas], index=indice, columns=simbolos, copy=False)
+
+
+class ArmazemIntradiario:
+    """Barras intradiárias por símbolo e intervalo em colunas binárias mapeadas em memória."""
+
+    def __init__(self, diretorio=None, provedor=None):
+        self.diretorio = diretorio or DIRETORIO_PADRAO
+        self.provedor = provedor
+        self._lock = threading.Lock()
+
+    def _pasta(self, simbolo, intervalo):
+        return os.path.join(self.diretorio, intervalo, simbolo)
+
+    def _arquivo(self, simbolo, intervalo, coluna):
+        return os.path.join(self._pasta(simbolo, intervalo), f'{coluna}.bin')
+
+    def _contar(self, simbolo, intervalo):
+        """Número de barras gravadas (definido pelo arquivo de tempo)."""
+        caminho = self._arquivo(simbolo, intervalo, COLUNA_TEMPO)
+        return os.path.getsize(caminho) // TIPO_TEMPO.itemsize if os.path.exists(caminho) else 0
+
+    def _mapear(self, simbolo, intervalo, coluna, tipo, n):
+        if n == 0:
+            return np.empty(0, dtype=tipo)
+        return np.memmap(self._arquivo(simbolo, intervalo, coluna), dtype=tipo, mode='r', shape=(n,))
+
+    def ultimo_horario(self, simbolo, intervalo):
+        """Horário (UTC) da última barra gravada, ou None."""
+        n = self._contar(simbolo, intervalo)
+        if n == 0:
+            return None
+        tempos = self._mapear(simbolo, intervalo, COLUNA_TEMPO, TIPO_TEMPO, n)
+        return pd.Timestamp(int(tempos[-1]), unit='ns', tz='UTC')
+
+    def anexar(self, simbolo, intervalo, dados):
+        """Anexa as barras posteriores à última gravada; devolve quantas foram anexadas."""
+        if dados is None or dados.empty:
+            return 0
+        tempos = _indice_utc(dados.index).asi8
+        with self._lock:
+            n = self._contar(simbolo, intervalo)
+            ultimo = self.ultimo_horario(simbolo, intervalo)
+            novas = np.flatnonzero(tempos > ultimo.value) if ultimo is not None else np.arange(len(tempos))
+            if len(novas) == 0:
+                return 0
+            os.makedirs(self._pasta(simbolo, intervalo), exist_ok=True)
+            for coluna in COLUNAS:
+                valores = dados[coluna].to_numpy(dtype=TIPO_VALOR)[novas] if coluna in dados.columns else np.full(len(novas), np.nan, dtype=TIPO_VALOR)
+                with open(self._arquivo(simbolo, intervalo, coluna), 'ab') as arquivo:
+                    # Descarta o que sobrou de uma gravação interrompida antes de anexar
+                    arquivo.truncate(n * TIPO_VALOR.itemsize)
+                    arquivo.write(np.ascontiguousarray(valores).tobytes())
+            with open(self._arquivo(simbolo, intervalo, COLUNA_TEMPO), 'ab') as arquivo:
+                arquivo.write(np.ascontiguousarray(tempos[novas], dtype=TIPO_TEMPO).tobytes())
+        return len(novas)
+
+    def descartar(self, simbolo):
+        """Apaga as barras do símbolo em todos os intervalos (ex.: após um desdobramento), para serem baixadas de novo."""
+        with self._lock:
+            for intervalo in DURACOES:
+                # O arquivo de tempo primeiro: sem ele o símbolo já conta como vazio
+                for coluna in (COLUNA_TEMPO, *COLUNAS):
+                    caminho = self._arquivo(simbolo, intervalo, coluna)
+                    if os.path.exists(caminho):
+                        os.remove(caminho)
+
+    def ler(self, simbolo, intervalo, inicio=None, colunas=('Close',)):
+        """Barras gravadas desde `inicio` (UTC se sem fuso) como DataFrame que aponta para o mapa, sem cópia.
+
+        Cada coluna pedida é uma visão do arquivo mapeado, então os dados só são lidos do disco
+        quando usados. Devolve None se não houver barras.
+        """
+        n = self._contar(simbolo, intervalo)
+        tempos = self._mapear(simbolo, intervalo, COLUNA_TEMPO, TIPO_TEMPO, n)
+        primeira = 0
+        if inicio is not None:
+            inicio = pd.Timestamp(inicio)
+            inicio = inicio.tz_convert('UTC') if inicio.tzinfo is not None else inicio.tz_localize('UTC')
+            primeira = int(np.searchsorted(tempos, inicio.value, side='left'))
+        if primeira >= n:
+            return None
+        indice = pd.DatetimeIndex(tempos[primeira:].view('M8[ns]'), name='Datetime').tz_localize('UTC')
+        return pd.DataFrame(
+            {coluna: self._mapear(simbolo, intervalo, coluna, TIPO_VALOR, n)[primeira:] for coluna in colunas},
+            index=indice, copy=False,
+        )
+
+    def atualizar(self, simbolos, intervalo, agora=None):
+        """Baixa e anexa as barras fechadas que faltam, agrupando os downloads pela data inicial.
+
+        Cada símbolo rebaixa a partir do dia da última barra gravada; se ela for mais antiga
+        que o alcance do provedor, baixa o período máximo que ele aceita (o buraco fica).
+        A barra em formação (que ainda não fechou) nunca é gravada.
+        """
+        agora = pd.Timestamp.now(tz='UTC') if agora is None else pd.Timestamp(agora)
+        grupos = {}
+        for simbolo in dict.fromkeys(simbolos):
+            ultimo = self.ultimo_horario(simbolo, intervalo)
+            if ultimo is None or agora - ultimo > ALCANCE_PROVEDOR[intervalo]:
+                grupos.setdefault(None, []).append(simbolo)
+            else:
+                grupos.setdefault(ultimo.strftime('%Y-%m-%d'), []).append(simbolo)
+        for inicio, grupo in grupos.items():
+            frames = baixar_lote(grupo, periodo=PERIODOS_PROVEDOR[intervalo], intervalo=intervalo,
+                                 provedor=self.provedor, inicio=inicio)
+            for simbolo, dados in frames.items():
+                if dados is None:
+                    continue
+                fechadas = _indice_utc(dados.index) + DURACOES[intervalo] <= agora
+                self.anexar(simbolo, intervalo, dados.iloc[np.flatnonzero(fechadas)])
+
+    def series(self, simbolos, intervalo, periodo='1mo'):
+        """{símbolo: DataFrame (mapeado em memória) ou None} desde o início do período."""
+        inicio = inicio_periodo(periodo).tz_localize(FUSO_EXIBICAO)
+        return {simbolo: self.ler(simbolo, intervalo, inicio=inicio) for simbolo in dict.fromkeys(simbolos)}
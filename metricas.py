@@ -0,0 +1,180 @@
+"""Instrumentação do processo: tempo de cada etapa, contadores e exportação das métricas.
+
+Um único registro por processo (`REGISTRO`) é compartilhado pelas sessões do dashboard, pelo
+serviço de dados e pelo monitor, então os percentis refletem a carga real de todos os
+usuários. As durações ficam em uma janela circular por etapa (as últimas JANELA_AMOSTRAS
+execuções); as contagens e os contadores são cumulativos desde o início do processo, como o
+Prometheus espera.
+
+A exportação é em texto do Prometheus (`prometheus()`) ou uma linha JSON por snapshot
+(`linha_json()`). Com ARBITRAGEM_METRICAS_PROM e/ou ARBITRAGEM_METRICAS_JSONL, `publicar()`
+grava o arquivo .prom (para o textfile collector do node_exporter) e anexa a linha JSON.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Execuções mais recentes de cada etapa usadas nos percentis
+JANELA_AMOSTRAS = 2048
+PREFIXO = 'arbitragem'
+QUANTIS = (0.5, 0.95, 0.99)
+
+CAMINHO_PROMETHEUS = os.environ.get('ARBITRAGEM_METRICAS_PROM')
+CAMINHO_JSONL = os.environ.get('ARBITRAGEM_METRICAS_JSONL')
+
+COLUNAS_ETAPAS = ['Etapa', 'Execuções', 'Média (ms)', 'p50 (ms)', 'p95 (ms)', 'Máx. (ms)']
+COLUNAS_CONTADORES = ['Métrica', 'Rótulos', 'Valor']
+
+
+def _rotulos_prometheus(rotulos):
+    if not rotulos:
+        return ''
+    escapados = ((nome, str(valor).replace('\\', '\\\\').replace('"', '\\"')) for nome, valor in rotulos)
+    return '{' + ','.join(f'{nome}="{valor}"' for nome, valor in escapados) + '}'
+
+
+def _nome_prometheus(nome):
+    return f"{PREFIXO}_{re.sub(r'[^a-zA-Z0-9_]', '_', nome)}"
+
+
+class RegistroMetricas:
+    """Durações por etapa e contadores com rótulos, thread-safe."""
+
+    def __init__(self, janela=JANELA_AMOSTRAS):
+        self.janela = janela
+        self._lock = threading.Lock()
+        self._duracoes = {}
+        # {etapa: [execuções, soma dos segundos]}
+        self._totais = {}
+        # {(nome, ((rótulo, valor), ...)): valor}
+        self._contadores = {}
+
+    def registrar(self, etapa, segundos):
+        """Registra uma execução de `etapa` com a duração informada."""
+        with self._lock:
+            if etapa not in self._duracoes:
+                self._duracoes[etapa] = deque(maxlen=self.janela)
+                self._totais[etapa] = [0, 0.0]
+            self._duracoes[etapa].append(segundos)
+            self._totais[etapa][0] += 1
+            self._totais[etapa][1] += segundos
+
+    @contextmanager
+    def cronometrar(self, etapa):
+        """Mede o bloco e registra a duração em `etapa`, inclusive se ele levantar exceção."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio)
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        """Soma `valor` ao contador `nome` com os rótulos informados (zero não cria a série)."""
+        if not valor:
+            return
+        chave = (nome, tuple(sorted((r, str(v)) for r, v in rotulos.items())))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def _copiar(self):
+        with self._lock:
+            duracoes = {etapa: np.fromiter(valores, dtype=np.float64) for etapa, valores in self._duracoes.items()}
+            return duracoes, {e: tuple(t) for e, t in self._totais.items()}, dict(self._contadores)
+
+    def etapas(self):
+        """Resumo por etapa: execuções (cumulativas) e média/percentis da janela recente, em ms."""
+        duracoes, totais, _ = self._copiar()
+        linhas = [
+            {
+                'Etapa': etapa,
+                'Execuções': totais[etapa][0],
+                'Média (ms)': 1e3 * valores.mean(),
+                'p50 (ms)': 1e3 * np.percentile(valores, 50),
+                'p95 (ms)': 1e3 * np.percentile(valores, 95),
+                'Máx. (ms)': 1e3 * valores.max(),
+            }
+            for etapa, valores in sorted(duracoes.items())
+        ]
+        return pd.DataFrame(linhas, columns=COLUNAS_ETAPAS)
+
+    def contadores(self):
+        """Contadores cumulativos, um por combinação de rótulos."""
+        _, _, contadores = self._copiar()
+        linhas = [
+            {'Métrica': nome, 'Rótulos': ', '.join(f'{r}={v}' for r, v in rotulos), 'Valor': valor}
+            for (nome, rotulos), valor in sorted(contadores.items())
+        ]
+        return pd.DataFrame(linhas, columns=COLUNAS_CONTADORES)
+
+    def prometheus(self):
+        """Métricas no formato de texto de exposição do Prometheus."""
+        duracoes, totais, contadores = self._copiar()
+        nome_etapas = _nome_prometheus('etapa_segundos')
+        linhas = [f'# HELP {nome_etapas} Duração das etapas (quantis das últimas {self.janela} execuções).',
+                  f'# TYPE {nome_etapas} summary']
+        for etapa, valores in sorted(duracoes.items()):
+            for quantil in QUANTIS:
+                rotulos = _rotulos_prometheus((('etapa', etapa), ('quantile', quantil)))
+                linhas.append(f'{nome_etapas}{rotulos} {np.quantile(valores, quantil):.6g}')
+            rotulos = _rotulos_prometheus((('etapa', etapa),))
+            linhas.append(f'{nome_etapas}_sum{rotulos} {totais[etapa][1]:.6g}')
+            linhas.append(f'{nome_etapas}_count{rotulos} {totais[etapa][0]}')
+
+        por_nome = {}
+        for (nome, rotulos), valor in sorted(contadores.items()):
+            por_nome.setdefault(nome, []).append((rotulos, valor))
+        for nome, series in por_nome.items():
+            nome_total = _nome_prometheus(nome) + '_total'
+            linhas.append(f'# TYPE {nome_total} counter')
+            linhas.extend(f'{nome_total}{_rotulos_prometheus(rotulos)} {valor:.6g}' for rotulos, valor in series)
+        return '\n'.join(linhas) + '\n'
+
+    def linha_json(self, agora=None):
+        """Snapshot das etapas e contadores como uma linha JSON (sem quebra no fim)."""
+        agora = pd.Timestamp.now(tz='UTC') if agora is None else pd.Timestamp(agora)
+        etapas = self.etapas()
+        contadores = self.contadores()
+        return json.dumps({
+            'horario': agora.isoformat(),
+            'pid': os.getpid(),
+            'etapas': json.loads(etapas.to_json(orient='records')),
+            'contadores': json.loads(contadores.to_json(orient='records')),
+        }, ensure_ascii=False)
+
+    def publicar(self, caminho_prometheus=None, caminho_jsonl=None):
+        """Grava o .prom (troca atômica) e anexa um snapshot ao JSON lines, nos caminhos configurados."""
+        caminho_prometheus = caminho_prometheus or CAMINHO_PROMETHEUS
+        caminho_jsonl = caminho_jsonl or CAMINHO_JSONL
+        if caminho_prometheus:
+            temporario = f'{caminho_prometheus}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(self.prometheus())
+            os.replace(temporario, caminho_prometheus)
+        if caminho_jsonl:
+            with open(caminho_jsonl, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(self.linha_json() + '\n')
+
+    def zerar(self):
+        with self._lock:
+            self._duracoes.clear()
+            self._totais.clear()
+            self._contadores.clear()
+
+
+# Registro compartilhado por todo o processo
+REGISTRO = RegistroMetricas()
+
+
+def cronometrar(etapa):
+    return REGISTRO.cronometrar(etapa)
+
+
+def incrementar(nome, valor=1, **rotulos):
+    REGISTRO.incrementar(nome, valor, **rotulos)
@@ -0,0 +1,299 @@
+"""Monitor de sinais em segundo plano, com o último sinal de cada par materializado em SQLite.
+
+A cada ciclo o monitor atualiza as séries e as cotações dos pares configurados e avalia a
+regra de z-score. O estado de cada par (motor incremental) fica em memória: barras novas
+custam O(1) cada e a cotação ao vivo é avaliada sem alterar o estado. O resultado vai para
+a tabela `sinais_atuais` (uma linha por par e configuração da regra) e toda mudança de
+sinal é registrada em `cruzamentos` e repassada aos ganchos de alerta.
+
+A fonte de dados é qualquer objeto com `series(simbolos, periodo)` e `cotacoes(simbolos)`
+como o `ServicoDados`, o que permite rodar o monitor com um feed de preços local falso.
+
+    python monitor.py PETR3.SA:PETR4.SA ITUB3.SA:ITUB4.SA --intervalo 60
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import CAMINHO_PADRAO, TOLERANCIA_AJUSTE
+from hedge_dinamico import SPREAD_KALMAN, SPREAD_RATIO
+from metricas import REGISTRO, cronometrar, incrementar
+from motor_zscore import AMOSTRA_COMPLETA, MODOS
+from sinais import PERIODOS, analisar_par, decidir, ler_par, periodo_estatisticas, valor_spread
+
+# Segundos entre ciclos
+INTERVALO_PADRAO = 60.0
+
+COLUNAS_SINAIS = ['Ação 1', 'Ação 2', 'Configuração', 'Data Barra', 'Horário', 'Ratio', 'Z-Score', 'Sinal']
+COLUNAS_CRUZAMENTOS = ['Horário', 'Ação 1', 'Ação 2', 'Configuração', 'Sinal Anterior', 'Sinal', 'Ratio', 'Z-Score']
+
+
+def descrever_configuracao(periodo, metodo, janela, limite, modelo_spread):
+    """Identificador da configuração da regra, parte da chave dos sinais gravados."""
+    return f"{periodo}|{metodo}|{janela}|{limite:g}|{modelo_spread}"
+
+
+def _colunas(conn, tabela):
+    return {linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")}
+
+
+def _conectar(caminho):
+    conn = sqlite3.connect(caminho or CAMINHO_PADRAO, timeout=30)
+    # Bancos de versões anteriores: a chave era só o par; os sinais atuais são refeitos no
+    # próximo ciclo, então a tabela é recriada, e o histórico de cruzamentos ganha a coluna
+    if 'configuracao' not in _colunas(conn, 'sinais_atuais'):
+        conn.execute("DROP TABLE IF EXISTS sinais_atuais")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS sinais_atuais (
+            acao1 TEXT NOT NULL,
+            acao2 TEXT NOT NULL,
+            configuracao TEXT NOT NULL,
+            data_barra TEXT,
+            horario TEXT NOT NULL,
+            ratio REAL, z_score REAL, sinal TEXT,
+            PRIMARY KEY (acao1, acao2, configuracao)
+        )"""
+    )
+    colunas_cruzamentos = _colunas(conn, 'cruzamentos')
+    if colunas_cruzamentos and 'configuracao' not in colunas_cruzamentos:
+        conn.execute("ALTER TABLE cruzamentos ADD COLUMN configuracao TEXT")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS cruzamentos (
+            horario TEXT NOT NULL,
+            acao1 TEXT NOT NULL,
+            acao2 TEXT NOT NULL,
+            sinal_anterior TEXT, sinal TEXT,
+            ratio REAL, z_score REAL,
+            configuracao TEXT
+        )"""
+    )
+    return conn
+
+
+def ler_sinais(caminho=None):
+    """Último sinal gravado pelo monitor para cada par (DataFrame, vazio se o monitor nunca rodou)."""
+    with _conectar(caminho) as conn:
+        linhas = conn.execute(
+            "SELECT acao1, acao2, configuracao, data_barra, horario, ratio, z_score, sinal FROM sinais_atuais "
+            "ORDER BY acao1, acao2, configuracao"
+        ).fetchall()
+    return pd.DataFrame(linhas, columns=COLUNAS_SINAIS)
+
+
+def ler_cruzamentos(caminho=None, limite=50):
+    """Mudanças de sinal mais recentes registradas pelo monitor."""
+    with _conectar(caminho) as conn:
+        linhas = conn.execute(
+            "SELECT horario, acao1, acao2, configuracao, sinal_anterior, sinal, ratio, z_score FROM cruzamentos "
+            "ORDER BY horario DESC LIMIT ?", (limite,)
+        ).fetchall()
+    return pd.DataFrame(linhas, columns=COLUNAS_CRUZAMENTOS)
+
+
+class MonitorSinais:
+    """Avalia periodicamente a regra de z-score de uma lista de pares e grava o resultado.
+
+    `ao_cruzar` recebe uma lista de ganchos chamados com o dicionário do cruzamento sempre
+    que o sinal de um par muda (erros dos ganchos não interrompem o monitor). Monitores com
+    configurações diferentes (período, método, janela, limite, modelo) podem dividir o banco:
+    os sinais de cada um ficam em linhas próprias.
+
+    Só as barras fechadas entram no estado incremental; a última barra da série pode ser um
+    pregão em andamento e é avaliada à parte, como a cotação ao vivo. Se um fechamento já
+    incorporado muda (histórico reajustado por desdobramento ou dividendo), o estado do par é
+    refeito. Com AMOSTRA_COMPLETA não há estado incremental: a média e o desvio dependem de
+    todo o período, cuja janela anda junto com as datas, então `analisar_par` roda completo
+    a cada ciclo (O(n) por par, contra O(1) por barra nova nos demais métodos).
+    """
+
+    def __init__(self, pares, fonte=None, caminho_banco=None, periodo='1y', metodo=AMOSTRA_COMPLETA,
+                 janela=60, limite=1.0, intervalo=INTERVALO_PADRAO, ao_cruzar=(), modelo_spread=SPREAD_RATIO):
+        self.pares = [tuple(par) for par in pares]
+        if fonte is None:
+            from servico_dados import ServicoDados
+            fonte = ServicoDados(caminho_banco=caminho_banco)
+        self.fonte = fonte
+        self.caminho = caminho_banco or getattr(getattr(fonte, 'armazem', None), 'caminho', None) or CAMINHO_PADRAO
+        self.periodo = periodo
+        self.metodo = metodo
+        self.janela = janela
+        self.limite = limite
+        self.modelo_spread = modelo_spread
+        self.intervalo = intervalo
+        self.ao_cruzar = list(ao_cruzar)
+        self.configuracao = descrever_configuracao(periodo, metodo, janela, limite, modelo_spread)
+        # {par: {'motor', 'filtro', 'data' e 'fechamentos' da última barra incorporada}}
+        self._estados = {}
+        self._parar = threading.Event()
+        self._thread = None
+        with _conectar(self.caminho) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    def _sinais_anteriores(self):
+        with _conectar(self.caminho) as conn:
+            linhas = conn.execute(
+                "SELECT acao1, acao2, sinal FROM sinais_atuais WHERE configuracao = ?", (self.configuracao,)
+            ).fetchall()
+        return {(a1, a2): sinal for a1, a2, sinal in linhas}
+
+    def _atualizar_motor(self, par, fechamentos):
+        """Incorpora ao estado do par as barras fechadas de `fechamentos` e devolve o estado (ou None).
+
+        `fechamentos` tem os closes das duas pernas nas datas comuns; a última linha fica de
+        fora (pode ser parcial). O estado é refeito do zero no primeiro ciclo, com
+        AMOSTRA_COMPLETA ou se o fechamento da última barra incorporada mudou no banco.
+        """
+        finais = fechamentos.iloc[:-1]
+        if finais.empty:
+            self._estados.pop(par, None)
+            return None
+        estado = self._estados.get(par)
+        if estado is not None and self.metodo != AMOSTRA_COMPLETA and estado['data'] in finais.index:
+            gravados = finais.loc[estado['data']].to_numpy(dtype=np.float64)
+            if np.allclose(gravados, estado['fechamentos'], rtol=TOLERANCIA_AJUSTE, atol=0.0):
+                novas = finais.loc[finais.index > estado['data']]
+                for preco1, preco2 in novas.to_numpy(dtype=np.float64):
+                    valor = valor_spread(estado, preco1, preco2, atualizar=True)
+                    if not np.isnan(valor):
+                        estado['motor'].atualizar(valor)
+                if not novas.empty:
+                    estado['data'] = novas.index[-1]
+                    estado['fechamentos'] = novas.iloc[-1].to_numpy(dtype=np.float64)
+                return estado
+
+        # Primeiro ciclo, amostra completa (a janela do período anda junto com as datas) ou histórico reajustado
+        acao1, acao2 = par
+        periodo_busca = periodo_estatisticas(self.periodo, self.metodo)
+        analise = analisar_par(None, acao1, acao2, periodo_busca=periodo_busca, periodo_valor=periodo_busca,
+                               metodo=self.metodo, janela=self.janela, modelo_spread=self.modelo_spread,
+                               painel=finais)
+        if analise is None or analise['ratio'].empty:
+            self._estados.pop(par, None)
+            return None
+        estado = {'motor': analise['motor'], 'filtro': analise['filtro'], 'data': finais.index[-1],
+                  'fechamentos': finais.iloc[-1].to_numpy(dtype=np.float64)}
+        self._estados[par] = estado
+        return estado
+
+    def ciclo(self, agora=None):
+        """Executa uma rodada de avaliação de todos os pares; devolve os cruzamentos detectados."""
+        agora = pd.Timestamp.now(tz='UTC') if agora is None else pd.Timestamp(agora)
+        simbolos = tuple(dict.fromkeys(s for par in self.pares for s in par))
+        series, _ = self.fonte.series(simbolos, periodo=periodo_estatisticas(self.periodo, self.metodo))
+        snapshot, _ = self.fonte.cotacoes(simbolos)
+        precos = {s: float(p) for s, p in snapshot['Preço'].items() if pd.notna(p)}
+        anteriores = self._sinais_anteriores()
+
+        linhas, cruzamentos = [], []
+        for par in self.pares:
+            acao1, acao2 = par
+            if series.get(acao1) is None or series.get(acao2) is None:
+                continue
+            fechamentos = pd.concat([series[acao1]['Close'], series[acao2]['Close']], axis=1, join='inner',
+                                    keys=[acao1, acao2]).dropna()
+            estado = self._atualizar_motor(par, fechamentos)
+            if estado is None:
+                continue
+            data_barra = fechamentos.index[-1]
+            if precos.get(acao1) and precos.get(acao2):
+                preco1, preco2 = precos[acao1], precos[acao2]
+            else:
+                # Sem cotação, avalia o último fechamento (ainda fora do estado) sem incorporá-lo
+                preco1, preco2 = fechamentos.iloc[-1].to_numpy(dtype=np.float64)
+            ratio = float(preco1 / preco2)
+            z_score = float(estado['motor'].zscore(valor_spread(estado, preco1, preco2)))
+            sinal = decidir(z_score, self.limite, acao1, acao2)
+            z_gravado = None if np.isnan(z_score) else z_score
+            linhas.append((acao1, acao2, self.configuracao, data_barra.strftime('%Y-%m-%d'), agora.isoformat(),
+                           ratio, z_gravado, sinal))
+            anterior = anteriores.get(par)
+            if anterior is not None and anterior != sinal:
+                cruzamentos.append({
+                    'Horário': agora.isoformat(), 'Ação 1': acao1, 'Ação 2': acao2, 'Configuração': self.configuracao,
+                    'Sinal Anterior': anterior, 'Sinal': sinal, 'Ratio': ratio, 'Z-Score': z_gravado,
+                })
+
+        colunas = ', '.join(['horario', 'acao1', 'acao2', 'configuracao', 'sinal_anterior', 'sinal', 'ratio', 'z_score'])
+        with _conectar(self.caminho) as conn:
+            conn.executemany("INSERT OR REPLACE INTO sinais_atuais VALUES (?, ?, ?, ?, ?, ?, ?, ?)", linhas)
+            conn.executemany(
+                f"INSERT INTO cruzamentos ({colunas}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [tuple(c[coluna] for coluna in COLUNAS_CRUZAMENTOS) for c in cruzamentos],
+            )
+        for cruzamento in cruzamentos:
+            for gancho in self.ao_cruzar:
+                try:
+                    gancho(cruzamento)
+                except Exception:
+                    pass
+        return cruzamentos
+
+    def executar(self, ciclos=None):
+        """Roda ciclos a cada `intervalo` segundos até `parar()` (ou até `ciclos` rodadas)."""
+        executados = 0
+        while not self._parar.is_set() and (ciclos is None or executados < ciclos):
+            try:
+                with cronometrar('monitor_ciclo'):
+                    cruzamentos = self.ciclo()
+                incrementar('monitor_cruzamentos', len(cruzamentos))
+                # Grava as métricas nos arquivos configurados (ARBITRAGEM_METRICAS_*)
+                REGISTRO.publicar()
+            except Exception as e:
+                # Falha de rede/provedor em um ciclo não derruba o monitor
+                incrementar('monitor_falhas')
+                print(f"Falha no ciclo do monitor: {e}", file=sys.stderr)
+            executados += 1
+            if ciclos is None or executados < ciclos:
+                self._parar.wait(self.intervalo)
+
+    def iniciar(self):
+        """Inicia o monitor em uma thread daemon."""
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self.executar, name='monitor-sinais', daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def parar(self, timeout=None):
+        """Sinaliza a parada e aguarda o ciclo em andamento terminar."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def _imprimir_cruzamento(cruzamento):
+    print(f"{cruzamento['Horário']} {cruzamento['Ação 1']}/{cruzamento['Ação 2']}: "
+          f"{cruzamento['Sinal Anterior']} -> {cruzamento['Sinal']} (z={cruzamento['Z-Score']})", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor de sinais de pair trading em segundo plano.")
+    parser.add_argument('pares', nargs='+', type=ler_par, metavar='ACAO1:ACAO2')
+    parser.add_argument('--periodo', choices=PERIODOS, default='1y')
+    parser.add_argument('--metodo', choices=MODOS, default=AMOSTRA_COMPLETA)
+    parser.add_argument('--janela', type=int, default=60, help="janela móvel ou meia-vida EWMA, em dias")
+    parser.add_argument('--limite', type=float, default=1.0, help="limite de |z-score| para entrada")
+    parser.add_argument('--kalman', action='store_true', help="spread com hedge ratio dinâmico (filtro de Kalman)")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_PADRAO, help="segundos entre ciclos")
+    parser.add_argument('--ciclos', type=int, default=None, help="encerra após N ciclos")
+    parser.add_argument('--banco', default=None, help="caminho do banco SQLite local")
+    args = parser.parse_args(argv)
+
+    monitor = MonitorSinais(
+        args.pares, caminho_banco=args.banco, periodo=args.periodo, metodo=args.metodo,
+        janela=args.janela, limite=args.limite, intervalo=args.intervalo, ao_cruzar=[_imprimir_cruzamento],
+        modelo_spread=SPREAD_KALMAN if args.kalman else SPREAD_RATIO,
+    )
+    try:
+        monitor.executar(ciclos=args.ciclos)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Motor de z-score do ratio: amostra completa, janela móvel e média exponencial (EWMA).
+
+O histórico é calculado de forma vetorizada (pandas) e o estado final alimenta um motor
+incremental, que atualiza média e desvio em O(1) a cada nova barra ou cotação ao vivo.
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+AMOSTRA_COMPLETA = 'Amostra completa'
+JANELA_MOVEL = 'Janela móvel'
+EWMA = 'EWMA'
+MODOS = (AMOSTRA_COMPLETA, JANELA_MOVEL, EWMA)
+
+
+class ZScoreAcumulado:
+    """Média e desvio de toda a amostra pelo algoritmo de Welford."""
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self._m2 = 0.0
+
+    @property
+    def desvio(self):
+        return np.sqrt(self._m2 / self.n) if self.n > 0 else np.nan
+
+    def atualizar(self, valor):
+        """Inclui uma nova observação e devolve o z-score dela."""
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self._m2 += delta * (valor - self.media)
+        return self.zscore(valor)
+
+    def zscore(self, valor):
+        """Z-score de `valor` com as estatísticas atuais, sem alterar o estado."""
+        desvio = self.desvio
+        if not desvio > 0:
+            return np.nan
+        return (valor - self.media) / desvio
+
+
+class ZScoreJanela(ZScoreAcumulado):
+    """Média e desvio das últimas `janela` observações (Welford com remoção)."""
+
+    def __init__(self, janela):
+        super().__init__()
+        self.janela = int(janela)
+        self._valores = deque()
+
+    @property
+    def desvio(self):
+        # Só há estatística válida com a janela completa, como no rolling do pandas
+        if self.n < self.janela:
+            return np.nan
+        return np.sqrt(max(self._m2, 0.0) / self.n)
+
+    def atualizar(self, valor):
+        self._valores.append(valor)
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self._m2 += delta * (valor - self.media)
+        if self.n > self.janela:
+            antigo = self._valores.popleft()
+            self.n -= 1
+            delta = antigo - self.media
+            self.media -= delta / self.n
+            self._m2 -= delta * (antigo - self.media)
+        return self.zscore(valor)
+
+
+class ZScoreEWMA(ZScoreAcumulado):
+    """Média e variância exponencialmente ponderadas com meia-vida em barras."""
+
+    def __init__(self, meia_vida):
+        super().__init__()
+        self.meia_vida = float(meia_vida)
+        self.alpha = 1.0 - np.exp(np.log(0.5) / self.meia_vida)
+        self._variancia = 0.0
+
+    @property
+    def desvio(self):
+        return np.sqrt(self._variancia) if self.n > 1 else np.nan
+
+    def atualizar(self, valor):
+        self.n += 1
+        if self.n == 1:
+            self.media = float(valor)
+            return np.nan
+        delta = valor - self.media
+        self.media += self.alpha * delta
+        self._variancia = (1.0 - self.alpha) * (self._variancia + self.alpha * delta * delta)
+        return self.zscore(valor)
+
+
+def criar_motor(modo=AMOSTRA_COMPLETA, janela=60):
+    """Cria o motor incremental do modo escolhido (`janela` é a meia-vida no EWMA)."""
+    if modo == JANELA_MOVEL:
+        return ZScoreJanela(janela)
+    if modo == EWMA:
+        return ZScoreEWMA(janela)
+    return ZScoreAcumulado()
+
+
+def calcular_zscore(ratio, modo=AMOSTRA_COMPLETA, janela=60):
+    """Calcula média, desvio e z-score do ratio ao longo do histórico.
+
+    Devolve um DataFrame com as colunas 'Média', 'Desvio' e 'Z-Score' no índice do ratio
+    (sem NaNs). No modo 'Amostra completa' todas as datas usam a média e o desvio da amostra
+    inteira, como o `scipy.stats.zscore`; nos demais cada data só usa dados até ela.
+    """
+    ratio = ratio.dropna().astype(np.float64)
+    if modo == JANELA_MOVEL:
+        janela = int(janela)
+        media = ratio.rolling(janela).mean()
+        desvio = ratio.rolling(janela).std(ddof=0)
+    elif modo == EWMA:
+        ewm = ratio.ewm(halflife=janela, adjust=False)
+        media = ewm.mean()
+        desvio = np.sqrt(ewm.var(bias=True))
+        desvio.iloc[:1] = np.nan
+    else:
+        media = pd.Series(ratio.mean(), index=ratio.index)
+        desvio = pd.Series(ratio.std(ddof=0), index=ratio.index)
+    z_score = (ratio - media) / desvio.where(desvio > 0)
+    return pd.DataFrame({'Média': media, 'Desvio': desvio, 'Z-Score': z_score})
+
+
+def motor_de_serie(ratio, modo=AMOSTRA_COMPLETA, janela=60):
+    """Cria um motor incremental já posicionado no fim do histórico do ratio.
+
+    A partir daí, cada nova barra custa O(1) via `atualizar` e uma cotação ao vivo pode
+    ser avaliada com `zscore` sem alterar o estado.
+    """
+    motor = criar_motor(modo, janela)
+    valores = ratio.dropna().to_numpy(dtype=np.float64)
+    if modo == JANELA_MOVEL:
+        # Só a última janela influencia o estado
+        valores = valores[-motor.janela:]
+    elif modo == EWMA and len(valores) > 1:
+        # Reaproveita a recursão vetorizada do pandas em vez de iterar em Python
+        ewm = pd.Series(valores).ewm(halflife=janela, adjust=False)
+        motor.n = len(valores)
+        motor.media = float(ewm.mean().iloc[-1])
+        motor._variancia = float(ewm.var(bias=True).iloc[-1])
+        return motor
+    elif modo == AMOSTRA_COMPLETA and len(valores) > 0:
+        motor.n = len(valores)
+        motor.media = float(valores.mean())
+        motor._m2 = float(((valores - motor.media) ** 2).sum())
+        return motor
+    for valor in valores:
+        motor.atualizar(valor)
+    return motor
@@ -0,0 +1,49 @@
+"""Alinhamento dos fechamentos de vários símbolos em painéis datas x símbolos.
+
+`painel_fechamentos` junta as pernas de um par nas datas comuns (a base de ratio, z-score,
+gráfico e tabela); `montar_matriz_fechamentos` junta o universo inteiro na união das datas
+para o scanner. O alinhamento intradiário, por pregão, fica em `intradiario`.
+"""
+import numpy as np
+import pandas as pd
+
+
+def painel_fechamentos(series, pernas, extras=(), dtype=np.float32):
+    """Monta um painel datas x símbolos só com os fechamentos, alinhado nas datas comuns às `pernas`.
+
+    Os `extras` (ex.: a commodity) são reindexados nessas datas, com NaN onde não houver
+    preço. Todas as colunas ficam em um único array `dtype`, então ratio, z-score, gráfico e
+    tabela leem do mesmo bloco sem copiar os OHLCV inteiros. Devolve None se faltar alguma
+    perna ou se não houver datas em comum.
+    """
+    frames = [series.get(simbolo) for simbolo in pernas]
+    if any(df is None or df.empty for df in frames):
+        return None
+    indice = frames[0].index
+    for df in frames[1:]:
+        indice = indice.intersection(df.index)
+    if indice.empty:
+        return None
+
+    simbolos = list(dict.fromkeys([*pernas, *extras]))
+    valores = np.full((len(indice), len(simbolos)), np.nan, dtype=dtype)
+    for coluna, simbolo in enumerate(simbolos):
+        df = series.get(simbolo)
+        if df is None or df.empty:
+            continue
+        posicoes = df.index.get_indexer(indice)
+        encontradas = posicoes >= 0
+        valores[encontradas, coluna] = df['Close'].to_numpy()[posicoes[encontradas]]
+    return pd.DataFrame(valores, index=indice, columns=simbolos, copy=False)
+
+
+def montar_matriz_fechamentos(series):
+    """Alinha os fechamentos de {símbolo: DataFrame} em uma matriz datas x símbolos.
+
+    Usa a união das datas: cada par é avaliado depois apenas nas datas em que os dois
+    símbolos têm preço, sem descartar o histórico do universo inteiro por causa de um ativo.
+    """
+    fechamentos = {s: df['Close'] for s, df in series.items() if df is not None and not df.empty}
+    if not fechamentos:
+        return pd.DataFrame()
+    return pd.DataFrame(fechamentos).sort_index()
@@ -1,13 +1,32 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.stats import zscore
-import sys
 import os
-from datetime import datetime, timedelta
-import matplotlib.dates as mdates
+import time
+from functools import partial
+
+from acoes_corporativas import INTERVALO_ATUALIZACAO as INTERVALO_ACOES_CORPORATIVAS
+from backtest import BARRAS_TESTE, BARRAS_TREINO, backtest, custos_relativos, varrer_parametros, walk_forward
+from carteira import LivroPosicoes, carrego_aluguel, exposicao_liquida, marcacao_mercado, risco_spreads
+from cointegracao import CacheCointegracao
+from dados import executar_em_paralelo
+from exportacao import EXTENSOES, FORMATOS, MIMES, exportar_par, tabela_par
+from hedge_dinamico import MODELOS_SPREAD, SPREAD_KALMAN
+from graficos import PONTOS_INTERATIVO, PONTOS_TELA, dados_grafico, grafico_interativo, reduzir_para_tela, renderizar_png
+from intradiario import DIAS_UTEIS_ANO, FREQUENCIAS, INTERVALO_DIARIO, barras_por_ano, painel_intradiario, sessao_do_simbolo
+from metricas import REGISTRO, cronometrar
+from monitor import ler_cruzamentos, ler_sinais
+from paineis import montar_matriz_fechamentos
+from motor_zscore import EWMA, JANELA_MOVEL, MODOS
+from servico_dados import ServicoDados
+from sinais import analisar_par, decidir, hedge_atual, periodo_estatisticas, valor_spread
+from universo import CAMINHO_PADRAO as CAMINHO_UNIVERSO, carregar_universo, simbolos_acoes
+from simulador import (
+    EIXO_DURACAO, EIXO_QUANTIDADE, EIXO_RATIO_SAIDA, EIXO_TAXA_ALUGUEL, EIXOS_CENARIO, MODELOS_MONTE_CARLO,
+    monte_carlo_operacao, quantidades, resultado_operacao, superficie_resultado,
+)
+from varredura import CORRELACAO_MINIMA, preselecionar_pares, varrer_pares
 
 
 # Configuração da página
@@ -16,6 +35,8 @@ st.set_page_config(
     page_icon="📈",
     layout="wide"
 )
+# Tempo total da execução da página, registrado no fim do script
+inicio_pagina = time.perf_counter()
 
 # Título do dashboard
 st.title("Dashboard de Pair Trading com Cotação do Brent")
@@ -23,21 +44,42 @@ st.title("Dashboard de Pair Trading com Cotação do Brent")
 # Sidebar para configurações
 st.sidebar.header("Configurações")
 
+# Serviço de dados compartilhado por todas as sessões do processo
+@st.cache_resource
+def obter_servico_dados():
+    """Instância única do serviço de dados (cache, coalescência de requisições e rate limit globais)."""
+    return ServicoDados()
+
+servico_dados = obter_servico_dados()
+
+@st.cache_resource
+def obter_livro_posicoes():
+    """Livro de posições abertas, no mesmo banco local do serviço de dados."""
+    return LivroPosicoes(servico_dados.armazem.caminho)
+
+@st.cache_resource
+def obter_cache_cointegracao():
+    """Cache de testes de cointegração compartilhado entre sessões (por par, janela e versão dos dados)."""
+    return CacheCointegracao()
+
 # Botão de atualização manual
 if st.sidebar.button("🔄 Atualizar Dados"):
-    # Limpa o cache de todas as funções decoradas com @st.cache_data
     st.session_state.dados_carregados = True # Marca que o botão foi clicado
-    st.cache_data.clear()
+    # Invalida apenas os símbolos desta visão (após a seleção), sem afetar as outras sessões
+    st.session_state.invalidar_simbolos = True
     # Força o rerun do script para buscar novos dados
     st.rerun()
 
 st.sidebar.markdown("--- ") # Separador
 
-# Lista de ações disponíveis (bancos e Petrobras da Bovespa)
-acoes_disponiveis = {
-    'Bancos': ['ITUB3.SA', 'ITUB4.SA', 'BBDC3.SA', 'BBDC4.SA', 'BBAS3.SA', 'SANB3.SA', 'SANB4.SA', 'BPAC3.SA', 'BPAC5.SA', 'BPAC11.SA'],
-    'Petrobras': ['PETR3.SA', 'PETR4.SA']
-}
+@st.cache_data(show_spinner=False)
+def obter_universo(caminho, modificado):
+    """Universo do arquivo de configuração; a data de modificação na chave recarrega o arquivo editado."""
+    return carregar_universo(caminho)
+
+# Ações por setor e commodities de referência vêm do arquivo de configuração (universo.json)
+universo_config = obter_universo(CAMINHO_UNIVERSO, os.path.getmtime(CAMINHO_UNIVERSO))
+acoes_disponiveis = universo_config['acoes']
 
 # Opções de período
 periodos = {
@@ -51,7 +93,7 @@ periodos = {
 }
 
 # Seleção de categoria
-categoria = st.sidebar.selectbox("Categoria", list(acoes_disponiveis.keys()), index=1 if 'Petrobras' in acoes_disponiveis else 0)
+categoria = st.sidebar.selectbox("Categoria", list(acoes_disponiveis.keys()), index=list(acoes_disponiveis).index(universo_config['categoria_padrao']))
 
 # Seleção de ações baseada na categoria
 acoes_selecionadas = st.sidebar.multiselect(
@@ -69,20 +111,42 @@ if len(acoes_selecionadas) > 2:
 periodo_selecionado = st.sidebar.selectbox("Período de análise", list(periodos.keys()))
 periodo_valor = periodos[periodo_selecionado]
 
+# Barras diárias ou intradiárias (1/5 minutos, gravadas localmente a cada atualização)
+frequencia_selecionada = st.sidebar.selectbox("Frequência das barras", list(FREQUENCIAS))
+intervalo_barras = FREQUENCIAS[frequencia_selecionada]
+unidade_barras = 'dias' if intervalo_barras == INTERVALO_DIARIO else 'barras'
+if intervalo_barras != INTERVALO_DIARIO:
+    st.sidebar.caption("O provedor só devolve os últimos 7 dias em 1 minuto e 60 dias em 5 minutos; "
+                       "o histórico mais longo vai se acumulando no armazenamento local.")
+
 # Configuração de Z-score
 st.sidebar.subheader("Configuração de Z-score")
 limite_superior_zscore = st.sidebar.slider("Limite Superior Z-score", 0.5, 3.0, 1.0, 0.1)
 limite_inferior_zscore = -limite_superior_zscore
+metodo_zscore = st.sidebar.selectbox("Método de cálculo do Z-score", MODOS)
+janela_zscore = 60
+if metodo_zscore == JANELA_MOVEL:
+    janela_zscore = st.sidebar.number_input(f"Janela móvel ({unidade_barras})", min_value=5, max_value=1000, value=60, step=5)
+elif metodo_zscore == EWMA:
+    janela_zscore = st.sidebar.number_input(f"Meia-vida EWMA ({unidade_barras})", min_value=2, max_value=500, value=30, step=1)
+
+# Imagem estática (leve, em cache) ou gráfico interativo com zoom no navegador
+RENDER_IMAGEM = 'Imagem'
+RENDER_INTERATIVO = 'Interativo'
+renderizacao_grafico = st.sidebar.radio("Gráfico do ratio", (RENDER_IMAGEM, RENDER_INTERATIVO), horizontal=True)
+
+# Spread: ratio simples ou resíduo contra hedge ratio dinâmico (Kalman)
+modelo_spread = st.sidebar.selectbox("Modelo do spread", MODELOS_SPREAD)
+
+# Scanner de todos os pares do universo
+modo_scanner = st.sidebar.checkbox("Scanner de todos os pares do universo", value=False)
+correlacao_minima = CORRELACAO_MINIMA
+if modo_scanner:
+    # Só pares do mesmo grupo de correlação dos retornos seguem para as estatísticas do scanner
+    correlacao_minima = st.sidebar.slider("Correlação mínima dos retornos (pré-seleção)", 0.0, 0.95, CORRELACAO_MINIMA, 0.05)
 
 # Opções de símbolos para petróleo/commodities
-commodities_disponiveis = {
-    'USO': 'United States Oil Fund (cerca de $69)',
-    'BNO': 'United States Brent Oil Fund',
-    'UCO': 'ProShares Ultra Bloomberg Crude Oil',
-    'XLE': 'Energy Select Sector SPDR Fund',
-    'XOP': 'SPDR S&P Oil & Gas Exploration & Production ETF',
-    'OIH': 'VanEck Oil Services ETF'
-}
+commodities_disponiveis = universo_config['commodities']
 
 # Seleção do símbolo da commodity
 commodity_symbol = st.sidebar.selectbox(
@@ -91,94 +155,402 @@ commodity_symbol = st.sidebar.selectbox(
     format_func=lambda x: f"{x} - {commodities_disponiveis[x]}"
 )
 
-# Função para obter cotação atual
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def obter_cotacao(acao):
-    """Obtém a cotação mais recente de uma ação, com tratamento de erro para rate limit."""
-    try:
-        ticker = yf.Ticker(acao)
-        # Tenta obter o preço mais recente
-        hist = ticker.history(period='1d', interval='1m') # Tenta intraday mais recente
-        if not hist.empty:
-            return hist['Close'].iloc[-1]
-        else:
-            # Se intraday falhar, tenta o fechamento do dia anterior
-            hist_daily = ticker.history(period='2d')
-            if not hist_daily.empty:
-                return hist_daily['Close'].iloc[-1]
-            else:
-                # st.warning(f"Não foi possível obter cotação recente para {acao}.") # Comentado para reduzir warnings
-                return None
-    except Exception as e:
-        err_msg = str(e).lower()
-        if "too many requests" in err_msg or "rate limited" in err_msg:
-            st.warning(f"Limite de requisições atingido para {acao}. Tente atualizar mais tarde.")
-        # else:
-            # st.error(f"Erro ao obter cotação de {acao}: {e}") # Comentado para reduzir erros
+def exibir_acoes_corporativas(acao, acoes_corporativas):
+    """Exibe na sidebar as ações corporativas (dividendos e desdobramentos) desde 2016, lidas do índice local."""
+    if acoes_corporativas is None:
+        return
+    acoes_corporativas = acoes_corporativas.loc['2016-01-01':]
+    if not acoes_corporativas.empty:
+        has_splits = 'Stock Splits' in acoes_corporativas.columns and (acoes_corporativas['Stock Splits'] > 0).any()
+        
+        with st.sidebar.expander(f"Ações Corporativas - {acao}", expanded=False):
+            st.dataframe(acoes_corporativas)
+            st.caption(f"Índice local, consultado no provedor a cada {INTERVALO_ACOES_CORPORATIVAS.days} dias.")
+        
+        if has_splits:
+            splits = acoes_corporativas[acoes_corporativas['Stock Splits'] > 0]
+            with st.sidebar.expander(f"🔍 DESDOBRAMENTOS - {acao}", expanded=True):
+                st.write(f"**Desdobramentos desde 2016:**")
+                for data, row in splits.iterrows():
+                    st.write(f"- {data.strftime('%d/%m/%Y')}: **{row['Stock Splits']:.0f}:1**") # Format split ratio
+                st.info("""
+                **Nota:** Desdobramentos são automaticamente considerados no cálculo do ratio (preços ajustados).
+                """)
+
+def versao_serie(serie):
+    """Identifica o conteúdo de uma série para as chaves de cache (tamanho, última data e fechamento)."""
+    if serie is None or serie.empty:
         return None
+    return (len(serie), str(serie.index[-1]), float(serie['Close'].iloc[-1]))
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def montar_analise(acao1, acao2, commodity, periodo_busca, periodo_valor, metodo, janela, modelo_spread, intervalo, versao_dados, _series):
+    """Análise do par (painel, spread, estatísticas de z-score e motor) em cache por sessão e dados.
+
+    As séries não entram na chave do cache (`versao_dados` as identifica), então mexer em
+    widgets que não mudam os dados reaproveita o resultado. Barras intradiárias são alinhadas
+    pelo pregão de cada mercado. Devolve None se não houver datas em comum.
+    """
+    painel = None
+    if intervalo != INTERVALO_DIARIO:
+        with cronometrar('alinhamento'):
+            painel = painel_intradiario(_series, (acao1, acao2), (commodity,) if commodity else ())
+        if painel is None:
+            return None
+    return analisar_par(_series, acao1, acao2, commodity, periodo_busca, periodo_valor, metodo, janela, modelo_spread, painel)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def varrer_universo(universo, universo_modificado, correlacao_minima, limite_zscore, versao_dados, _series):
+    """Pré-seleção, varredura e cointegração do scanner em cache por dados, universo e parâmetros.
+
+    Como em `montar_analise`, as séries só entram na chave por `versao_dados`; reruns que não
+    mudam dados, arquivo do universo (`universo_modificado`) nem parâmetros não refazem nada.
+    Devolve (candidatos, pares fora da banda, quantidade de ações com dados).
+    """
+    matriz = montar_matriz_fechamentos(_series)
+    # Pré-seleção por correlação: evita avaliar o espaço O(N²) inteiro de pares
+    candidatos = preselecionar_pares(matriz, correlacao_minima=correlacao_minima)
+    pares_fora = varrer_pares(matriz, limite_zscore=limite_zscore, pares=list(zip(candidatos['Ação 1'], candidatos['Ação 2'])))
+    pares_fora = pares_fora.merge(candidatos[['Ação 1', 'Ação 2', 'Correlação']], on=['Ação 1', 'Ação 2'], how='left')
+    if not pares_fora.empty:
+        # Só os pares com barras novas são testados de novo; o resto vem do cache
+        cointegracao_pares = obter_cache_cointegracao().testar_pares(matriz, list(zip(pares_fora['Ação 1'], pares_fora['Ação 2'])))
+        pares_fora = pares_fora.merge(
+            cointegracao_pares[['Ação 1', 'Ação 2', 'ADF', 'Cointegrado', 'Meia-Vida (dias)']], on=['Ação 1', 'Ação 2'], how='left'
+        )
+    return candidatos, pares_fora, matriz.shape[1]
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def grafico_ratio_png(dados, limite, commodity, titulo, rotulo='Ratio'):
+    """PNG do gráfico do spread; a chave do cache é o hash dos dados já reduzidos e o limite."""
+    with cronometrar('grafico_png'):
+        return renderizar_png(dados, limite, commodity, titulo, rotulo)
+
+# Backtest em fragmento: o botão de otimização reexecuta só este trecho
+@st.fragment
+def secao_backtest(fechamento1, fechamento2, metodo, janela, limite, unidade='dias', barras_ano=DIAS_UTEIS_ANO):
+    """Backtest da regra de z-score (janela móvel, sem look-ahead) e varredura de parâmetros.
+
+    `barras_ano` anualiza o Sharpe na frequência dos preços (diária ou intradiária).
+    """
+    with st.expander("Backtest da Regra de Z-score", expanded=False):
+        # Reaproveita os custos informados no simulador abaixo
+        capital_backtest = st.session_state.get('qtd_ref', 1000) * float(fechamento1.iloc[-1])
+        custos_backtest = custos_relativos(
+            taxa_aluguel_aa=st.session_state.get('taxa_aluguel', 5.0),
+            corretagem=st.session_state.get('corretagem', 10.0),
+            taxas_b3=st.session_state.get('taxas_b3', 5.0),
+            capital=capital_backtest,
+        )
+        janela_backtest = int(janela) if metodo == JANELA_MOVEL else 60
+        resultado_backtest, metricas_backtest = backtest(
+            fechamento1, fechamento2, janela=janela_backtest, limite=limite, saida=0.0, custos=custos_backtest,
+            barras_ano=barras_ano,
+        )
+        st.write(f"Janela móvel de {janela_backtest} {unidade}, entrada em ±{limite:.1f}σ, saída na média, custos do simulador.")
+        cols_bt = st.columns(len(metricas_backtest))
+        for col_bt, (nome_metrica, valor_metrica) in zip(cols_bt, metricas_backtest.items()):
+            formato_metrica = "{:.0f}" if nome_metrica == 'Operações' else "{:.2f}"
+            col_bt.metric(nome_metrica, formato_metrica.format(valor_metrica[0]) if not np.isnan(valor_metrica[0]) else "N/A")
+        st.line_chart(resultado_backtest['Acumulado'] * 100.0)
+
+        if st.button("Otimizar parâmetros (janela × limite × saída)", key="otimizar_backtest"):
+            with st.spinner("Executando varredura de parâmetros..."):
+                tabela_varredura = varrer_parametros(
+                    fechamento1, fechamento2,
+                    janelas=range(10, 260, 10),
+                    limites=np.round(np.arange(0.5, 3.01, 0.1), 2),
+                    saidas=[0.0, 0.25, 0.5, 0.75, 1.0],
+                    custos=custos_backtest,
+                    barras_ano=barras_ano,
+                )
+            st.write(f"**{len(tabela_varredura)} combinações avaliadas** — melhores por Sharpe:")
+            st.dataframe(tabela_varredura.head(20), hide_index=True)
+
+        # A varredura acima escolhe e avalia na mesma amostra; o walk-forward avalia fora dela
+        st.write("**Walk-forward:** parâmetros escolhidos no treino de cada dobra e avaliados só no teste seguinte.")
+        col_treino, col_teste = st.columns(2)
+        barras_treino = col_treino.number_input(f"Treino ({unidade})", min_value=60, max_value=2520, value=BARRAS_TREINO, step=21, key="wf_treino")
+        barras_teste = col_teste.number_input(f"Teste ({unidade})", min_value=5, max_value=504, value=BARRAS_TESTE, step=21, key="wf_teste")
+        if st.button("Otimizar em walk-forward", key="walk_forward"):
+            if len(fechamento1) <= barras_treino:
+                st.warning("Histórico curto demais para o treino escolhido; aumente o período de análise.")
+            else:
+                with st.spinner("Otimizando as dobras em paralelo..."):
+                    dobras, fora_amostra, metricas_wf = walk_forward(
+                        fechamento1, fechamento2,
+                        janelas=range(10, 260, 10),
+                        limites=np.round(np.arange(0.5, 3.01, 0.1), 2),
+                        saidas=[0.0, 0.25, 0.5, 0.75, 1.0],
+                        treino=int(barras_treino), teste=int(barras_teste), custos=custos_backtest,
+                        barras_ano=barras_ano,
+                    )
+                st.write(f"**{len(dobras)} dobras** — resultado fora da amostra:")
+                cols_wf = st.columns(len(metricas_wf))
+                for col_wf, (nome_metrica, valor_metrica) in zip(cols_wf, metricas_wf.items()):
+                    formato_metrica = "{:.0f}" if nome_metrica == 'Operações' else "{:.2f}"
+                    col_wf.metric(nome_metrica, formato_metrica.format(valor_metrica[0]) if not np.isnan(valor_metrica[0]) else "N/A")
+                st.line_chart(fora_amostra['Acumulado'] * 100.0)
+                st.dataframe(dobras, hide_index=True)
+
+@st.fragment
+def secao_dados_historicos(acao1, acao2, commodity, periodo_valor, analise):
+    """Últimas linhas do par e download em CSV/Parquet, montado e serializado só quando o botão é clicado."""
+    with st.expander("Ver Dados Históricos", expanded=False):
+        st.dataframe(tabela_par(analise, acao1, acao2, commodity, linhas=10))
+        formato = st.radio("Formato", FORMATOS, horizontal=True, key="formato_exportacao")
+        st.download_button(
+            label=f"Download {formato}",
+            # Tabela completa montada e gerada em blocos apenas no clique (o arquivo pronto fica inteiro em memória)
+            data=partial(exportar_par, analise, acao1, acao2, commodity, formato),
+            file_name=f"pair_trading_{acao1}_{acao2}_{periodo_valor}.{EXTENSOES[formato]}",
+            mime=MIMES[formato],
+            on_click="ignore",
+        )
+
+# Simulador em fragmento: editar um campo reexecuta só o simulador, sem refazer análise e gráfico
+@st.fragment
+def secao_simulador(acao1_nome, acao2_nome, precos_atuais, decisao, hedge_ratio=1.0, analise=None):
+    """Entradas, resultados, superfície de cenários e Monte Carlo do simulador de montagem/desmontagem.
+
+    O Monte Carlo simula o mesmo spread do sinal (`analise`): ratio ou resíduo do Kalman,
+    com saída na média do método de z-score escolhido.
+    """
+    preco_atual_acao1 = precos_atuais.get(acao1_nome, 0)
+    preco_atual_acao2 = precos_atuais.get(acao2_nome, 0)
 
-# Função para obter série histórica
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def obter_serie_historica(acao, periodo='1y'):
-    """Obtém a série histórica de uma ação, com tratamento de erro para rate limit."""
-    try:
-        ticker = yf.Ticker(acao)
-        if periodo == 'max':
-            dados = ticker.history(period=periodo, auto_adjust=True)
-            dados = dados.loc['2016-01-01':]
-        else:
-            dados = ticker.history(period=periodo, auto_adjust=True)
-        
-        if dados.empty:
-             # st.warning(f"Dados históricos não encontrados para {acao} no período {periodo}.") # Comentado
-             return None
-
-        # Exibe informações sobre ações corporativas se disponíveis
-        try:
-            acoes_corporativas = ticker.actions
-            if not acoes_corporativas.empty:
-                acoes_corporativas = acoes_corporativas.loc['2016-01-01':]
-                if not acoes_corporativas.empty:
-                    has_splits = 'Stock Splits' in acoes_corporativas.columns and (acoes_corporativas['Stock Splits'] > 0).any()
-                    
-                    with st.sidebar.expander(f"Ações Corporativas - {acao}", expanded=False):
-                        st.dataframe(acoes_corporativas)
-                    
-                    if has_splits:
-                        splits = acoes_corporativas[acoes_corporativas['Stock Splits'] > 0]
-                        with st.sidebar.expander(f"🔍 DESDOBRAMENTOS - {acao}", expanded=True):
-                            st.write(f"**Desdobramentos desde 2016:**")
-                            for data, row in splits.iterrows():
-                                st.write(f"- {data.strftime('%d/%m/%Y')}: **{row['Stock Splits']:.0f}:1**") # Format split ratio
-                            st.info("""
-                            **Nota:** Desdobramentos são automaticamente considerados no cálculo do ratio (preços ajustados).
-                            """)
-        except Exception:
-            # Ignora erros ao buscar ações corporativas, não é crítico
-            pass 
+    st.write(f"**Par Selecionado:** {acao1_nome} vs {acao2_nome}")
+    st.write(f"**Sinal Atual:** {decisao}")
+
+    # Determinar qual ação comprar/vender baseado no sinal
+    acao_comprar_nome = None
+    acao_vender_nome = None
+    if "Comprar" in decisao:
+        acao_comprar_nome = acao1_nome if f"Comprar {acao1_nome}" in decisao else acao2_nome
+        acao_vender_nome = acao2_nome if acao_comprar_nome == acao1_nome else acao1_nome
+    elif "Vender" in decisao:
+        acao_vender_nome = acao1_nome if f"Vender {acao1_nome}" in decisao else acao2_nome
+        acao_comprar_nome = acao2_nome if acao_vender_nome == acao1_nome else acao1_nome
+    
+    if acao_comprar_nome and acao_vender_nome:
+        st.write(f"➡️ **Ação Sugerida a Comprar:** {acao_comprar_nome}")
+        st.write(f"⬅️ **Ação Sugerida a Vender (Alugar):** {acao_vender_nome}")
+        preco_compra_sugerido = precos_atuais.get(acao_comprar_nome, 0)
+        preco_venda_sugerido = precos_atuais.get(acao_vender_nome, 0)
+
+        st.markdown("#### Entradas para Simulação")
+        col_sim_in1, col_sim_in2 = st.columns(2)
+
+        with col_sim_in1:
+            st.write("**Preços e Quantidade de Entrada**")
+            preco_entrada_acao1 = st.number_input(f"Preço Entrada {acao1_nome}", value=float(preco_atual_acao1) if preco_atual_acao1 else 0.0, format="%.2f", key="preco_ent_a1")
+            preco_entrada_acao2 = st.number_input(f"Preço Entrada {acao2_nome}", value=float(preco_atual_acao2) if preco_atual_acao2 else 0.0, format="%.2f", key="preco_ent_a2")
             
-        return dados
-    except Exception as e:
-        err_msg = str(e).lower()
-        if "too many requests" in err_msg or "rate limited" in err_msg:
-            st.warning(f"Limite de requisições atingido para dados históricos de {acao}. Tente atualizar mais tarde.")
-        # elif "no data found" in err_msg:
-             # st.warning(f"Nenhum dado histórico encontrado para {acao} no período solicitado.") # Comentado
-        # else:
-            # st.error(f"Erro ao obter série histórica de {acao}: {e}") # Comentado
-        return None
+            acao_ref = st.selectbox("Ação de Referência (Qtd)", [acao1_nome, acao2_nome], key="acao_ref")
+            qtd_ref = st.number_input(f"Quantidade {acao_ref}", min_value=100, step=100, value=1000, key="qtd_ref") # Default 1000
+            
+            # Calcular quantidade da outra ponta (financeiro igual ou ponderado pelo hedge ratio; lote de 100)
+            qtd_acao1, qtd_acao2 = (int(q) for q in quantidades(preco_entrada_acao1, preco_entrada_acao2, qtd_ref, referencia_acao1=acao_ref == acao1_nome, hedge_ratio=hedge_ratio))
+            if hedge_ratio != 1.0:
+                st.caption(f"Financeiro de {acao2_nome} = {hedge_ratio:.3f} × financeiro de {acao1_nome} (hedge dinâmico)")
+            
+            # Exibe quantidades calculadas (read-only style)
+            st.markdown(f"<p style='margin-top: 10px; font-size: 0.9em;'>Qtd. Calculada {acao1_nome}: <strong style='color: #0056b3;'>{qtd_acao1}</strong></p>", unsafe_allow_html=True)
+            st.markdown(f"<p style='font-size: 0.9em;'>Qtd. Calculada {acao2_nome}: <strong style='color: #0056b3;'>{qtd_acao2}</strong></p>", unsafe_allow_html=True)
+
+        with col_sim_in2:
+            st.write("**Preços de Saída**")
+            preco_saida_acao1 = st.number_input(f"Preço Saída {acao1_nome}", value=preco_entrada_acao1 * 1.02, format="%.2f", key="preco_sai_a1") # Default +2%
+            preco_saida_acao2 = st.number_input(f"Preço Saída {acao2_nome}", value=preco_entrada_acao2 * 0.98, format="%.2f", key="preco_sai_a2") # Default -2%
+            
+            st.write("**Custos e Duração**")
+            acao_vendida_simulacao = acao_vender_nome # Assume a sugestão
+            taxa_aluguel_aa = st.number_input(f"Taxa Aluguel Anual {acao_vendida_simulacao} (%)", min_value=0.0, value=5.0, step=0.1, format="%.2f", key="taxa_aluguel")
+            duracao_dias = st.number_input("Duração Estimada (dias)", min_value=1, value=30, step=1, key="duracao")
+            custo_corretagem = st.number_input("Corretagem Total (Entrada+Saída)", min_value=0.0, value=10.0, step=0.5, format="%.2f", key="corretagem") # Default 10
+            custo_taxas_b3 = st.number_input("Taxas B3 Total (Entrada+Saída)", min_value=0.0, value=5.0, step=0.1, format="%.2f", key="taxas_b3") # Default 5
+
+        st.markdown("#### Resultados da Simulação")
+        
+        # Cálculos de Volume
+        vol_entrada_acao1 = qtd_acao1 * preco_entrada_acao1
+        vol_entrada_acao2 = qtd_acao2 * preco_entrada_acao2
+        vol_saida_acao1 = qtd_acao1 * preco_saida_acao1
+        vol_saida_acao2 = qtd_acao2 * preco_saida_acao2
+
+        # Cálculos de Ratio e Spread (Ação 1 / Ação 2)
+        ratio_entrada = preco_entrada_acao1 / preco_entrada_acao2 if preco_entrada_acao2 != 0 else np.nan
+        spread_entrada = preco_entrada_acao1 - preco_entrada_acao2
+        ratio_saida = preco_saida_acao1 / preco_saida_acao2 if preco_saida_acao2 != 0 else np.nan
+        spread_saida = preco_saida_acao1 - preco_saida_acao2
+
+        # Cálculos de Resultado (direção conforme a compra/venda sugerida pelo sinal)
+        resultado_simulacao = resultado_operacao(
+            preco_entrada_acao1, preco_entrada_acao2, preco_saida_acao1, preco_saida_acao2,
+            qtd_acao1, qtd_acao2, acao_comprar_nome == acao1_nome, duracao_dias, taxa_aluguel_aa,
+            custo_corretagem, custo_taxas_b3,
+        )
+        resultado_bruto = float(resultado_simulacao['resultado_bruto'])
+        custo_aluguel_total = float(resultado_simulacao['custo_aluguel_total'])
+        custo_operacional_total = float(resultado_simulacao['custo_operacional_total'])
+        resultado_liquido = float(resultado_simulacao['resultado_liquido'])
+        
+        # Exibição dos Resultados Reorganizada
+        st.markdown("**Montagem (Entrada)**")
+        st.markdown(f"""
+        <div class="op-line">
+            <span class="label"><strong>{acao1_nome}</strong></span>
+            <span>R$ {preco_entrada_acao1:,.2f}</span>
+            <span class="label">Qtd: {qtd_acao1}</span>
+            <span>R$ {vol_entrada_acao1:,.2f}</span>
+        </div>
+        <div class="op-line">
+            <span class="label"><strong>{acao2_nome}</strong></span>
+            <span>R$ {preco_entrada_acao2:,.2f}</span>
+            <span class="label">Qtd: {qtd_acao2}</span>
+            <span>R$ {vol_entrada_acao2:,.2f}</span>
+        </div>
+        """, unsafe_allow_html=True)
+        col_ratio_sp_ent1, col_ratio_sp_ent2 = st.columns(2)
+        col_ratio_sp_ent1.metric("Ratio Entrada (A1/A2)", f"{ratio_entrada:.4f}" if not np.isnan(ratio_entrada) else "N/A")
+        col_ratio_sp_ent2.metric("Spread Entrada (A1-A2)", f"R$ {spread_entrada:,.2f}")
+
+        st.markdown("**Desmontagem (Saída)**")
+        st.markdown(f"""
+        <div class="op-line">
+            <span class="label"><strong>{acao1_nome}</strong></span>
+            <span>R$ {preco_saida_acao1:,.2f}</span>
+            <span class="label">Qtd: {qtd_acao1}</span>
+            <span>R$ {vol_saida_acao1:,.2f}</span>
+        </div>
+        <div class="op-line">
+            <span class="label"><strong>{acao2_nome}</strong></span>
+            <span>R$ {preco_saida_acao2:,.2f}</span>
+            <span class="label">Qtd: {qtd_acao2}</span>
+            <span>R$ {vol_saida_acao2:,.2f}</span>
+        </div>
+        """, unsafe_allow_html=True)
+        col_ratio_sp_sai1, col_ratio_sp_sai2 = st.columns(2)
+        col_ratio_sp_sai1.metric("Ratio Saída (A1/A2)", f"{ratio_saida:.4f}" if not np.isnan(ratio_saida) else "N/A")
+        col_ratio_sp_sai2.metric("Spread Saída (A1-A2)", f"R$ {spread_saida:,.2f}")
+
+        st.markdown("**Custos e Resultado**")
+        res_col1, res_col2, res_col3 = st.columns(3)
+        with res_col1:
+            st.metric("Custo Total Aluguel", f"R$ {custo_aluguel_total:,.2f}")
+        with res_col2:
+            st.metric("Custo Operacional Total", f"R$ {custo_operacional_total:,.2f}")
+        with res_col3:
+            st.metric("Resultado Bruto", f"R$ {resultado_bruto:,.2f}")
+
+        # Resultado Líquido Final Destacado
+        st.markdown('<div class="final-result">', unsafe_allow_html=True)
+        res_liq_col1, res_liq_col2 = st.columns(2)
+        res_liq_col1.metric("**Resultado Líquido**", f"**R$ {resultado_liquido:,.2f}**")
+        # Calcular % de lucro/prejuízo sobre o maior volume (aproximação do capital)
+        capital_aprox = max(vol_entrada_acao1, vol_entrada_acao2)
+        if capital_aprox > 0:
+            perc_liquido = (resultado_liquido / capital_aprox) * 100
+            res_liq_col2.metric("Resultado Líquido (%)", f"{perc_liquido:.2f}%")
+        else:
+            res_liq_col2.metric("Resultado Líquido (%)", "N/A")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        # Registra a montagem simulada no livro de posições (seção Carteira de Operações)
+        if st.button("Adicionar operação à carteira", key="adicionar_carteira"):
+            obter_livro_posicoes().abrir(
+                acao1_nome, acao2_nome, qtd_acao1, qtd_acao2, acao_comprar_nome == acao1_nome,
+                preco_entrada_acao1, preco_entrada_acao2, taxa_aluguel_aa, custo_operacional_total,
+            )
+            st.rerun()
+
+        # Superfície de resultado: avalia a grade inteira de cenários de uma vez
+        st.markdown("#### Superfície de Resultado Líquido")
+        col_sup1, col_sup2 = st.columns(2)
+        eixo_x = col_sup1.selectbox("Eixo horizontal", EIXOS_CENARIO, index=0, key="eixo_x_superficie")
+        eixo_y = col_sup2.selectbox("Eixo vertical", [e for e in EIXOS_CENARIO if e != eixo_x], index=0, key="eixo_y_superficie")
+        faixas_cenario = {
+            EIXO_RATIO_SAIDA: np.linspace(ratio_entrada * 0.9, ratio_entrada * 1.1, 41) if not np.isnan(ratio_entrada) else np.linspace(0.5, 1.5, 41),
+            EIXO_DURACAO: np.arange(1, 181, 5),
+            EIXO_TAXA_ALUGUEL: np.round(np.arange(0.0, 20.01, 0.5), 2),
+            EIXO_QUANTIDADE: np.arange(100, 10001, 300),
+        }
+        superficie = superficie_resultado(
+            eixo_x, faixas_cenario[eixo_x], eixo_y, faixas_cenario[eixo_y],
+            preco_entrada_acao1, preco_entrada_acao2, preco_saida_acao1, preco_saida_acao2,
+            qtd_ref, acao_ref == acao1_nome, acao_comprar_nome == acao1_nome,
+            duracao_dias, taxa_aluguel_aa, custo_corretagem, custo_taxas_b3, hedge_ratio=hedge_ratio,
+        )
+        fig_sup, ax_sup = plt.subplots(figsize=(10, 5))
+        limite_cor = float(np.nanmax(np.abs(superficie.values))) or 1.0
+        malha = ax_sup.pcolormesh(superficie.columns, superficie.index, superficie.values, cmap='RdYlGn', vmin=-limite_cor, vmax=limite_cor, shading='nearest')
+        # Linha de break-even (resultado líquido = 0)
+        if superficie.values.min() < 0 < superficie.values.max():
+            ax_sup.contour(superficie.columns, superficie.index, superficie.values, levels=[0.0], colors='black', linewidths=1.5)
+        fig_sup.colorbar(malha, ax=ax_sup, label='Resultado Líquido (R$)')
+        ax_sup.set_xlabel(eixo_x)
+        ax_sup.set_ylabel(eixo_y)
+        ax_sup.set_title('Resultado Líquido por cenário (linha preta = break-even)')
+        plt.tight_layout()
+        st.pyplot(fig_sup)
+        plt.close(fig_sup)
+
+        # Monte Carlo: distribuição do resultado simulando o ratio até a saída
+        st.markdown("#### Distribuição de Resultado (Monte Carlo)")
+        col_mc1, col_mc2 = st.columns(2)
+        modelo_mc = col_mc1.selectbox("Modelo do spread", MODELOS_MONTE_CARLO, key="modelo_mc")
+        n_trajetorias_mc = col_mc2.number_input("Número de trajetórias", min_value=1000, max_value=200_000, value=50_000, step=5000, key="n_trajetorias_mc")
+        # Spread do sinal em log (ratio ou resíduo do Kalman) e a média atual do z-score como saída
+        media_sinal = float(analise['estatisticas']['Média'].iloc[-1])
+        if analise.get('filtro') is None:
+            spread_mc = np.log(analise['spread'])
+            spread_entrada_mc = np.log(preco_entrada_acao1 / preco_entrada_acao2)
+            media_mc = np.log(media_sinal)
+        else:
+            spread_mc = analise['spread']
+            spread_entrada_mc = valor_spread(analise, preco_entrada_acao1, preco_entrada_acao2)
+            media_mc = media_sinal
+        resultado_mc = monte_carlo_operacao(
+            spread_mc, spread_entrada_mc, preco_entrada_acao1, preco_entrada_acao2, qtd_ref, acao_ref == acao1_nome,
+            acao_comprar_nome == acao1_nome, duracao_dias, taxa_aluguel_aa, custo_corretagem, custo_taxas_b3,
+            n_trajetorias=int(n_trajetorias_mc), modelo=modelo_mc, hedge_ratio=hedge_ratio, media=media_mc,
+        )
+        liquido_mc = resultado_mc['resultado_liquido']
+        mc_col1, mc_col2, mc_col3, mc_col4 = st.columns(4)
+        mc_col1.metric("Prob. de Reversão à Média", f"{resultado_mc['prob_reversao'] * 100:.1f}%")
+        mc_col2.metric("Resultado Líquido Esperado", f"R$ {liquido_mc.mean():,.2f}")
+        mc_col3.metric("Prob. de Lucro", f"{(liquido_mc > 0).mean() * 100:.1f}%")
+        mc_col4.metric("Custo de Aluguel Esperado", f"R$ {resultado_mc['custo_aluguel_total'].mean():,.2f}")
+        percentis_mc = np.percentile(liquido_mc, [5, 50, 95])
+        st.write(f"Percentis do resultado líquido — P5: R$ {percentis_mc[0]:,.2f} | Mediana: R$ {percentis_mc[1]:,.2f} | P95: R$ {percentis_mc[2]:,.2f} | Duração média: {resultado_mc['dias_operacao'].mean():.1f} dias")
+        fig_mc, ax_mc = plt.subplots(figsize=(10, 4))
+        ax_mc.hist(liquido_mc, bins=100, color='steelblue', alpha=0.8)
+        ax_mc.axvline(0.0, color='black', linewidth=1)
+        ax_mc.axvline(liquido_mc.mean(), color='green', linestyle='--', label='Esperado')
+        ax_mc.set_xlabel('Resultado Líquido (R$)')
+        ax_mc.set_ylabel('Trajetórias')
+        ax_mc.legend(loc='best')
+        plt.tight_layout()
+        st.pyplot(fig_mc)
+        plt.close(fig_mc)
+
+    else:
+        st.info("Aguardando sinal de Compra ou Venda válido para iniciar a simulação.")
 
 # --- Lógica Principal --- 
 
 # Inicializa variáveis e placeholders
 decisao = "Aguardando dados"
 ratio_atual = None
+hedge_simulador = 1.0
 z_score_atual = None
 cotacoes_ok = False
 precos_atuais = {}
+snapshot_cotacoes = pd.DataFrame(columns=['Preço', 'Horário', 'Origem'])
 serie_acao1 = None
 serie_acao2 = None
 serie_brent = None
+periodo_busca = periodo_valor
 
 # Verifica se o botão de atualizar foi clicado ou se é a primeira execução
 # Usaremos session_state para carregar dados apenas após o clique
@@ -186,26 +558,54 @@ if 'dados_carregados' not in st.session_state:
     st.session_state.dados_carregados = False
 
 if st.session_state.dados_carregados:
-    # Tenta obter cotações atuais
+    # Cotações, séries históricas e ações corporativas são independentes: busca tudo ao mesmo tempo
     if acoes_selecionadas:
-        cotacoes_ok = True
-        for acao in acoes_selecionadas:
-            preco = obter_cotacao(acao)
-            if preco is None:
-                cotacoes_ok = False # Marca como erro se qualquer cotação falhar
-            precos_atuais[acao] = preco
-        
-        commodity_preco = obter_cotacao(commodity_symbol)
-        precos_atuais[commodity_symbol] = commodity_preco # Guarda mesmo se for None
+        simbolos_view = tuple(acoes_selecionadas) + (commodity_symbol,)
+        if st.session_state.pop('invalidar_simbolos', False):
+            servico_dados.invalidar(simbolos_view)
+        tarefas = {'cotacoes': (servico_dados.cotacoes, simbolos_view)}
+        if len(acoes_selecionadas) == 2:
+            # Janela móvel/EWMA usam todo o histórico local, para o sinal não depender do período exibido
+            periodo_busca = periodo_estatisticas(periodo_valor, metodo_zscore)
+            if intervalo_barras == INTERVALO_DIARIO:
+                tarefas['series'] = (servico_dados.series, simbolos_view, periodo_busca)
+            else:
+                tarefas['series'] = (servico_dados.series_intradiarias, simbolos_view, intervalo_barras, periodo_busca)
+            tarefas['acoes_corporativas'] = (servico_dados.acoes_corporativas, simbolos_view)
+        resultados = executar_em_paralelo(tarefas)
+
+        # Uma consulta leve de último preço por símbolo, todas simultâneas
+        snapshot_cotacoes, limitados = resultados['cotacoes']
+        precos_atuais = {acao: (float(preco) if pd.notna(preco) else None) for acao, preco in snapshot_cotacoes['Preço'].items()}
+        for acao in limitados:
+            st.warning(f"Limite de requisições atingido para {acao}. Tente atualizar mais tarde.")
+        # Marca como erro se qualquer cotação das ações falhar (commodity é guardada mesmo se for None)
+        cotacoes_ok = all(precos_atuais.get(acao) is not None for acao in acoes_selecionadas)
 
-    # Tenta obter séries históricas se as cotações estiverem ok e 2 ações selecionadas
+    # Usa as séries históricas apenas se as cotações estiverem ok e 2 ações selecionadas
     if len(acoes_selecionadas) == 2 and cotacoes_ok:
-        serie_acao1 = obter_serie_historica(acoes_selecionadas[0], periodo=periodo_valor)
-        serie_acao2 = obter_serie_historica(acoes_selecionadas[1], periodo=periodo_valor)
-        serie_brent = obter_serie_historica(commodity_symbol, periodo=periodo_valor)
+        series, limitados = resultados['series']
+        for acao in limitados:
+            st.warning(f"Limite de requisições atingido para dados históricos de {acao}. Tente atualizar mais tarde.")
+        serie_acao1 = series.get(acoes_selecionadas[0])
+        serie_acao2 = series.get(acoes_selecionadas[1])
+        serie_brent = series.get(commodity_symbol)
+        for acao, acoes_corporativas in resultados['acoes_corporativas'].items():
+            if series.get(acao) is not None:
+                exibir_acoes_corporativas(acao, acoes_corporativas)
 
 # --- Exibição --- 
 
+# Sinais pré-calculados pelo monitor em segundo plano (monitor.py), lidos direto do banco
+sinais_monitor = ler_sinais(servico_dados.armazem.caminho)
+if not sinais_monitor.empty:
+    with st.expander(f"Sinais do Monitor ({len(sinais_monitor)} pares × configurações)", expanded=False):
+        st.dataframe(sinais_monitor, hide_index=True)
+        cruzamentos_monitor = ler_cruzamentos(servico_dados.armazem.caminho, limite=20)
+        if not cruzamentos_monitor.empty:
+            st.write("**Mudanças de sinal recentes:**")
+            st.dataframe(cruzamentos_monitor, hide_index=True)
+
 st.subheader("Cotações Atuais")
 if not st.session_state.dados_carregados:
     st.info("📈 Por favor, clique no botão '🔄 Atualizar Dados' na barra lateral para carregar as informações.")
@@ -217,6 +617,13 @@ elif acoes_selecionadas:
     
     commodity_preco_display = precos_atuais.get(commodity_symbol)
     cols[-1].metric(label=f"{commodity_symbol}", value=f"US$ {commodity_preco_display:.2f}" if commodity_preco_display is not None else "Erro")
+
+    # Horário e origem de cada cotação
+    for col, acao in zip(cols, list(acoes_selecionadas) + [commodity_symbol]):
+        if acao in snapshot_cotacoes.index and pd.notna(snapshot_cotacoes.at[acao, 'Preço']):
+            horario = pd.Timestamp(snapshot_cotacoes.at[acao, 'Horário'])
+            horario_fmt = horario.tz_convert('America/Sao_Paulo').strftime('%d/%m %H:%M') if horario.tzinfo else horario.strftime('%d/%m/%Y')
+            col.caption(f"{snapshot_cotacoes.at[acao, 'Origem']} · {horario_fmt}")
 else:
     st.info("Selecione ações na barra lateral.")
 
@@ -229,106 +636,89 @@ if not st.session_state.dados_carregados:
 elif len(acoes_selecionadas) == 2:
     if cotacoes_ok and serie_acao1 is not None and serie_acao2 is not None:
         st.markdown(f"**{acoes_selecionadas[0]} vs {acoes_selecionadas[1]}**")
-        # Alinhar as séries temporais das ações
-        common_index_stocks = serie_acao1.index.intersection(serie_acao2.index)
-        if not common_index_stocks.empty:
-            serie_acao1_aligned = serie_acao1.loc[common_index_stocks]
-            serie_acao2_aligned = serie_acao2.loc[common_index_stocks]
-            ratio = serie_acao1_aligned['Close'] / serie_acao2_aligned['Close']
+        # Alinhamento e estatísticas ficam em cache: só refazem se a série ou o método mudar
+        analise = montar_analise(
+            acoes_selecionadas[0], acoes_selecionadas[1], commodity_symbol, periodo_busca, periodo_valor,
+            metodo_zscore, janela_zscore, modelo_spread, intervalo_barras,
+            (versao_serie(serie_acao1), versao_serie(serie_acao2), versao_serie(serie_brent)),
+            {acoes_selecionadas[0]: serie_acao1, acoes_selecionadas[1]: serie_acao2, commodity_symbol: serie_brent},
+        )
+        if analise is not None:
+            ratio = analise['ratio']
             
             st.info("""
             **Nota sobre o cálculo do ratio:** Calculado com preços ajustados para desdobramentos desde 2016.
             """)
             
+            estatisticas_zscore = analise['estatisticas']
+            motor_zscore = analise['motor']
+            z_score = estatisticas_zscore['Z-Score']
+
             # Evitar erro se ratio tiver NaNs ou for muito curto
-            if ratio.dropna().shape[0] > 1:
-                z_score = zscore(ratio.dropna())
-                media_ratio = ratio.mean()
-                desvio_padrao_ratio = ratio.std()
+            if not z_score.empty and not np.isnan(z_score.iloc[-1]):
                 ratio_atual = ratio.iloc[-1]
-                z_score_atual = z_score[-1]
+                z_score_atual = z_score.iloc[-1]
             else:
                 z_score_atual = np.nan
-                media_ratio = np.nan
-                desvio_padrao_ratio = np.nan
                 ratio_atual = ratio.iloc[-1] if not ratio.empty else np.nan
                 st.warning("Não há dados suficientes para calcular Z-Score.")
 
             col1, col2, col3 = st.columns(3)
             col1.metric("Ratio Atual", f"{ratio_atual:.4f}" if not np.isnan(ratio_atual) else "N/A")
             col2.metric("Z-Score Atual", f"{z_score_atual:.4f}" if not np.isnan(z_score_atual) else "N/A")
+            if modelo_spread == SPREAD_KALMAN:
+                # O z-score é do resíduo contra o hedge dinâmico; o mesmo β dimensiona o simulador
+                hedge_simulador = hedge_atual(analise)
+                col1.caption(f"Hedge dinâmico (β): {hedge_simulador:.3f}")
+                if not hedge_simulador > 0:
+                    st.warning("Hedge ratio dinâmico não positivo; o simulador usará financeiro igual.")
+                    hedge_simulador = 1.0
+            # Z-score da cotação ao vivo, em O(1) sobre o estado do motor
+            preco_vivo_acao1 = precos_atuais.get(acoes_selecionadas[0])
+            preco_vivo_acao2 = precos_atuais.get(acoes_selecionadas[1])
+            if preco_vivo_acao1 and preco_vivo_acao2:
+                z_score_vivo = motor_zscore.zscore(valor_spread(analise, preco_vivo_acao1, preco_vivo_acao2))
+                if not np.isnan(z_score_vivo):
+                    col2.caption(f"Com a cotação atual: {z_score_vivo:.4f}")
             
             # Tomada de decisão
-            if not np.isnan(z_score_atual):
-                if z_score_atual > limite_superior_zscore:
-                    decisao = f"Vender {acoes_selecionadas[0]} / Comprar {acoes_selecionadas[1]}"
-                elif z_score_atual < limite_inferior_zscore:
-                    decisao = f"Comprar {acoes_selecionadas[0]} / Vender {acoes_selecionadas[1]}"
-                else:
-                    decisao = "Neutro"
-            else:
-                decisao = "Indefinido"
+            decisao = decidir(z_score_atual, limite_superior_zscore, acoes_selecionadas[0], acoes_selecionadas[1])
             col3.metric("Sinal", decisao)
+
+            # O z-score só tem sentido se o par reverte: cointegração e meia-vida no período exibido
+            cointegracao_par = obter_cache_cointegracao().testar_pares(
+                analise['painel'][[acoes_selecionadas[0], acoes_selecionadas[1]]], [(acoes_selecionadas[0], acoes_selecionadas[1])]
+            ).iloc[0]
+            col1, col2, col3 = st.columns(3)
+            if np.isnan(cointegracao_par['ADF']):
+                col1.metric("Cointegração (Engle-Granger)", "N/A")
+            else:
+                col1.metric("Cointegração (Engle-Granger)", "Sim" if cointegracao_par['Cointegrado'] else "Não")
+                col1.caption(f"ADF {cointegracao_par['ADF']:.2f} (crítico 5%: {cointegracao_par['Crítico 5%']:.2f})")
+            meia_vida_par = cointegracao_par['Meia-Vida (dias)']
+            if np.isnan(meia_vida_par):
+                col2.metric("Meia-Vida da Reversão", "N/A")
+            else:
+                col2.metric("Meia-Vida da Reversão", f"{meia_vida_par:.1f} {unidade_barras}" if np.isfinite(meia_vida_par) else "Sem reversão")
+            col3.metric("Hedge Ratio (β)", f"{cointegracao_par['Beta']:.3f}" if not np.isnan(cointegracao_par['Beta']) else "N/A")
             
-            # Gráfico
-            fig, ax1 = plt.subplots(figsize=(12, 6)) # Reduzido tamanho
-            ax1.plot(ratio.index, ratio.values, label='Ratio', color='blue', linewidth=1.5)
-            if not np.isnan(media_ratio):
-                ax1.axhline(y=media_ratio, color='green', linestyle='-', label='Média', linewidth=1)
-                ax1.axhline(y=media_ratio + limite_superior_zscore * desvio_padrao_ratio, color='red', linestyle='--', label=f'+{limite_superior_zscore:.1f}σ', linewidth=1)
-                ax1.axhline(y=media_ratio + limite_inferior_zscore * desvio_padrao_ratio, color='red', linestyle='--', label=f'{limite_inferior_zscore:.1f}σ', linewidth=1)
-            
-            ax1.set_xlabel('Data')
-            ax1.set_ylabel('Ratio', color='blue')
-            ax1.tick_params(axis='y', labelcolor='blue')
-            ax1.grid(True, axis='y', linestyle=':', alpha=0.6)
-
-            # Eixo Y secundário para commodity
-            ax2 = None # Inicializa ax2
-            if serie_brent is not None:
-                common_index_all = ratio.index.intersection(serie_brent.index)
-                if not common_index_all.empty:
-                    serie_brent_aligned = serie_brent.loc[common_index_all]
-                    ax2 = ax1.twinx()
-                    ax2.plot(serie_brent_aligned.index, serie_brent_aligned['Close'], color='orange', linestyle='-.', label=commodity_symbol, linewidth=1.5)
-                    ax2.set_ylabel(f'{commodity_symbol} (USD)', color='orange')
-                    ax2.tick_params(axis='y', labelcolor='orange')
-            
-            # Legendas combinadas
-            lines1, labels1 = ax1.get_legend_handles_labels()
-            if ax2:
-                lines2, labels2 = ax2.get_legend_handles_labels()
-                ax1.legend(lines1 + lines2, labels1 + labels2, loc='best')
+            # Gráfico reduzido à resolução da tela; o PNG fica em cache por dados e limite
+            rotulo_spread = 'Spread' if modelo_spread == SPREAD_KALMAN else 'Ratio'
+            titulo_grafico = f'{rotulo_spread} ({acoes_selecionadas[0]}/{acoes_selecionadas[1]}) e {commodity_symbol} - {periodo_selecionado}'
+            if intervalo_barras != INTERVALO_DIARIO:
+                titulo_grafico += f' ({frequencia_selecionada})'
+            dados_ratio = dados_grafico(analise['spread'], estatisticas_zscore, analise['painel'][commodity_symbol])
+            if renderizacao_grafico == RENDER_INTERATIVO:
+                with cronometrar('grafico_interativo'):
+                    grafico_altair = grafico_interativo(reduzir_para_tela(dados_ratio, PONTOS_INTERATIVO), limite_superior_zscore, commodity_symbol, titulo_grafico, rotulo_spread)
+                st.altair_chart(grafico_altair)
             else:
-                ax1.legend(lines1, labels1, loc='best')
+                st.image(grafico_ratio_png(reduzir_para_tela(dados_ratio, PONTOS_TELA), limite_superior_zscore, commodity_symbol, titulo_grafico, rotulo_spread))
 
-            plt.title(f'Ratio ({acoes_selecionadas[0]}/{acoes_selecionadas[1]}) e {commodity_symbol} - {periodo_selecionado}', fontsize=14)
-            ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-            plt.xticks(rotation=30, ha='right') # Adjusted rotation
-            plt.tight_layout()
-            st.pyplot(fig)
-            
-            # Tabela de dados
-            with st.expander("Ver Dados Históricos", expanded=False):
-                df_combinado_tabela = pd.DataFrame({
-                    f"{acoes_selecionadas[0]}": serie_acao1_aligned['Close'],
-                    f"{acoes_selecionadas[1]}": serie_acao2_aligned['Close'],
-                    "Ratio": ratio,
-                    "Z-Score": pd.Series(z_score, index=ratio.index) if not np.isnan(z_score_atual) else np.nan
-                })
-                if serie_brent is not None:
-                     common_index_table = df_combinado_tabela.index.intersection(serie_brent.index)
-                     if not common_index_table.empty:
-                         df_combinado_tabela[f"{commodity_symbol}"] = serie_brent.loc[common_index_table, 'Close']
-                
-                st.dataframe(df_combinado_tabela.tail(10))
-                csv = df_combinado_tabela.to_csv().encode('utf-8')
-                st.download_button(
-                    label="Download CSV",
-                    data=csv,
-                    file_name=f"pair_trading_{acoes_selecionadas[0]}_{acoes_selecionadas[1]}_{periodo_valor}.csv",
-                    mime="text/csv",
-                )
+            # Backtest e tabela são fragmentos: seus widgets não refazem o gráfico acima
+            secao_backtest(analise['painel'][acoes_selecionadas[0]], analise['painel'][acoes_selecionadas[1]], metodo_zscore, janela_zscore, limite_superior_zscore, unidade_barras,
+                           barras_por_ano(intervalo_barras, sessao_do_simbolo(acoes_selecionadas[0])))
+            secao_dados_historicos(acoes_selecionadas[0], acoes_selecionadas[1], commodity_symbol, periodo_valor, analise)
         else:
             st.error("Não foi possível alinhar os dados históricos das ações selecionadas.")
     elif not cotacoes_ok:
@@ -340,6 +730,28 @@ elif len(acoes_selecionadas) != 2:
 else:
      st.info("📈 Por favor, clique no botão '🔄 Atualizar Dados' na barra lateral para carregar as informações.")
 
+# Scanner de pares
+if modo_scanner:
+    st.markdown("--- ")
+    st.subheader("Scanner de Pares")
+    if not st.session_state.dados_carregados:
+        pass # Mensagem já exibida acima
+    else:
+        universo = simbolos_acoes(universo_config)
+        series_universo, limitados = servico_dados.series(universo, periodo=periodo_valor)
+        if limitados:
+            st.warning(f"Limite de requisições atingido para {len(limitados)} ações do scanner. Usando dados locais.")
+        candidatos, pares_fora, n_acoes_universo = varrer_universo(
+            tuple(universo), os.path.getmtime(CAMINHO_UNIVERSO), correlacao_minima, limite_superior_zscore,
+            tuple(versao_serie(series_universo.get(s)) for s in universo), series_universo,
+        )
+        total_pares = n_acoes_universo * (n_acoes_universo - 1) // 2
+        st.caption(f"{len(candidatos)} de {total_pares} pares pré-selecionados (correlação ≥ {correlacao_minima:.2f}, "
+                   f"{candidatos['Grupo'].nunique()} grupos com candidatos)")
+        st.markdown(f"**{len(pares_fora)} pares com |Z-Score| acima de {limite_superior_zscore:.1f}** (universo de {n_acoes_universo} ações)")
+        if not pares_fora.empty:
+            st.dataframe(pares_fora, hide_index=True)
+
 # --- Seção Simulador de Montagem/Desmontagem --- 
 st.markdown("--- ")
 st.subheader("Simulador de Montagem/Desmontagem de Operação")
@@ -445,168 +857,7 @@ st.markdown('<div class="simulator-section">', unsafe_allow_html=True)
 if not st.session_state.dados_carregados:
     st.info("Aguardando o carregamento dos dados...")
 elif len(acoes_selecionadas) == 2 and cotacoes_ok and ratio_atual is not None and z_score_atual is not None and not np.isnan(ratio_atual) and not np.isnan(z_score_atual):
-    # Garante que temos os nomes das ações selecionadas
-    acao1_nome = acoes_selecionadas[0]
-    acao2_nome = acoes_selecionadas[1]
-    preco_atual_acao1 = precos_atuais.get(acao1_nome, 0)
-    preco_atual_acao2 = precos_atuais.get(acao2_nome, 0)
-
-    st.write(f"**Par Selecionado:** {acao1_nome} vs {acao2_nome}")
-    st.write(f"**Sinal Atual:** {decisao}")
-
-    # Determinar qual ação comprar/vender baseado no sinal
-    acao_comprar_nome = None
-    acao_vender_nome = None
-    if "Comprar" in decisao:
-        acao_comprar_nome = acao1_nome if f"Comprar {acao1_nome}" in decisao else acao2_nome
-        acao_vender_nome = acao2_nome if acao_comprar_nome == acao1_nome else acao1_nome
-    elif "Vender" in decisao:
-        acao_vender_nome = acao1_nome if f"Vender {acao1_nome}" in decisao else acao2_nome
-        acao_comprar_nome = acao2_nome if acao_vender_nome == acao1_nome else acao1_nome
-    
-    if acao_comprar_nome and acao_vender_nome:
-        st.write(f"➡️ **Ação Sugerida a Comprar:** {acao_comprar_nome}")
-        st.write(f"⬅️ **Ação Sugerida a Vender (Alugar):** {acao_vender_nome}")
-        preco_compra_sugerido = precos_atuais.get(acao_comprar_nome, 0)
-        preco_venda_sugerido = precos_atuais.get(acao_vender_nome, 0)
-
-        st.markdown("#### Entradas para Simulação")
-        col_sim_in1, col_sim_in2 = st.columns(2)
-
-        with col_sim_in1:
-            st.write("**Preços e Quantidade de Entrada**")
-            preco_entrada_acao1 = st.number_input(f"Preço Entrada {acao1_nome}", value=float(preco_atual_acao1) if preco_atual_acao1 else 0.0, format="%.2f", key="preco_ent_a1")
-            preco_entrada_acao2 = st.number_input(f"Preço Entrada {acao2_nome}", value=float(preco_atual_acao2) if preco_atual_acao2 else 0.0, format="%.2f", key="preco_ent_a2")
-            
-            acao_ref = st.selectbox("Ação de Referência (Qtd)", [acao1_nome, acao2_nome], key="acao_ref")
-            qtd_ref = st.number_input(f"Quantidade {acao_ref}", min_value=100, step=100, value=1000, key="qtd_ref") # Default 1000
-            
-            # Calcular quantidade da outra ponta para equilíbrio financeiro
-            preco_ref = preco_entrada_acao1 if acao_ref == acao1_nome else preco_entrada_acao2
-            vol_ref = qtd_ref * preco_ref
-            preco_outra = preco_entrada_acao2 if acao_ref == acao1_nome else preco_entrada_acao1
-            qtd_outra = 0
-            if preco_outra > 0:
-                qtd_outra = int(round(vol_ref / preco_outra / 100.0) * 100) # Arredonda para lote de 100
-            
-            qtd_acao1 = qtd_ref if acao_ref == acao1_nome else qtd_outra
-            qtd_acao2 = qtd_ref if acao_ref == acao2_nome else qtd_outra
-            
-            # Exibe quantidades calculadas (read-only style)
-            st.markdown(f"<p style='margin-top: 10px; font-size: 0.9em;'>Qtd. Calculada {acao1_nome}: <strong style='color: #0056b3;'>{qtd_acao1}</strong></p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='font-size: 0.9em;'>Qtd. Calculada {acao2_nome}: <strong style='color: #0056b3;'>{qtd_acao2}</strong></p>", unsafe_allow_html=True)
-
-        with col_sim_in2:
-            st.write("**Preços de Saída**")
-            preco_saida_acao1 = st.number_input(f"Preço Saída {acao1_nome}", value=preco_entrada_acao1 * 1.02, format="%.2f", key="preco_sai_a1") # Default +2%
-            preco_saida_acao2 = st.number_input(f"Preço Saída {acao2_nome}", value=preco_entrada_acao2 * 0.98, format="%.2f", key="preco_sai_a2") # Default -2%
-            
-            st.write("**Custos e Duração**")
-            acao_vendida_simulacao = acao_vender_nome # Assume a sugestão
-            taxa_aluguel_aa = st.number_input(f"Taxa Aluguel Anual {acao_vendida_simulacao} (%)", min_value=0.0, value=5.0, step=0.1, format="%.2f", key="taxa_aluguel")
-            duracao_dias = st.number_input("Duração Estimada (dias)", min_value=1, value=30, step=1, key="duracao")
-            custo_corretagem = st.number_input("Corretagem Total (Entrada+Saída)", min_value=0.0, value=10.0, step=0.5, format="%.2f", key="corretagem") # Default 10
-            custo_taxas_b3 = st.number_input("Taxas B3 Total (Entrada+Saída)", min_value=0.0, value=5.0, step=0.1, format="%.2f", key="taxas_b3") # Default 5
-
-        st.markdown("#### Resultados da Simulação")
-        
-        # Cálculos de Volume
-        vol_entrada_acao1 = qtd_acao1 * preco_entrada_acao1
-        vol_entrada_acao2 = qtd_acao2 * preco_entrada_acao2
-        vol_saida_acao1 = qtd_acao1 * preco_saida_acao1
-        vol_saida_acao2 = qtd_acao2 * preco_saida_acao2
-
-        # Cálculos de Ratio e Spread (Ação 1 / Ação 2)
-        ratio_entrada = preco_entrada_acao1 / preco_entrada_acao2 if preco_entrada_acao2 != 0 else np.nan
-        spread_entrada = preco_entrada_acao1 - preco_entrada_acao2
-        ratio_saida = preco_saida_acao1 / preco_saida_acao2 if preco_saida_acao2 != 0 else np.nan
-        spread_saida = preco_saida_acao1 - preco_saida_acao2
-
-        # Cálculos de Resultado
-        resultado_acao1 = (preco_saida_acao1 - preco_entrada_acao1) * qtd_acao1
-        resultado_acao2 = (preco_saida_acao2 - preco_entrada_acao2) * qtd_acao2
-        
-        # Ajusta resultado baseado na direção (compra/venda sugerida pelo sinal)
-        if acao_comprar_nome == acao1_nome:
-            resultado_bruto = resultado_acao1 - resultado_acao2 # Compra A1, Vende A2
-        else:
-            resultado_bruto = resultado_acao2 - resultado_acao1 # Compra A2, Vende A1
-
-        # Custo Aluguel
-        custo_aluguel_total = 0
-        qtd_vendida_sim = qtd_acao1 if acao_vender_nome == acao1_nome else qtd_acao2
-        preco_entrada_vendida_sim = preco_entrada_acao1 if acao_vender_nome == acao1_nome else preco_entrada_acao2
-        vol_vendido_entrada = qtd_vendida_sim * preco_entrada_vendida_sim
-        if vol_vendido_entrada > 0 and taxa_aluguel_aa > 0 and duracao_dias > 0:
-            taxa_aluguel_diaria = (taxa_aluguel_aa / 100.0) / 365.0
-            custo_aluguel_total = vol_vendido_entrada * taxa_aluguel_diaria * duracao_dias
-            
-        custo_operacional_total = custo_corretagem + custo_taxas_b3
-        resultado_liquido = resultado_bruto - custo_aluguel_total - custo_operacional_total
-        
-        # Exibição dos Resultados Reorganizada
-        st.markdown("**Montagem (Entrada)**")
-        st.markdown(f"""
-        <div class="op-line">
-            <span class="label"><strong>{acao1_nome}</strong></span>
-            <span>R$ {preco_entrada_acao1:,.2f}</span>
-            <span class="label">Qtd: {qtd_acao1}</span>
-            <span>R$ {vol_entrada_acao1:,.2f}</span>
-        </div>
-        <div class="op-line">
-            <span class="label"><strong>{acao2_nome}</strong></span>
-            <span>R$ {preco_entrada_acao2:,.2f}</span>
-            <span class="label">Qtd: {qtd_acao2}</span>
-            <span>R$ {vol_entrada_acao2:,.2f}</span>
-        </div>
-        """, unsafe_allow_html=True)
-        col_ratio_sp_ent1, col_ratio_sp_ent2 = st.columns(2)
-        col_ratio_sp_ent1.metric("Ratio Entrada (A1/A2)", f"{ratio_entrada:.4f}" if not np.isnan(ratio_entrada) else "N/A")
-        col_ratio_sp_ent2.metric("Spread Entrada (A1-A2)", f"R$ {spread_entrada:,.2f}")
-
-        st.markdown("**Desmontagem (Saída)**")
-        st.markdown(f"""
-        <div class="op-line">
-            <span class="label"><strong>{acao1_nome}</strong></span>
-            <span>R$ {preco_saida_acao1:,.2f}</span>
-            <span class="label">Qtd: {qtd_acao1}</span>
-            <span>R$ {vol_saida_acao1:,.2f}</span>
-        </div>
-        <div class="op-line">
-            <span class="label"><strong>{acao2_nome}</strong></span>
-            <span>R$ {preco_saida_acao2:,.2f}</span>
-            <span class="label">Qtd: {qtd_acao2}</span>
-            <span>R$ {vol_saida_acao2:,.2f}</span>
-        </div>
-        """, unsafe_allow_html=True)
-        col_ratio_sp_sai1, col_ratio_sp_sai2 = st.columns(2)
-        col_ratio_sp_sai1.metric("Ratio Saída (A1/A2)", f"{ratio_saida:.4f}" if not np.isnan(ratio_saida) else "N/A")
-        col_ratio_sp_sai2.metric("Spread Saída (A1-A2)", f"R$ {spread_saida:,.2f}")
-
-        st.markdown("**Custos e Resultado**")
-        res_col1, res_col2, res_col3 = st.columns(3)
-        with res_col1:
-            st.metric("Custo Total Aluguel", f"R$ {custo_aluguel_total:,.2f}")
-        with res_col2:
-            st.metric("Custo Operacional Total", f"R$ {custo_operacional_total:,.2f}")
-        with res_col3:
-            st.metric("Resultado Bruto", f"R$ {resultado_bruto:,.2f}")
-
-        # Resultado Líquido Final Destacado
-        st.markdown('<div class="final-result">', unsafe_allow_html=True)
-        res_liq_col1, res_liq_col2 = st.columns(2)
-        res_liq_col1.metric("**Resultado Líquido**", f"**R$ {resultado_liquido:,.2f}**")
-        # Calcular % de lucro/prejuízo sobre o maior volume (aproximação do capital)
-        capital_aprox = max(vol_entrada_acao1, vol_entrada_acao2)
-        if capital_aprox > 0:
-            perc_liquido = (resultado_liquido / capital_aprox) * 100
-            res_liq_col2.metric("Resultado Líquido (%)", f"{perc_liquido:.2f}%")
-        else:
-            res_liq_col2.metric("Resultado Líquido (%)", "N/A")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    else:
-        st.info("Aguardando sinal de Compra ou Venda válido para iniciar a simulação.")
+    secao_simulador(acoes_selecionadas[0], acoes_selecionadas[1], precos_atuais, decisao, hedge_simulador, analise)
 
 elif not st.session_state.dados_carregados:
     pass # Mensagem já exibida
@@ -618,6 +869,87 @@ else:
 # Fecha o container da seção do simulador
 st.markdown('</div>', unsafe_allow_html=True)
 
+# Carteira em fragmento: selecionar posições reexecuta só esta seção
+@st.fragment
+def secao_carteira():
+    """Posições abertas com exposição líquida por ativo, aluguel, marcação a mercado e risco dos spreads."""
+    livro = obter_livro_posicoes()
+    posicoes_abertas = livro.posicoes()
+    if posicoes_abertas.empty:
+        st.info("Nenhuma operação aberta. Use 'Adicionar operação à carteira' no simulador.")
+        return
+
+    ativos_carteira = tuple(sorted(set(posicoes_abertas['Ação 1']) | set(posicoes_abertas['Ação 2'])))
+    precos_carteira = {}
+    matriz_carteira = pd.DataFrame()
+    if st.session_state.dados_carregados:
+        snapshot_carteira, _ = servico_dados.cotacoes(ativos_carteira)
+        precos_carteira = {a: float(p) for a, p in snapshot_carteira['Preço'].items() if pd.notna(p)}
+        series_carteira, _ = servico_dados.series(ativos_carteira, periodo='1y')
+        matriz_carteira = montar_matriz_fechamentos(series_carteira)
+    else:
+        st.caption("Sem dados carregados: posições marcadas no preço de entrada.")
+
+    mtm = marcacao_mercado(posicoes_abertas, precos_carteira)
+    aluguel = carrego_aluguel(posicoes_abertas, precos_carteira)
+    risco = risco_spreads(posicoes_abertas, matriz_carteira)
+
+    col_c1, col_c2, col_c3, col_c4 = st.columns(4)
+    col_c1.metric("Posições Abertas", f"{len(posicoes_abertas)}")
+    col_c2.metric("Resultado a Mercado", f"R$ {mtm['Resultado Líquido'].sum():,.2f}")
+    col_c3.metric("Aluguel Diário (líquido)", f"R$ {aluguel['liquido_diario']:,.2f}")
+    col_c3.caption(f"Somando posição a posição: R$ {aluguel['bruto_diario']:,.2f}/dia")
+    vol_carteira = risco['volatilidade_carteira']
+    col_c4.metric("Volatilidade Diária", f"R$ {vol_carteira:,.2f}" if not np.isnan(vol_carteira) else "N/A")
+    if not np.isnan(vol_carteira):
+        col_c4.caption(f"Soma das posições isoladas: R$ {risco['soma_volatilidades']:,.2f}")
+
+    tabela_posicoes = posicoes_abertas.merge(mtm, on='ID')
+    tabela_posicoes['Volatilidade Diária'] = tabela_posicoes['ID'].map(risco['volatilidade'])
+    st.dataframe(tabela_posicoes, hide_index=True)
+
+    st.write("**Exposição líquida por ativo:**")
+    st.dataframe(exposicao_liquida(posicoes_abertas, precos_carteira), hide_index=True)
+
+    correlacao = risco['correlacao'].to_numpy(dtype=np.float64)
+    if len(correlacao) > 1 and np.isfinite(correlacao).any():
+        i, j = np.triu_indices(len(correlacao), k=1)
+        rho = correlacao[i, j]
+        ordem = np.argsort(-np.abs(np.nan_to_num(rho)), kind='stable')[:10]
+        ids = risco['correlacao'].index.to_numpy()
+        st.write("**Spreads mais correlacionados (resultado diário):**")
+        st.dataframe(pd.DataFrame({'Posição A': ids[i[ordem]], 'Posição B': ids[j[ordem]], 'Correlação': rho[ordem]}), hide_index=True)
+
+    encerrar = st.multiselect("Encerrar posições", posicoes_abertas['ID'].tolist(), key="encerrar_posicoes")
+    if encerrar and st.button("Encerrar selecionadas", key="confirmar_encerramento"):
+        livro.encerrar(encerrar)
+        st.rerun()
+
+st.markdown("--- ")
+st.subheader("Carteira de Operações")
+secao_carteira()
+
+# Tempo da página (sem o painel abaixo) e publicação nos arquivos de métricas configurados
+REGISTRO.registrar('pagina', time.perf_counter() - inicio_pagina)
+try:
+    REGISTRO.publicar()
+except OSError as e:
+    st.sidebar.warning(f"Não foi possível gravar as métricas: {e}")
+
+if st.sidebar.checkbox("Painel de diagnóstico", value=False, key="painel_diagnostico"):
+    st.markdown("--- ")
+    st.subheader("Diagnóstico")
+    st.caption("Tempos e contadores de todo o processo (todas as sessões), desde o início do servidor. "
+               "Percentis sobre as execuções mais recentes de cada etapa.")
+    st.write("**Tempo por etapa:**")
+    st.dataframe(REGISTRO.etapas(), hide_index=True)
+    st.write("**Cache, provedor e rate limits:**")
+    st.dataframe(REGISTRO.contadores(), hide_index=True)
+    col_prom, col_jsonl = st.columns(2)
+    col_prom.download_button("Exportar Prometheus", data=REGISTRO.prometheus(), file_name="arbitragem.prom", mime="text/plain")
+    col_jsonl.download_button("Exportar JSON lines", data=REGISTRO.linha_json() + "\n", file_name="arbitragem_metricas.jsonl",
+                              mime="application/x-ndjson")
+
 # Informações adicionais
 st.sidebar.markdown("---")
 st.sidebar.subheader("Sobre")
@@ -0,0 +1,266 @@
+"""Provedores de dados locais com a interface do `yfinance` (`download` e `Ticker`), para rodar sem rede.
+
+- `ProvedorGravado` reproduz barras e ações corporativas gravadas em CSV por `gravar_fixtures`.
+- `ProvedorSintetico` gera preços determinísticos: símbolos do mesmo grupo (por padrão, a
+  mesma raiz de ticker, como PETR3/PETR4) seguem um fator comum e desvios Ornstein-Uhlenbeck
+  próprios, então são cointegrados; grupos diferentes são independentes.
+
+Os dois entram em qualquer lugar que aceita `provedor` (ServicoDados, ArmazemOHLCV,
+baixar_lote...) e, com a variável ARBITRAGEM_PROVEDOR ('sintetico' ou o diretório das
+fixtures), substituem o yfinance em `dados.provedor_padrao`, inclusive no dashboard.
+"""
+import os
+import re
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import DESLOCAMENTOS_PERIODO, INICIO_HISTORICO
+from intradiario import DURACOES, SESSOES, sessao_do_simbolo
+
+PROVEDOR_SINTETICO = 'sintetico'
+COLUNAS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Períodos de gravação das fixtures por intervalo (o máximo que o provedor aceita)
+PERIODOS_FIXTURES = {'1d': 'max', '5m': '60d', '1m': '7d'}
+
+
+def _deslocamento(periodo):
+    """Converte um período do yfinance ('5d', '1mo', '1y'...) em deslocamento de datas (None = 'max')."""
+    if periodo in (None, 'max'):
+        return None
+    if periodo in DESLOCAMENTOS_PERIODO:
+        return DESLOCAMENTOS_PERIODO[periodo]
+    dias = re.fullmatch(r'(\d+)d', periodo)
+    if dias:
+        return pd.Timedelta(days=int(dias.group(1)))
+    if periodo == 'ytd':
+        return None
+    raise ValueError(f"Período não suportado: {periodo}")
+
+
+def _recortar(df, period=None, start=None, end=None):
+    """Recorta as barras como o yfinance: a partir de `start`, ou o `period` que termina na última barra."""
+    if df is None or df.empty:
+        return df
+    indice = df.index
+    mascara = np.ones(len(df), dtype=bool)
+    if start is not None:
+        inicio = pd.Timestamp(start)
+        if indice.tz is not None and inicio.tzinfo is None:
+            inicio = inicio.tz_localize(indice.tz)
+        mascara &= indice >= inicio
+    else:
+        deslocamento = _deslocamento(period)
+        if deslocamento is not None:
+            ultimo = indice[-1]
+            # Períodos intradiários contam dias de pregão a partir do fim do último pregão
+            mascara &= indice > (ultimo.normalize() + pd.Timedelta(days=1) - deslocamento)
+    if end is not None:
+        fim = pd.Timestamp(end)
+        if indice.tz is not None and fim.tzinfo is None:
+            fim = fim.tz_localize(indice.tz)
+        mascara &= indice < fim
+    return df.iloc[np.flatnonzero(mascara)]
+
+
+class _TickerLocal:
+    """Equivalente local de `yf.Ticker` para um símbolo."""
+
+    def __init__(self, provedor, simbolo):
+        self._provedor = provedor
+        self._simbolo = simbolo
+
+    def history(self, period='1mo', interval='1d', start=None, end=None, **kwargs):
+        barras = _recortar(self._provedor.barras(self._simbolo, interval), period, start, end)
+        return barras if barras is not None else pd.DataFrame(columns=COLUNAS)
+
+    def get_history_metadata(self):
+        barras = self._provedor.barras(self._simbolo, '1d')
+        if barras is None or barras.empty:
+            return {}
+        instante = pd.Timestamp(barras.index[-1])
+        instante = instante.tz_localize('UTC') if instante.tzinfo is None else instante
+        return {'regularMarketPrice': float(barras['Close'].iloc[-1]), 'regularMarketTime': int(instante.timestamp())}
+
+    @property
+    def actions(self):
+        return self._provedor.acoes_corporativas(self._simbolo)
+
+
+class _ProvedorLocal(ABC):
+    """Base dos provedores locais: `download` em lote e `Ticker` sobre `barras(símbolo, intervalo)`."""
+
+    def __init__(self):
+        # O yfinance registra aqui os erros por símbolo do download em lote
+        self.shared = SimpleNamespace(_ERRORS={})
+
+    @abstractmethod
+    def barras(self, simbolo, intervalo='1d'):
+        """Barras OHLCV do símbolo no intervalo, com todo o histórico disponível (ou None)."""
+
+    def acoes_corporativas(self, simbolo):
+        return pd.DataFrame(columns=['Dividends', 'Stock Splits'])
+
+    def download(self, tickers, period='1mo', interval='1d', start=None, end=None, **kwargs):
+        simbolos = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {}
+        for simbolo in simbolos:
+            barras = _recortar(self.barras(simbolo, interval), period, start, end)
+            if barras is not None and not barras.empty:
+                frames[simbolo] = barras
+        if not frames:
+            return pd.DataFrame()
+        # Como o yfinance: colunas (símbolo, campo) na união das datas
+        return pd.concat(frames, axis=1, sort=True)
+
+    def Ticker(self, simbolo):
+        return _TickerLocal(self, simbolo)
+
+
+class ProvedorSintetico(_ProvedorLocal):
+    """Preços sintéticos determinísticos, cointegrados dentro de cada grupo de símbolos.
+
+    log P = nível + fator do grupo (passeio aleatório) + desvio OU do símbolo com meia-vida
+    `meia_vida` barras. O mesmo símbolo e a mesma data geram sempre o mesmo preço para uma
+    `semente`, qualquer que seja a data final. `grupos` ({símbolo: grupo}) substitui o
+    agrupamento padrão pela raiz do ticker (4 primeiros caracteres).
+    """
+
+    def __init__(self, grupos=None, inicio=INICIO_HISTORICO, fim=None, semente=0, volatilidade=0.015,
+                 volatilidade_desvio=0.01, meia_vida=20.0):
+        super().__init__()
+        self.grupos = dict(grupos or {})
+        self.inicio = pd.Timestamp(inicio)
+        self.fim = pd.Timestamp.today().normalize() if fim is None else pd.Timestamp(fim)
+        self.semente = semente
+        self.volatilidade = volatilidade
+        self.volatilidade_desvio = volatilidade_desvio
+        self.meia_vida = meia_vida
+        self._cache = {}
+        # Reentrante: as barras intradiárias partem das diárias do mesmo símbolo
+        self._lock = threading.RLock()
+
+    def grupo(self, simbolo):
+        return self.grupos.get(simbolo, simbolo.upper()[:4])
+
+    def _aleatorio(self, *chave):
+        return np.random.default_rng([self.semente, *(zlib.crc32(str(c).encode()) for c in chave)])
+
+    def _log_precos(self, simbolo, n, escala, chave):
+        """Fator do grupo + desvio OU do símbolo para `n` barras com volatilidade × `escala`."""
+        fator = np.cumsum(self._aleatorio('fator', self.grupo(simbolo), *chave).normal(0.0, self.volatilidade * escala, n))
+        choques = self._aleatorio('desvio', simbolo, *chave).normal(0.0, self.volatilidade_desvio * escala, n)
+        phi = 0.5 ** (1.0 / self.meia_vida)
+        # AR(1) vetorizado: d_t = Σ phi^(t-k) e_k, calculado por blocos para não estourar phi^-t
+        desvio = np.empty(n)
+        anterior = 0.0
+        for inicio in range(0, n, 256):
+            bloco = choques[inicio:inicio + 256]
+            potencias = phi ** np.arange(len(bloco))
+            desvio[inicio:inicio + len(bloco)] = potencias * (anterior * phi + np.cumsum(bloco / potencias))
+            anterior = desvio[inicio + len(bloco) - 1]
+        return fator + desvio
+
+    def _ohlcv(self, simbolo, indice, fechamentos):
+        abertura = np.concatenate([[fechamentos[0]], fechamentos[:-1]])
+        volume = 1e5 * (1 + zlib.crc32(simbolo.encode()) % 50)
+        return pd.DataFrame({
+            'Open': abertura,
+            'High': np.maximum(abertura, fechamentos),
+            'Low': np.minimum(abertura, fechamentos),
+            'Close': fechamentos,
+            'Volume': np.full(len(indice), volume),
+        }, index=indice)
+
+    def _diarias(self, simbolo):
+        indice = pd.bdate_range(self.inicio, self.fim, name='Date')
+        nivel = 10.0 + zlib.crc32(simbolo.encode()) % 50
+        return self._ohlcv(simbolo, indice, nivel * np.exp(self._log_precos(simbolo, len(indice), 1.0, ())))
+
+    def _intradiarias(self, simbolo, intervalo):
+        """Barras do pregão regular do mercado do símbolo nos últimos dias que o provedor real serve."""
+        fuso, abertura, fechamento = SESSOES[sessao_do_simbolo(simbolo)]
+        duracao = DURACOES[intervalo]
+        dias = pd.bdate_range(self.fim - pd.Timedelta(days=59 if intervalo == '5m' else 7), self.fim)
+        minutos = pd.timedelta_range(pd.Timedelta(minutes=abertura), pd.Timedelta(minutes=fechamento) - duracao, freq=duracao)
+        indice = pd.DatetimeIndex(
+            (dias.values[:, None] + minutos.values[None, :]).ravel(), name='Datetime'
+        ).tz_localize(fuso)
+        diarias = self.barras(simbolo, '1d')
+        # Começa no fechamento diário anterior ao primeiro pregão intradiário
+        anteriores = diarias.loc[:dias[0] - pd.Timedelta(days=1), 'Close']
+        nivel = float(anteriores.iloc[-1]) if not anteriores.empty else float(diarias['Close'].iloc[0])
+        escala = np.sqrt(duracao / pd.Timedelta(hours=(fechamento - abertura) / 60))
+        log_precos = self._log_precos(simbolo, len(indice), escala, (intervalo,))
+        return self._ohlcv(simbolo, indice, nivel * np.exp(log_precos - log_precos[0]))
+
+    def barras(self, simbolo, intervalo='1d'):
+        chave = (simbolo, intervalo)
+        with self._lock:
+            if chave not in self._cache:
+                self._cache[chave] = self._diarias(simbolo) if intervalo == '1d' else self._intradiarias(simbolo, intervalo)
+            return self._cache[chave]
+
+
+class ProvedorGravado(_ProvedorLocal):
+    """Reproduz as fixtures gravadas por `gravar_fixtures` em `diretorio`.
+
+    Layout: `<diretorio>/<intervalo>/<símbolo>.csv` com as barras e
+    `<diretorio>/acoes/<símbolo>.csv` com as ações corporativas. Símbolos sem arquivo
+    simplesmente não vêm no download, como símbolos inexistentes no yfinance.
+    """
+
+    def __init__(self, diretorio):
+        super().__init__()
+        self.diretorio = diretorio
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _ler(self, *partes):
+        caminho = os.path.join(self.diretorio, *partes)
+        with self._lock:
+            if caminho not in self._cache:
+                dados = None
+                if os.path.exists(caminho):
+                    dados = pd.read_csv(caminho, index_col=0)
+                    dados.index = pd.to_datetime(dados.index, utc=dados.index.str.contains(r'[+-]\d\d:\d\d$').any())
+                self._cache[caminho] = dados
+            return self._cache[caminho]
+
+    def barras(self, simbolo, intervalo='1d'):
+        return self._ler(intervalo, f'{simbolo}.csv')
+
+    def acoes_corporativas(self, simbolo):
+        acoes = self._ler('acoes', f'{simbolo}.csv')
+        return acoes if acoes is not None else super().acoes_corporativas(simbolo)
+
+
+def gravar_fixtures(simbolos, diretorio, provedor=None, periodos=None):
+    """Grava barras (por intervalo) e ações corporativas dos símbolos para o `ProvedorGravado`."""
+    from dados import baixar_acoes_corporativas, baixar_lote
+
+    for intervalo, periodo in (periodos or PERIODOS_FIXTURES).items():
+        os.makedirs(os.path.join(diretorio, intervalo), exist_ok=True)
+        for simbolo, barras in baixar_lote(simbolos, periodo=periodo, intervalo=intervalo, provedor=provedor).items():
+            if barras is not None:
+                barras[COLUNAS].to_csv(os.path.join(diretorio, intervalo, f'{simbolo}.csv'))
+    os.makedirs(os.path.join(diretorio, 'acoes'), exist_ok=True)
+    for simbolo, acoes in baixar_acoes_corporativas(simbolos, provedor=provedor).items():
+        if acoes is not None:
+            acoes.to_csv(os.path.join(diretorio, 'acoes', f'{simbolo}.csv'))
+
+
+_PROVEDORES_LOCAIS = {}
+
+
+def provedor_local(configuracao):
+    """Provedor local compartilhado para 'sintetico' ou para um diretório de fixtures."""
+    if configuracao not in _PROVEDORES_LOCAIS:
+        _PROVEDORES_LOCAIS[configuracao] = (
+            ProvedorSintetico() if configuracao == PROVEDOR_SINTETICO else ProvedorGravado(configuracao)
+        )
+    return _PROVEDORES_LOCAIS[configuracao]
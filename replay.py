@@ -0,0 +1,153 @@
+"""Replay determinístico e acelerado de barras diárias pelo pipeline completo do monitor.
+
+As barras vêm de um provedor local (fixtures gravadas ou preços sintéticos, ver
+`provedores`) e passam pelo mesmo caminho da operação real: coleta para o banco local →
+painel alinhado → z-score (motor incremental) → decisão, gravada pelo `MonitorSinais`.
+Cada ciclo enxerga só as barras até a data simulada, então o resultado é o que o monitor
+teria produzido rodando naqueles dias, sem rede e sem depender do relógio.
+
+    python replay.py PETR3.SA:PETR4.SA --sintetico --fim 2026-10-16 --metodo "Janela móvel"
+    python replay.py PETR3.SA:PETR4.SA --fixtures fixtures/ --velocidade 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import ArmazemOHLCV, inicio_periodo
+from hedge_dinamico import SPREAD_KALMAN, SPREAD_RATIO
+from monitor import COLUNAS_CRUZAMENTOS, MonitorSinais
+from motor_zscore import AMOSTRA_COMPLETA, MODOS
+from provedores import ProvedorGravado, ProvedorSintetico
+from sinais import FORMATOS_SAIDA, PERIODOS, ler_par
+
+# Barras anteriores ao início do replay usadas só para aquecer as estatísticas
+BARRAS_AQUECIMENTO = 250
+
+
+class FonteReplay:
+    """Fonte do monitor que serve as séries recortadas até a data simulada (`agora`).
+
+    Sem cotação ao vivo: o monitor avalia o último fechamento incorporado, como fora do pregão.
+    """
+
+    def __init__(self, series):
+        self._series = {s: df for s, df in series.items() if df is not None and not df.empty}
+        self.agora = None
+
+    def datas(self):
+        """Datas com barra de algum símbolo, em ordem."""
+        indices = [df.index for df in self._series.values()]
+        if not indices:
+            return pd.DatetimeIndex([])
+        return indices[0].append(indices[1:]).unique().sort_values()
+
+    def series(self, simbolos, periodo='1y'):
+        recortes = {}
+        for simbolo in dict.fromkeys(simbolos):
+            df = self._series.get(simbolo)
+            if df is None:
+                recortes[simbolo] = None
+                continue
+            inicio = df.index.searchsorted(inicio_periodo(periodo, hoje=self.agora))
+            fim = df.index.searchsorted(self.agora, side='right')
+            recortes[simbolo] = df.iloc[inicio:fim] if fim > inicio else None
+        return recortes, []
+
+    def cotacoes(self, simbolos):
+        snapshot = pd.DataFrame(
+            {'Preço': np.nan, 'Horário': None, 'Origem': None}, index=pd.Index(list(dict.fromkeys(simbolos)), name='Símbolo')
+        )
+        return snapshot, []
+
+
+def reproduzir(pares, provedor, inicio=None, fim=None, periodo='1y', metodo=AMOSTRA_COMPLETA, janela=60, limite=1.0,
+               modelo_spread=SPREAD_RATIO, velocidade=None, caminho_banco=None, ao_cruzar=()):
+    """Reproduz as barras de `inicio` a `fim` e devolve (cruzamentos, estatísticas).
+
+    Sem `inicio`, começa depois de BARRAS_AQUECIMENTO barras. `velocidade` limita o replay a
+    N barras por segundo (None = o mais rápido possível). Sem `caminho_banco`, o banco local e
+    os sinais ficam em um diretório temporário descartado no fim.
+    """
+    pares = [tuple(par) for par in pares]
+    simbolos = tuple(dict.fromkeys(s for par in pares for s in par))
+    with tempfile.TemporaryDirectory() as temporario:
+        caminho = caminho_banco or os.path.join(temporario, 'replay.sqlite')
+        armazem = ArmazemOHLCV(caminho=caminho, provedor=provedor)
+        relogio = time.perf_counter()
+        armazem.atualizar(simbolos)
+        fonte = FonteReplay(armazem.series(simbolos, periodo='max'))
+        segundos_coleta = time.perf_counter() - relogio
+
+        datas = fonte.datas()
+        if fim is not None:
+            datas = datas[datas <= pd.Timestamp(fim)]
+        datas = datas[datas >= pd.Timestamp(inicio)] if inicio is not None else datas[BARRAS_AQUECIMENTO:]
+
+        cruzamentos = []
+        monitor = MonitorSinais(pares, fonte=fonte, caminho_banco=caminho, periodo=periodo, metodo=metodo,
+                                janela=janela, limite=limite, ao_cruzar=ao_cruzar, modelo_spread=modelo_spread)
+        relogio = time.perf_counter()
+        for barra, data in enumerate(datas):
+            fonte.agora = data
+            cruzamentos.extend(monitor.ciclo(agora=data))
+            if velocidade:
+                # Mantém o ritmo pedido sem acumular atraso entre as barras
+                espera = relogio + (barra + 1) / velocidade - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+        segundos = time.perf_counter() - relogio
+
+    estatisticas = {
+        'barras': len(datas),
+        'pares': len(pares),
+        'segundos_coleta': segundos_coleta,
+        'segundos': segundos,
+        'barras_por_segundo': len(datas) / segundos if segundos > 0 else float('nan'),
+    }
+    return pd.DataFrame(cruzamentos, columns=COLUNAS_CRUZAMENTOS), estatisticas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay acelerado e offline do monitor de sinais.")
+    parser.add_argument('pares', nargs='+', type=ler_par, metavar='ACAO1:ACAO2')
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument('--fixtures', default=None, help="diretório gravado por provedores.gravar_fixtures")
+    origem.add_argument('--sintetico', action='store_true', help="preços sintéticos cointegrados")
+    parser.add_argument('--semente', type=int, default=0, help="semente dos preços sintéticos")
+    parser.add_argument('--inicio', default=None, help="primeira data do replay (AAAA-MM-DD)")
+    parser.add_argument('--fim', default=None, help="última data do replay (AAAA-MM-DD)")
+    parser.add_argument('--periodo', choices=PERIODOS, default='1y')
+    parser.add_argument('--metodo', choices=MODOS, default=AMOSTRA_COMPLETA)
+    parser.add_argument('--janela', type=int, default=60, help="janela móvel ou meia-vida EWMA, em dias")
+    parser.add_argument('--limite', type=float, default=1.0, help="limite de |z-score| para entrada")
+    parser.add_argument('--kalman', action='store_true', help="spread com hedge ratio dinâmico (filtro de Kalman)")
+    parser.add_argument('--velocidade', type=float, default=None, help="barras por segundo (padrão: sem pausa)")
+    parser.add_argument('--formato', choices=FORMATOS_SAIDA, default='json')
+    parser.add_argument('--banco', default=None, help="mantém banco e sinais neste SQLite")
+    args = parser.parse_args(argv)
+
+    provedor = ProvedorGravado(args.fixtures) if args.fixtures else ProvedorSintetico(fim=args.fim, semente=args.semente)
+    cruzamentos, estatisticas = reproduzir(
+        args.pares, provedor, inicio=args.inicio, fim=args.fim, periodo=args.periodo, metodo=args.metodo,
+        janela=args.janela, limite=args.limite, modelo_spread=SPREAD_KALMAN if args.kalman else SPREAD_RATIO,
+        velocidade=args.velocidade, caminho_banco=args.banco,
+    )
+    if args.formato == 'csv':
+        cruzamentos.to_csv(sys.stdout, index=False)
+    else:
+        json.dump(json.loads(cruzamentos.to_json(orient='records')), sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+    print(f"{estatisticas['barras']} barras x {estatisticas['pares']} pares em {estatisticas['segundos']:.2f} s "
+          f"({estatisticas['barras_por_segundo']:.0f} barras/s; coleta {estatisticas['segundos_coleta']:.2f} s)",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""Serviço de dados compartilhado entre as sessões do dashboard.
+
+Uma única instância por processo concentra o acesso ao provedor:
+- buscas simultâneas do mesmo símbolo são coalescidas (single-flight);
+- o cache tem TTL e pode ser invalidado por símbolo, sem afetar as outras sessões;
+- todas as requisições passam por um balde de tokens global, então N usuários custam ao
+  provedor aproximadamente o mesmo que um.
+
+Tempos de cada consulta, acertos/faltas de cache, chamadas ao provedor e rate limits vão
+para o registro de `metricas`.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+from acoes_corporativas import IndiceAcoesCorporativas
+from armazenamento import ArmazemOHLCV
+from dados import LimiteRequisicoes, baixar_ultimos_precos, provedor_padrao
+from intradiario import DURACOES, ArmazemIntradiario
+from metricas import cronometrar, incrementar
+
+# Validade do cache em memória, em segundos
+TTL_COTACOES = 300
+TTL_SERIES = 300
+TTL_ACOES_CORPORATIVAS = 300
+# Barras de minuto envelhecem rápido: atualiza no máximo a cada minuto
+TTL_INTRADIARIO = 60
+
+# Orçamento global de requisições ao provedor (rajada e reposição por segundo)
+CAPACIDADE_BALDE = 30
+TAXA_BALDE = 0.5
+# Tempo máximo de espera por tokens antes de tratar como rate limit
+ESPERA_MAXIMA_TOKENS = 10.0
+
+
+class BaldeTokens:
+    """Balde de tokens thread-safe: cada requisição ao provedor consome um token.
+
+    Um lote maior que a capacidade é consumido em partes de `capacidade` tokens, cada uma
+    esperando o balde encher de novo; entre as partes as outras sessões continuam sendo
+    atendidas, e o saldo nunca fica negativo.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_BALDE, taxa=TAXA_BALDE):
+        self.capacidade = float(capacidade)
+        self.taxa = float(taxa)
+        self._tokens = float(capacidade)
+        self._instante = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._instante) * self.taxa)
+        self._instante = agora
+
+    def _consumir_parte(self, quantidade, timeout):
+        limite = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._repor()
+                if self._tokens >= quantidade:
+                    self._tokens -= quantidade
+                    return True
+                espera = (quantidade - self._tokens) / self.taxa if self.taxa > 0 else float('inf')
+            if time.monotonic() + espera > limite:
+                return False
+            time.sleep(espera)
+
+    def consumir(self, quantidade=1, timeout=ESPERA_MAXIMA_TOKENS):
+        """Consome `quantidade` tokens, esperando até `timeout` segundos; devolve False se não conseguir.
+
+        Cada parte de um lote grande, depois da primeira, tem também o tempo de encher o balde
+        para esperar. Se uma parte for recusada, as anteriores continuam consumidas.
+        """
+        restante = float(quantidade)
+        espera = timeout or 0.0
+        while restante > 0:
+            parte = min(restante, self.capacidade)
+            if not self._consumir_parte(parte, espera):
+                return False
+            restante -= parte
+            espera = (timeout or 0.0) + (self.capacidade / self.taxa if self.taxa > 0 else 0.0)
+        return True
+
+
+class _TickerLimitado:
+    """Repassa as chamadas de `yf.Ticker` consumindo tokens do balde."""
+
+    def __init__(self, ticker, provedor, simbolo):
+        self._ticker = ticker
+        self._provedor = provedor
+        self._simbolo = simbolo
+
+    def history(self, *args, **kwargs):
+        self._provedor.reservar([self._simbolo])
+        incrementar('provedor_chamadas', tipo='history')
+        with cronometrar('provedor_history'):
+            return self._ticker.history(*args, **kwargs)
+
+    def get_history_metadata(self):
+        # Os metadados vêm na mesma resposta do `history`
+        return self._ticker.get_history_metadata()
+
+    @property
+    def actions(self):
+        self._provedor.reservar([self._simbolo])
+        incrementar('provedor_chamadas', tipo='actions')
+        with cronometrar('provedor_actions'):
+            return self._ticker.actions
+
+
+class ProvedorLimitado:
+    """Provedor com a interface do módulo `yfinance` que respeita um balde de tokens global."""
+
+    def __init__(self, provedor=None, balde=None):
+        self.provedor = provedor or provedor_padrao()
+        self.balde = balde or BaldeTokens()
+
+    @property
+    def shared(self):
+        return getattr(self.provedor, 'shared', None)
+
+    def reservar(self, simbolos):
+        """Reserva um token por símbolo; sem orçamento, levanta `LimiteRequisicoes`."""
+        if not self.balde.consumir(len(simbolos)):
+            incrementar('balde_recusas', len(simbolos))
+            raise LimiteRequisicoes(simbolos)
+
+    def download(self, tickers, **kwargs):
+        simbolos = [tickers] if isinstance(tickers, str) else list(tickers)
+        self.reservar(simbolos)
+        incrementar('provedor_chamadas', tipo='download')
+        incrementar('provedor_simbolos', len(simbolos), tipo='download')
+        with cronometrar('provedor_download'):
+            return self.provedor.download(tickers, **kwargs)
+
+    def Ticker(self, simbolo):
+        return _TickerLimitado(self.provedor.Ticker(simbolo), self, simbolo)
+
+
+class CacheVooUnico:
+    """Cache por chave com TTL em que buscas simultâneas da mesma chave são coalescidas.
+
+    Quem encontra a chave ausente vira o "líder" e busca todas as chaves que reivindicou em
+    uma única chamada; as demais threads aguardam o resultado dele. Valores None ou
+    `LimiteRequisicoes` são repassados a quem aguarda, mas não ficam em cache. Acertos,
+    faltas, esperas coalescidas e rate limits são contados nas métricas com o rótulo `nome`.
+    """
+
+    def __init__(self, ttl, nome='cache'):
+        self.ttl = ttl
+        self.nome = nome
+        self._lock = threading.Lock()
+        self._valores = {}
+        self._em_voo = {}
+
+    def obter(self, chaves, buscar):
+        """Devolve {chave: valor}, chamando `buscar(chaves_faltantes)` só para o que não está em cache nem em voo."""
+        agora = time.monotonic()
+        resultado = {}
+        aguardar = {}
+        minhas = {}
+        with self._lock:
+            for chave in dict.fromkeys(chaves):
+                item = self._valores.get(chave)
+                if item is not None and agora - item[0] < self.ttl:
+                    resultado[chave] = item[1]
+                elif chave in self._em_voo:
+                    aguardar[chave] = self._em_voo[chave]
+                else:
+                    minhas[chave] = self._em_voo[chave] = Future()
+        incrementar('cache_acertos', len(resultado), cache=self.nome)
+        incrementar('cache_coalescidas', len(aguardar), cache=self.nome)
+        incrementar('cache_faltas', len(minhas), cache=self.nome)
+
+        if minhas:
+            try:
+                valores = buscar(list(minhas))
+            except BaseException as e:
+                with self._lock:
+                    for chave, futuro in minhas.items():
+                        del self._em_voo[chave]
+                        futuro.set_exception(e)
+                raise
+            instante = time.monotonic()
+            with self._lock:
+                for chave, futuro in minhas.items():
+                    valor = valores.get(chave)
+                    if valor is not None and not isinstance(valor, LimiteRequisicoes):
+                        self._valores[chave] = (instante, valor)
+                    del self._em_voo[chave]
+                    futuro.set_result(valor)
+                    resultado[chave] = valor
+            # Contado só pelo líder, para não repetir o mesmo evento em quem aguardava
+            limitados = sum(isinstance(valores.get(chave), LimiteRequisicoes) for chave in minhas)
+            if limitados:
+                incrementar('rate_limit', limitados, cache=self.nome)
+
+        for chave, futuro in aguardar.items():
+            resultado[chave] = futuro.result()
+        return resultado
+
+    def invalidar(self, chaves=None):
+        """Descarta as chaves informadas (ou todas, se None)."""
+        with self._lock:
+            if chaves is None:
+                self._valores.clear()
+            else:
+                for chave in chaves:
+                    self._valores.pop(chave, None)
+
+
+class ServicoDados:
+    """Ponto único de acesso a cotações, séries históricas e ações corporativas."""
+
+    def __init__(self, provedor=None, caminho_banco=None, balde=None, diretorio_intradiario=None):
+        self.provedor = ProvedorLimitado(provedor, balde)
+        self.armazem = ArmazemOHLCV(caminho_banco, provedor=self.provedor)
+        self.intradiario = ArmazemIntradiario(diretorio_intradiario, provedor=self.provedor)
+        self.indice_acoes = IndiceAcoesCorporativas(caminho_banco, provedor=self.provedor)
+        self._cotacoes = CacheVooUnico(TTL_COTACOES, 'cotacoes')
+        self._series = CacheVooUnico(TTL_SERIES, 'series')
+        self._acoes_corporativas = CacheVooUnico(TTL_ACOES_CORPORATIVAS, 'acoes_corporativas')
+        self._intradiario = CacheVooUnico(TTL_INTRADIARIO, 'intradiario')
+
+    def cotacoes(self, simbolos):
+        """Snapshot de último preço (DataFrame por símbolo) e lista de símbolos com rate limit."""
+        def buscar(faltantes):
+            try:
+                snapshot, limitados = baixar_ultimos_precos(faltantes, provedor=self.provedor, armazem=self.armazem)
+            except LimiteRequisicoes as e:
+                return {s: e for s in faltantes}
+            valores = {}
+            for simbolo, linha in snapshot.iterrows():
+                # Sem preço não se guarda em cache; com rate limit, avisa também quem aguardava
+                valores[simbolo] = linha.to_dict() if pd.notna(linha['Preço']) else None
+                if simbolo in limitados and valores[simbolo] is None:
+                    valores[simbolo] = LimiteRequisicoes([simbolo])
+            return valores
+
+        with cronometrar('cotacoes'):
+            valores = self._cotacoes.obter(simbolos, buscar)
+        limitados = [s for s, v in valores.items() if isinstance(v, LimiteRequisicoes)]
+        linhas = {s: (v if isinstance(v, dict) else {'Preço': None, 'Horário': None, 'Origem': None}) for s, v in valores.items()}
+        snapshot = pd.DataFrame.from_dict(linhas, orient='index', columns=['Preço', 'Horário', 'Origem'])
+        snapshot.index.name = 'Símbolo'
+        return snapshot, limitados
+
+    def atualizar_series(self, simbolos):
+        """Atualiza o banco local dos símbolos (no máximo uma vez por TTL); devolve os símbolos com rate limit."""
+        def buscar(faltantes):
+            try:
+                self.armazem.atualizar(faltantes)
+            except LimiteRequisicoes as e:
+                return {s: (LimiteRequisicoes([s]) if s in e.simbolos else True) for s in faltantes}
+            except Exception:
+                return {}
+            return {s: True for s in faltantes}
+
+        valores = self._series.obter(simbolos, buscar)
+        return [s for s, v in valores.items() if isinstance(v, LimiteRequisicoes)]
+
+    def series(self, simbolos, periodo='1y'):
+        """Séries históricas do banco local, atualizadas antes se necessário; e símbolos com rate limit."""
+        with cronometrar('series_historicas'):
+            limitados = self.atualizar_series(simbolos)
+            # Mesmo com falha na atualização, usa o que já estiver gravado localmente
+            return self.armazem.series(simbolos, periodo=periodo), limitados
+
+    def atualizar_intradiarias(self, simbolos, intervalo):
+        """Anexa as barras intradiárias novas (no máximo uma vez por TTL); devolve os símbolos com rate limit."""
+        def buscar(faltantes):
+            grupo = [simbolo for simbolo, _ in faltantes]
+            try:
+                self.intradiario.atualizar(grupo, intervalo)
+            except LimiteRequisicoes as e:
+                return {(s, i): (LimiteRequisicoes([s]) if s in e.simbolos else True) for s, i in faltantes}
+            except Exception:
+                return {}
+            return {chave: True for chave in faltantes}
+
+        valores = self._intradiario.obter([(s, intervalo) for s in simbolos], buscar)
+        return [s for (s, _), v in valores.items() if isinstance(v, LimiteRequisicoes)]
+
+    def series_intradiarias(self, simbolos, intervalo, periodo='1mo'):
+        """Barras intradiárias locais (mapeadas em memória), atualizadas antes se necessário; e símbolos com rate limit."""
+        with cronometrar('series_intradiarias'):
+            limitados = self.atualizar_intradiarias(simbolos, intervalo)
+            return self.intradiario.series(simbolos, intervalo, periodo=periodo), limitados
+
+    def acoes_corporativas(self, simbolos):
+        """{símbolo: DataFrame de ações corporativas ou None}, lido do índice local.
+
+        O índice só consulta o provedor quando o símbolo passou do intervalo de atualização;
+        símbolos com evento novo têm o histórico de preços reajustado na hora.
+        """
+        def buscar(faltantes):
+            try:
+                novos, limitados = self.indice_acoes.atualizar(faltantes)
+            except Exception:
+                # Sem o provedor, exibe o que já estiver indexado
+                return {}
+            if novos:
+                self.reajustar(novos)
+            return {s: (LimiteRequisicoes([s]) if s in limitados else True) for s in faltantes}
+
+        with cronometrar('acoes_corporativas'):
+            self._acoes_corporativas.obter(simbolos, buscar)
+            return self.indice_acoes.eventos(simbolos)
+
+    def reajustar(self, simbolos):
+        """Regrava o histórico ajustado dos símbolos e descarta barras intradiárias e cache deles."""
+        incrementar('reajustes', len(simbolos))
+        try:
+            self.armazem.reajustar(simbolos)
+        except LimiteRequisicoes:
+            # A próxima atualização incremental detecta o fechamento alterado e reajusta
+            pass
+        for simbolo in simbolos:
+            self.intradiario.descartar(simbolo)
+        self._series.invalidar(simbolos)
+        self._intradiario.invalidar([(s, i) for s in simbolos for i in DURACOES])
+
+    def invalidar(self, simbolos=None):
+        """Força nova busca dos símbolos informados (ou de todos) na próxima consulta."""
+        for cache in (self._cotacoes, self._series, self._acoes_corporativas):
+            cache.invalidar(simbolos)
+        self._intradiario.invalidar(None if simbolos is None else [(s, i) for s in simbolos for i in DURACOES])
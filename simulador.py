@@ -0,0 +1,196 @@
+"""Cálculos do Simulador de Montagem/Desmontagem vetorizados sobre grades de cenários.
+
+Todas as funções aceitam escalares ou arrays NumPy e fazem broadcasting, de modo que um
+único cenário e uma superfície inteira de cenários usam exatamente a mesma aritmética.
+"""
+import numpy as np
+import pandas as pd
+
+TAMANHO_LOTE = 100
+
+# Eixos disponíveis para a superfície de resultado
+EIXO_RATIO_SAIDA = 'Ratio de Saída (A1/A2)'
+EIXO_DURACAO = 'Duração (dias)'
+EIXO_TAXA_ALUGUEL = 'Taxa Aluguel Anual (%)'
+EIXO_QUANTIDADE = 'Quantidade de Referência'
+EIXOS_CENARIO = (EIXO_RATIO_SAIDA, EIXO_DURACAO, EIXO_TAXA_ALUGUEL, EIXO_QUANTIDADE)
+
+
+def quantidades(preco_entrada_acao1, preco_entrada_acao2, qtd_ref, referencia_acao1=True, hedge_ratio=1.0):
+    """Quantidades das duas pontas, arredondando a outra ponta para o lote.
+
+    Com `hedge_ratio` = 1 os financeiros são iguais; com um β estimado, o financeiro da
+    ação 2 é β vezes o da ação 1.
+    """
+    preco_ref = np.where(referencia_acao1, preco_entrada_acao1, preco_entrada_acao2)
+    preco_outra = np.where(referencia_acao1, preco_entrada_acao2, preco_entrada_acao1)
+    vol_ref = qtd_ref * preco_ref * np.where(referencia_acao1, hedge_ratio, 1.0 / hedge_ratio)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        qtd_outra = np.where(
+            preco_outra > 0,
+            np.round(vol_ref / np.where(preco_outra > 0, preco_outra, 1.0) / TAMANHO_LOTE) * TAMANHO_LOTE,
+            0,
+        ).astype(np.int64)
+    qtd_acao1 = np.where(referencia_acao1, qtd_ref, qtd_outra)
+    qtd_acao2 = np.where(referencia_acao1, qtd_outra, qtd_ref)
+    return qtd_acao1, qtd_acao2
+
+
+def resultado_operacao(preco_entrada_acao1, preco_entrada_acao2, preco_saida_acao1, preco_saida_acao2,
+                       qtd_acao1, qtd_acao2, compra_acao1, duracao_dias, taxa_aluguel_aa,
+                       custo_corretagem, custo_taxas_b3):
+    """Resultado bruto, custos e resultado líquido de uma operação long/short (com broadcasting).
+
+    `compra_acao1` indica se a ação 1 é a ponta comprada; a outra é vendida (alugada) e
+    paga aluguel diário sobre o financeiro de entrada.
+    """
+    resultado_acao1 = (preco_saida_acao1 - preco_entrada_acao1) * qtd_acao1
+    resultado_acao2 = (preco_saida_acao2 - preco_entrada_acao2) * qtd_acao2
+    resultado_bruto = np.where(compra_acao1, resultado_acao1 - resultado_acao2, resultado_acao2 - resultado_acao1)
+
+    vol_vendido_entrada = np.where(compra_acao1, qtd_acao2 * preco_entrada_acao2, qtd_acao1 * preco_entrada_acao1)
+    taxa_aluguel_diaria = (np.asarray(taxa_aluguel_aa, dtype=np.float64) / 100.0) / 365.0
+    custo_aluguel_total = np.where(
+        (vol_vendido_entrada > 0) & (taxa_aluguel_diaria > 0) & (np.asarray(duracao_dias) > 0),
+        vol_vendido_entrada * taxa_aluguel_diaria * duracao_dias,
+        0.0,
+    )
+    custo_operacional_total = custo_corretagem + custo_taxas_b3
+    resultado_liquido = resultado_bruto - custo_aluguel_total - custo_operacional_total
+    capital_aprox = np.maximum(qtd_acao1 * preco_entrada_acao1, qtd_acao2 * preco_entrada_acao2)
+    return {
+        'resultado_bruto': resultado_bruto,
+        'custo_aluguel_total': custo_aluguel_total,
+        'custo_operacional_total': custo_operacional_total,
+        'resultado_liquido': resultado_liquido,
+        'capital_aprox': capital_aprox,
+    }
+
+
+def superficie_resultado(eixo_x, valores_x, eixo_y, valores_y, preco_entrada_acao1, preco_entrada_acao2,
+                         preco_saida_acao1, preco_saida_acao2, qtd_ref, referencia_acao1, compra_acao1,
+                         duracao_dias, taxa_aluguel_aa, custo_corretagem, custo_taxas_b3, hedge_ratio=1.0):
+    """Resultado líquido sobre a grade eixo_y x eixo_x; demais entradas ficam fixas.
+
+    No eixo de ratio de saída, o preço de saída da ação 2 é mantido e o da ação 1 passa a
+    ser ratio x preço de saída da ação 2. Devolve um DataFrame (linhas = y, colunas = x).
+    """
+    entradas = {
+        EIXO_RATIO_SAIDA: None,
+        EIXO_DURACAO: duracao_dias,
+        EIXO_TAXA_ALUGUEL: taxa_aluguel_aa,
+        EIXO_QUANTIDADE: qtd_ref,
+    }
+    grade_y, grade_x = np.meshgrid(np.asarray(valores_y), np.asarray(valores_x), indexing='ij')
+    entradas[eixo_x] = grade_x
+    entradas[eixo_y] = grade_y
+
+    saida_acao1 = preco_saida_acao1
+    if entradas[EIXO_RATIO_SAIDA] is not None:
+        saida_acao1 = entradas[EIXO_RATIO_SAIDA] * preco_saida_acao2
+    qtd_acao1, qtd_acao2 = quantidades(preco_entrada_acao1, preco_entrada_acao2, entradas[EIXO_QUANTIDADE], referencia_acao1, hedge_ratio)
+    resultado = resultado_operacao(
+        preco_entrada_acao1, preco_entrada_acao2, saida_acao1, preco_saida_acao2,
+        qtd_acao1, qtd_acao2, compra_acao1, entradas[EIXO_DURACAO], entradas[EIXO_TAXA_ALUGUEL],
+        custo_corretagem, custo_taxas_b3,
+    )
+    return pd.DataFrame(
+        np.broadcast_to(resultado['resultado_liquido'], grade_x.shape),
+        index=pd.Index(valores_y, name=eixo_y),
+        columns=pd.Index(valores_x, name=eixo_x),
+    )
+
+
+MODELO_OU = 'Ornstein-Uhlenbeck'
+MODELO_BOOTSTRAP = 'Bootstrap'
+MODELOS_MONTE_CARLO = (MODELO_OU, MODELO_BOOTSTRAP)
+
+
+def _ajustar_ar1(x):
+    """Parâmetros do OU (AR(1) por barra) de uma série já em log."""
+    anterior, atual = x[:-1], x[1:]
+    phi, intercepto = np.polyfit(anterior, atual, 1)
+    residuos = atual - (intercepto + phi * anterior)
+    media = intercepto / (1.0 - phi) if phi < 1.0 else x.mean()
+    meia_vida = -np.log(2.0) / np.log(phi) if 0.0 < phi < 1.0 else np.inf
+    return {'media': media, 'phi': phi, 'sigma': residuos.std(ddof=2), 'meia_vida': meia_vida}
+
+
+def ajustar_ou(ratio):
+    """Ajusta um Ornstein-Uhlenbeck ao log do ratio via regressão AR(1) diária.
+
+    Devolve média de longo prazo (`media`), coeficiente AR(1) (`phi`), desvio do choque
+    diário (`sigma`) e meia-vida em barras (`meia_vida`, infinita se não houver reversão).
+    """
+    return _ajustar_ar1(np.log(ratio.dropna().to_numpy(dtype=np.float64)))
+
+
+def simular_spread(spread, spread_entrada, duracao_dias, n_trajetorias=50_000, modelo=MODELO_OU, semente=None):
+    """Gera trajetórias (n_trajetorias, duracao_dias) de um spread em log a partir do valor de entrada.
+
+    `spread` é o histórico em unidades de log (log do ratio ou resíduo do Kalman). No modelo
+    OU os choques são normais com os parâmetros ajustados; no bootstrap são sorteados das
+    variações diárias históricas. O laço é só sobre os dias; cada passo atualiza todas as
+    trajetórias de uma vez.
+    """
+    rng = np.random.default_rng(semente)
+    duracao_dias = int(duracao_dias)
+    x = spread.dropna().to_numpy(dtype=np.float64)
+    if modelo == MODELO_BOOTSTRAP:
+        choques = rng.choice(np.diff(x), size=(n_trajetorias, duracao_dias))
+        return spread_entrada + np.cumsum(choques, axis=1)
+
+    parametros = _ajustar_ar1(x)
+    phi = min(parametros['phi'], 1.0)
+    choques = rng.standard_normal((n_trajetorias, duracao_dias)) * parametros['sigma']
+    trajetorias = np.empty_like(choques)
+    anterior = np.full(n_trajetorias, float(spread_entrada))
+    for dia in range(duracao_dias):
+        anterior = parametros['media'] + phi * (anterior - parametros['media']) + choques[:, dia]
+        trajetorias[:, dia] = anterior
+    return trajetorias
+
+
+def simular_log_ratio(ratio, ratio_entrada, duracao_dias, n_trajetorias=50_000, modelo=MODELO_OU, semente=None):
+    """Trajetórias do log-ratio a partir do ratio de entrada (ver `simular_spread`)."""
+    return simular_spread(np.log(ratio), np.log(ratio_entrada), duracao_dias, n_trajetorias, modelo, semente)
+
+
+def monte_carlo_operacao(spread, spread_entrada, preco_entrada_acao1, preco_entrada_acao2, qtd_ref, referencia_acao1,
+                         compra_acao1, duracao_dias, taxa_aluguel_aa, custo_corretagem, custo_taxas_b3,
+                         n_trajetorias=50_000, modelo=MODELO_OU, semente=None, hedge_ratio=1.0, media=None):
+    """Distribuição do resultado líquido da operação proposta simulando o spread até a saída.
+
+    `spread` e `spread_entrada` são o spread do sinal em log: log do ratio ou, no hedge
+    dinâmico, o resíduo log P1 - (α + β log P2). A operação é desmontada no primeiro dia em
+    que o spread volta a `media` (a média do z-score do sinal; sem ela, a média do modelo)
+    no sentido da operação ou, se isso não ocorrer, ao fim de `duracao_dias`. A variação do
+    spread é dividida entre as pontas pelo hedge ratio (metade para cada uma com β = 1);
+    quantidades (lote de 100) e custos seguem o simulador.
+    """
+    trajetorias = simular_spread(spread, spread_entrada, duracao_dias, n_trajetorias, modelo, semente)
+    if media is None:
+        x = spread.dropna().to_numpy(dtype=np.float64)
+        media = x.mean() if modelo == MODELO_BOOTSTRAP else _ajustar_ar1(x)['media']
+
+    # Comprado na ação 1 ganha com o spread subindo até a média; vendido, com ele caindo
+    sentido = -1.0 if compra_acao1 else 1.0
+    reverteu = sentido * (trajetorias - media) <= 0
+    reverteu_algum_dia = reverteu.any(axis=1)
+    dia_saida = np.where(reverteu_algum_dia, reverteu.argmax(axis=1), trajetorias.shape[1] - 1)
+    spread_saida = trajetorias[np.arange(trajetorias.shape[0]), dia_saida]
+
+    # Δspread = Δlog P1 - β Δlog P2, repartido como Δlog P1 = -Δlog P2 = Δspread / (1 + β)
+    variacao = (spread_saida - spread_entrada) / (1.0 + hedge_ratio)
+    preco_saida_acao1 = preco_entrada_acao1 * np.exp(variacao)
+    preco_saida_acao2 = preco_entrada_acao2 * np.exp(-variacao)
+    qtd_acao1, qtd_acao2 = quantidades(preco_entrada_acao1, preco_entrada_acao2, qtd_ref, referencia_acao1, hedge_ratio)
+    dias_operacao = dia_saida + 1
+    resultado = resultado_operacao(
+        preco_entrada_acao1, preco_entrada_acao2, preco_saida_acao1, preco_saida_acao2,
+        qtd_acao1, qtd_acao2, compra_acao1, dias_operacao, taxa_aluguel_aa,
+        custo_corretagem, custo_taxas_b3,
+    )
+    resultado['prob_reversao'] = reverteu_algum_dia.mean()
+    resultado['dias_operacao'] = dias_operacao
+    return resultado
@@ -0,0 +1,197 @@
+"""Motor de sinais sem interface: séries → painel alinhado → ratio → z-score → decisão.
+
+Pode ser importado por outros serviços ou chamado pela linha de comando, por exemplo:
+
+    python sinais.py PETR3.SA:PETR4.SA ITUB3.SA:ITUB4.SA --metodo "Janela móvel" --formato csv
+
+Na importação só entram numpy, pandas e o banco local. O provedor (yfinance) é importado
+apenas quando há atualização de dados ou cotação ao vivo; streamlit, matplotlib e scipy nunca.
+"""
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import ArmazemOHLCV, inicio_periodo
+from hedge_dinamico import SPREAD_KALMAN, SPREAD_RATIO, filtrar_hedge
+from metricas import cronometrar
+from motor_zscore import AMOSTRA_COMPLETA, MODOS, calcular_zscore, motor_de_serie
+from paineis import painel_fechamentos
+
+PERIODOS = ('1mo', '3mo', '6mo', '1y', '2y', '5y', 'max')
+FORMATOS_SAIDA = ('json', 'csv')
+
+NEUTRO = "Neutro"
+INDEFINIDO = "Indefinido"
+
+
+def periodo_estatisticas(periodo, metodo=AMOSTRA_COMPLETA):
+    """Período a buscar para as estatísticas: janela móvel/EWMA usam todo o histórico local,
+    para o sinal não depender do período exibido."""
+    return periodo if metodo == AMOSTRA_COMPLETA else 'max'
+
+
+def decidir(z_score, limite, acao1, acao2):
+    """Sinal da regra de z-score: vende o caro e compra o barato fora da banda de ±`limite`."""
+    if z_score is None or np.isnan(z_score):
+        return INDEFINIDO
+    if z_score > limite:
+        return f"Vender {acao1} / Comprar {acao2}"
+    if z_score < -limite:
+        return f"Comprar {acao1} / Vender {acao2}"
+    return NEUTRO
+
+
+def analisar_par(series, acao1, acao2, commodity=None, periodo_busca='1y', periodo_valor='1y',
+                 metodo=AMOSTRA_COMPLETA, janela=60, modelo_spread=SPREAD_RATIO, painel=None):
+    """Monta o painel de fechamentos e calcula spread, estatísticas de z-score e motor incremental do par.
+
+    `series` é {símbolo: DataFrame OHLCV}. O spread é o ratio P1/P2 ou, no modelo Kalman, o
+    resíduo de log P1 contra o hedge dinâmico. Devolve {'painel', 'ratio', 'spread',
+    'estatisticas', 'motor', 'filtro', 'hedge'} recortados para `periodo_valor` ('filtro' e
+    'hedge' são None no modelo de ratio), ou None se as ações não tiverem datas em comum.
+    Um `painel` já alinhado (ex.: o intradiário) dispensa a montagem a partir de `series`.
+    """
+    # Um único painel float32 (ações + commodity) alimenta ratio, gráfico, backtest e tabela
+    if painel is None:
+        with cronometrar('alinhamento'):
+            painel = painel_fechamentos(series, pernas=(acao1, acao2), extras=(commodity,) if commodity else ())
+    if painel is None:
+        return None
+    ratio = painel[acao1] / painel[acao2]
+    spread, filtro, hedge = ratio, None, None
+    if modelo_spread == SPREAD_KALMAN:
+        with cronometrar('hedge_dinamico'):
+            kalman, filtro = filtrar_hedge(painel[acao1], painel[acao2])
+        spread, hedge = kalman['Spread'], kalman['Beta']
+    # Média, desvio e z-score de cada data conforme o método escolhido
+    with cronometrar('zscore'):
+        estatisticas = calcular_zscore(spread, modo=metodo, janela=janela)
+        motor = motor_de_serie(spread, modo=metodo, janela=janela)
+    if periodo_busca != periodo_valor:
+        # Exibe apenas o período selecionado (as estatísticas já usaram o histórico todo)
+        inicio_exibicao = inicio_periodo(periodo_valor)
+        painel = painel.loc[inicio_exibicao:]
+        ratio = ratio.loc[inicio_exibicao:]
+        spread = spread.loc[inicio_exibicao:]
+        estatisticas = estatisticas.loc[inicio_exibicao:]
+        if hedge is not None:
+            hedge = hedge.loc[inicio_exibicao:]
+    return {'painel': painel, 'ratio': ratio, 'spread': spread, 'estatisticas': estatisticas,
+            'motor': motor, 'filtro': filtro, 'hedge': hedge}
+
+
+def valor_spread(analise, preco_acao1, preco_acao2, atualizar=False):
+    """Spread do modelo da análise para um par de preços (ratio ou resíduo do Kalman).
+
+    Com `atualizar`, a barra é incorporada ao filtro de Kalman (O(1)); sem, o estado não muda.
+    """
+    filtro = analise.get('filtro')
+    if filtro is None:
+        return preco_acao1 / preco_acao2
+    log1, log2 = np.log(preco_acao1), np.log(preco_acao2)
+    return filtro.atualizar(log1, log2) if atualizar else filtro.spread(log1, log2)
+
+
+def hedge_atual(analise):
+    """Hedge ratio atual (β do Kalman; 1 no modelo de ratio, que usa financeiro igual)."""
+    filtro = analise.get('filtro')
+    return float(filtro.beta) if filtro is not None else 1.0
+
+
+def sinal_par(analise, acao1, acao2, limite=1.0, preco_acao1=None, preco_acao2=None):
+    """Resumo do sinal do par no último fechamento e, se houver cotações, ao vivo."""
+    z_score = analise['estatisticas']['Z-Score']
+    ratio = analise['ratio']
+    z_atual = float(z_score.iloc[-1]) if not z_score.empty else np.nan
+    sinal = {
+        'Ação 1': acao1,
+        'Ação 2': acao2,
+        'Data': ratio.index[-1] if not ratio.empty else pd.NaT,
+        'Ratio': float(ratio.iloc[-1]) if not ratio.empty else np.nan,
+        'Z-Score': z_atual,
+        'Sinal': decidir(z_atual, limite, acao1, acao2),
+    }
+    if analise.get('filtro') is not None:
+        sinal['Hedge (β)'] = hedge_atual(analise)
+    if preco_acao1 and preco_acao2:
+        # Z-score da cotação ao vivo, em O(1) sobre o estado do motor
+        sinal['Z-Score (cotação)'] = float(analise['motor'].zscore(valor_spread(analise, preco_acao1, preco_acao2)))
+    return sinal
+
+
+def calcular_sinais(pares, periodo='1y', metodo=AMOSTRA_COMPLETA, janela=60, limite=1.0,
+                    atualizar=True, cotacoes=False, caminho_banco=None, servico=None, modelo_spread=SPREAD_RATIO):
+    """Sinais de vários pares [(ação 1, ação 2), ...] em um DataFrame, uma linha por par.
+
+    Com `atualizar=False` as séries vêm só do banco local; o provedor só é importado se
+    `cotacoes` pedir a cotação ao vivo. Pares sem dados em comum aparecem com sinal 'Indefinido'.
+    """
+    pares = [tuple(par) for par in pares]
+    simbolos = tuple(dict.fromkeys(s for par in pares for s in par))
+    periodo_busca = periodo_estatisticas(periodo, metodo)
+
+    if (atualizar or cotacoes) and servico is None:
+        from servico_dados import ServicoDados
+        servico = ServicoDados(caminho_banco=caminho_banco)
+    if atualizar:
+        series, _ = servico.series(simbolos, periodo=periodo_busca)
+    else:
+        armazem = getattr(servico, 'armazem', None) or ArmazemOHLCV(caminho_banco)
+        series = armazem.series(simbolos, periodo=periodo_busca)
+    precos = {}
+    if cotacoes:
+        snapshot, _ = servico.cotacoes(simbolos)
+        precos = {s: float(p) for s, p in snapshot['Preço'].items() if pd.notna(p)}
+
+    linhas = []
+    for acao1, acao2 in pares:
+        analise = analisar_par(series, acao1, acao2, periodo_busca=periodo_busca, periodo_valor=periodo,
+                               metodo=metodo, janela=janela, modelo_spread=modelo_spread)
+        if analise is None:
+            linhas.append({'Ação 1': acao1, 'Ação 2': acao2, 'Sinal': INDEFINIDO})
+            continue
+        linhas.append(sinal_par(analise, acao1, acao2, limite, precos.get(acao1), precos.get(acao2)))
+    return pd.DataFrame(linhas)
+
+
+def ler_par(texto):
+    acoes = texto.split(':')
+    if len(acoes) != 2 or not all(acoes):
+        raise argparse.ArgumentTypeError(f"par inválido '{texto}' (use ACAO1:ACAO2)")
+    return tuple(acoes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinais de pair trading por z-score do ratio.")
+    parser.add_argument('pares', nargs='+', type=ler_par, metavar='ACAO1:ACAO2')
+    parser.add_argument('--periodo', choices=PERIODOS, default='1y')
+    parser.add_argument('--metodo', choices=MODOS, default=AMOSTRA_COMPLETA)
+    parser.add_argument('--janela', type=int, default=60, help="janela móvel ou meia-vida EWMA, em dias")
+    parser.add_argument('--limite', type=float, default=1.0, help="limite de |z-score| para entrada")
+    parser.add_argument('--kalman', action='store_true', help="spread com hedge ratio dinâmico (filtro de Kalman)")
+    parser.add_argument('--formato', choices=FORMATOS_SAIDA, default='json')
+    parser.add_argument('--offline', action='store_true', help="usa só o banco local, sem baixar dados")
+    parser.add_argument('--cotacao', action='store_true', help="inclui o z-score com a cotação atual")
+    parser.add_argument('--banco', default=None, help="caminho do banco SQLite local")
+    args = parser.parse_args(argv)
+
+    sinais = calcular_sinais(
+        args.pares, periodo=args.periodo, metodo=args.metodo, janela=args.janela, limite=args.limite,
+        atualizar=not args.offline, cotacoes=args.cotacao, caminho_banco=args.banco,
+        modelo_spread=SPREAD_KALMAN if args.kalman else SPREAD_RATIO,
+    )
+    if args.formato == 'csv':
+        sinais.to_csv(sys.stdout, index=False)
+    else:
+        # Passa pelo to_json do pandas para converter datas e NaN (null) antes de formatar
+        registros = json.loads(sinais.to_json(orient='records', date_format='iso'))
+        json.dump(registros, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
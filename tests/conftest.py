@@ -0,0 +1,64 @@
+"""Fixtures compartilhadas: provedor sintético determinístico (sem rede) e banco SQLite temporário."""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório, sem pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intradiario import sessao_do_simbolo  # noqa: E402
+from provedores import ProvedorSintetico  # noqa: E402
+
+FIM = '2024-06-28'
+
+
+class ProvedorTeste(ProvedorSintetico):
+    """Provedor sintético com feriados por mercado, desdobramentos, rate limit e registro de downloads.
+
+    `feriados` ({'B3' ou 'EUA': [datas]}) tira as datas das barras diárias do mercado do
+    símbolo; `desdobramentos` ({símbolo: (data, fator)}) divide os preços anteriores à data
+    pelo fator, como o histórico ajustado do provedor; os símbolos de `limitados` ficam fora
+    do download e com erro de rate limit em `shared._ERRORS`, como no yfinance.
+    """
+
+    def __init__(self, feriados=None, desdobramentos=None, limitados=(), **kwargs):
+        super().__init__(**kwargs)
+        self.feriados = {sessao: pd.DatetimeIndex(datas) for sessao, datas in (feriados or {}).items()}
+        self.desdobramentos = dict(desdobramentos or {})
+        self.limitados = set(limitados)
+        self.downloads = []
+
+    def barras(self, simbolo, intervalo='1d'):
+        barras = super().barras(simbolo, intervalo)
+        if intervalo != '1d':
+            return barras
+        feriados = self.feriados.get(sessao_do_simbolo(simbolo))
+        if feriados is not None:
+            barras = barras[~barras.index.isin(feriados)]
+        if simbolo in self.desdobramentos:
+            data, fator = self.desdobramentos[simbolo]
+            barras = barras.copy()
+            anteriores = barras.index < pd.Timestamp(data)
+            barras.loc[anteriores, ['Open', 'High', 'Low', 'Close']] /= fator
+        return barras
+
+    def download(self, tickers, **kwargs):
+        simbolos = [tickers] if isinstance(tickers, str) else list(tickers)
+        self.downloads.append((tuple(simbolos), kwargs.get('start'), kwargs.get('period')))
+        self.shared._ERRORS = {
+            s: "YFRateLimitError('Too Many Requests. Rate limited. Try after a while.')"
+            for s in simbolos if s in self.limitados
+        }
+        return super().download([s for s in simbolos if s not in self.limitados], **kwargs)
+
+
+@pytest.fixture
+def provedor():
+    return ProvedorTeste(fim=FIM)
+
+
+@pytest.fixture
+def caminho_banco(tmp_path):
+    return str(tmp_path / 'mercado.sqlite')
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from armazenamento import ArmazemOHLCV
+from conftest import ProvedorTeste
+
+SIMBOLOS = ['AAAA3.SA', 'AAAA4.SA', 'USO']
+
+
+def _gravado(armazem, simbolo):
+    return armazem.ler(simbolo)['Close']
+
+
+def test_atualizacao_incremental_baixa_so_o_que_falta(caminho_banco):
+    ArmazemOHLCV(caminho_banco, provedor=ProvedorTeste(fim='2024-05-31')).atualizar(SIMBOLOS)
+
+    provedor = ProvedorTeste(fim='2024-06-28')
+    armazem = ArmazemOHLCV(caminho_banco, provedor=provedor)
+    armazem.atualizar(SIMBOLOS)
+
+    # Um download para o grupo, a partir da penúltima barra gravada
+    assert provedor.downloads == [(tuple(SIMBOLOS), '2024-05-30', None)]
+    for simbolo in SIMBOLOS:
+        np.testing.assert_allclose(_gravado(armazem, simbolo), provedor.barras(simbolo)['Close'])
+
+
+def test_reajuste_detectado_rebaixa_o_historico(caminho_banco):
+    ArmazemOHLCV(caminho_banco, provedor=ProvedorTeste(fim='2024-05-31')).atualizar(SIMBOLOS)
+
+    # Desdobramento 2:1 depois da última atualização: o provedor devolve o histórico ajustado
+    provedor = ProvedorTeste(fim='2024-06-28', desdobramentos={'AAAA4.SA': ('2024-06-10', 2.0)})
+    armazem = ArmazemOHLCV(caminho_banco, provedor=provedor)
+    armazem.atualizar(SIMBOLOS)
+
+    assert provedor.downloads[-1] == (('AAAA4.SA',), '2016-01-01', None)
+    np.testing.assert_allclose(_gravado(armazem, 'AAAA4.SA'), provedor.barras('AAAA4.SA')['Close'])
+    # Os demais símbolos seguem só com a atualização incremental
+    assert all('AAAA3.SA' not in simbolos for simbolos, inicio, _ in provedor.downloads if inicio == '2016-01-01')
+    np.testing.assert_allclose(_gravado(armazem, 'AAAA3.SA'), provedor.barras('AAAA3.SA')['Close'])
+
+
+def test_ultima_barra_parcial_e_sobrescrita_sem_reajuste(caminho_banco):
+    parcial = ProvedorTeste(fim='2024-05-31')
+    barras = parcial.barras('AAAA3.SA').copy()
+    # Pregão em andamento: fechamento provisório diferente do final
+    barras.iloc[-1, barras.columns.get_loc('Close')] *= 1.03
+    parcial._cache[('AAAA3.SA', '1d')] = barras
+    ArmazemOHLCV(caminho_banco, provedor=parcial).atualizar(['AAAA3.SA'])
+
+    provedor = ProvedorTeste(fim='2024-06-28')
+    armazem = ArmazemOHLCV(caminho_banco, provedor=provedor)
+    armazem.atualizar(['AAAA3.SA'])
+
+    assert provedor.downloads == [(('AAAA3.SA',), '2024-05-30', None)]
+    assert _gravado(armazem, 'AAAA3.SA').loc['2024-05-31'] == provedor.barras('AAAA3.SA')['Close'].loc['2024-05-31']
+
+
+def test_series_recorta_o_periodo(caminho_banco, provedor):
+    armazem = ArmazemOHLCV(caminho_banco, provedor=provedor)
+    armazem.atualizar(['AAAA3.SA'])
+    series = armazem.series(['AAAA3.SA', 'ZZZZ3.SA'], periodo='max')
+    assert series['ZZZZ3.SA'] is None
+    assert series['AAAA3.SA'].index[0] == pd.Timestamp('2016-01-01')
+    assert armazem.ultima_barra('AAAA3.SA') == (pd.Timestamp('2024-06-28'), float(series['AAAA3.SA']['Close'].iloc[-1]))
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+from conftest import FIM, ProvedorTeste
+from dados import LimiteRequisicoes, _separar_por_simbolo, baixar_lote
+
+CARNAVAL = ['2024-02-12', '2024-02-13']
+FERIADOS_EUA = ['2024-01-15', '2024-05-27']
+
+
+@pytest.fixture
+def provedor_calendarios():
+    return ProvedorTeste(fim=FIM, feriados={'B3': CARNAVAL, 'EUA': FERIADOS_EUA})
+
+
+def test_baixar_lote_separa_calendarios_b3_e_eua(provedor_calendarios):
+    series = baixar_lote(['AAAA3.SA', 'AAAA4.SA', 'USO'], periodo='1y', provedor=provedor_calendarios)
+
+    # Um único download para os três símbolos
+    assert provedor_calendarios.downloads == [(('AAAA3.SA', 'AAAA4.SA', 'USO'), None, '1y')]
+    for simbolo, df in series.items():
+        assert not df.isna().any().any()
+        esperado = provedor_calendarios.barras(simbolo).loc[df.index[0]:]
+        pd.testing.assert_index_equal(df.index, esperado.index, check_names=False)
+    # Cada símbolo só tem os pregões do próprio mercado
+    assert not series['AAAA3.SA'].index.isin(pd.DatetimeIndex(CARNAVAL)).any()
+    assert series['USO'].index.isin(pd.DatetimeIndex(CARNAVAL)).sum() == 2
+    assert not series['USO'].index.isin(pd.DatetimeIndex(FERIADOS_EUA)).any()
+    assert series['AAAA3.SA'].index.isin(pd.DatetimeIndex(FERIADOS_EUA)).sum() == 2
+
+
+def test_baixar_lote_remove_duplicados(provedor):
+    series = baixar_lote(['AAAA3.SA', 'AAAA3.SA'], periodo='1mo', provedor=provedor)
+    assert list(series) == ['AAAA3.SA']
+    assert provedor.downloads[-1][0] == ('AAAA3.SA',)
+    assert baixar_lote([], provedor=provedor) == {}
+
+
+def test_separar_por_simbolo_sem_multiindex_e_sem_dados(provedor):
+    unico = provedor.download('AAAA3.SA', period='1mo').droplevel(0, axis=1)
+    assert _separar_por_simbolo(unico, ['AAAA3.SA'])['AAAA3.SA'].equals(unico)
+    assert _separar_por_simbolo(unico, ['AAAA3.SA', 'BBBB3.SA']) == {'AAAA3.SA': None, 'BBBB3.SA': None}
+    assert _separar_por_simbolo(pd.DataFrame(), ['AAAA3.SA']) == {'AAAA3.SA': None}
+
+
+def test_rate_limit_por_simbolo_em_shared_errors():
+    provedor = ProvedorTeste(fim=FIM, limitados={'AAAA4.SA'})
+    with pytest.raises(LimiteRequisicoes) as erro:
+        baixar_lote(['AAAA3.SA', 'AAAA4.SA', 'USO'], provedor=provedor)
+    assert erro.value.simbolos == ['AAAA4.SA']
+    # Sem erro registrado no download seguinte, o lote volta a funcionar
+    provedor.limitados = set()
+    assert all(df is not None for df in baixar_lote(['AAAA3.SA', 'AAAA4.SA'], provedor=provedor).values())
+
+
+class _ProvedorComErro:
+    def __init__(self, erro):
+        self.erro = erro
+
+    def download(self, tickers, **kwargs):
+        raise self.erro
+
+
+def test_rate_limit_levantado_pelo_download():
+    with pytest.raises(LimiteRequisicoes) as erro:
+        baixar_lote(['AAAA3.SA', 'USO'], provedor=_ProvedorComErro(RuntimeError("Too Many Requests")))
+    assert erro.value.simbolos == ['AAAA3.SA', 'USO']
+    with pytest.raises(ValueError):
+        baixar_lote(['AAAA3.SA'], provedor=_ProvedorComErro(ValueError("outro erro")))
+
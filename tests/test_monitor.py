@@ -0,0 +1,144 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hedge_dinamico import SPREAD_KALMAN, SPREAD_RATIO
+from monitor import MonitorSinais, ler_cruzamentos, ler_sinais
+from motor_zscore import AMOSTRA_COMPLETA, EWMA, JANELA_MOVEL
+from replay import FonteReplay
+
+PAR = ('AAAA3.SA', 'AAAA4.SA')
+
+
+@pytest.fixture
+def series(provedor):
+    return {s: provedor.barras(s) for s in PAR}
+
+
+def _monitor(fonte, caminho, **kwargs):
+    argumentos = dict(periodo='1y', metodo=JANELA_MOVEL, janela=20, limite=1.0)
+    argumentos.update(kwargs)
+    return MonitorSinais([PAR], fonte=fonte, caminho_banco=caminho, **argumentos)
+
+
+def _ciclo(monitor, fonte, data):
+    fonte.agora = pd.Timestamp(data)
+    cruzamentos = monitor.ciclo(agora=fonte.agora)
+    linha = ler_sinais(monitor.caminho).set_index('Configuração').loc[monitor.configuracao]
+    return linha, cruzamentos
+
+
+def _z_recalculado(series, data, caminho, **kwargs):
+    """Z-score de um monitor novo (estado montado do zero) na mesma data."""
+    fonte = FonteReplay(series)
+    linha, _ = _ciclo(_monitor(fonte, caminho, **kwargs), fonte, data)
+    return linha['Z-Score']
+
+
+@pytest.mark.parametrize('metodo, modelo_spread', [
+    (JANELA_MOVEL, SPREAD_RATIO), (EWMA, SPREAD_RATIO), (JANELA_MOVEL, SPREAD_KALMAN), (AMOSTRA_COMPLETA, SPREAD_RATIO),
+])
+def test_ciclos_incrementais_igual_ao_estado_refeito(series, tmp_path, metodo, modelo_spread):
+    fonte = FonteReplay(series)
+    monitor = _monitor(fonte, str(tmp_path / 'a.sqlite'), metodo=metodo, modelo_spread=modelo_spread)
+    for data in ('2024-06-26', '2024-06-27', '2024-06-28'):
+        linha, _ = _ciclo(monitor, fonte, data)
+        esperado = _z_recalculado(series, data, str(tmp_path / f'{data}.sqlite'), metodo=metodo, modelo_spread=modelo_spread)
+        assert linha['Data Barra'] == data
+        assert linha['Z-Score'] == pytest.approx(esperado, rel=1e-9)
+
+
+def test_ultima_barra_fica_fora_do_estado(series, tmp_path):
+    fonte = FonteReplay(series)
+    monitor = _monitor(fonte, str(tmp_path / 'm.sqlite'))
+    linha, _ = _ciclo(monitor, fonte, '2024-06-28')
+
+    ratio = series[PAR[0]]['Close'] / series[PAR[1]]['Close']
+    janela = ratio.loc[:'2024-06-27'].iloc[-20:]
+    assert linha['Z-Score'] == pytest.approx((ratio.loc['2024-06-28'] - janela.mean()) / janela.std(ddof=0), rel=1e-9)
+    assert monitor._estados[PAR]['data'] == pd.Timestamp('2024-06-27')
+
+
+def test_barra_parcial_usa_o_fechamento_final_no_ciclo_seguinte(series, tmp_path):
+    parcial = {s: df.copy() for s, df in series.items()}
+    parcial[PAR[0]].loc['2024-06-27', 'Close'] *= 1.05
+    fonte = FonteReplay(parcial)
+    monitor = _monitor(fonte, str(tmp_path / 'm.sqlite'))
+    _ciclo(monitor, fonte, '2024-06-27')
+
+    # O pregão fechou com outro preço e já há a barra seguinte
+    fonte._series = dict(series)
+    linha, _ = _ciclo(monitor, fonte, '2024-06-28')
+    assert linha['Z-Score'] == pytest.approx(_z_recalculado(series, '2024-06-28', str(tmp_path / 'ref.sqlite')), rel=1e-9)
+
+
+@pytest.mark.parametrize('modelo_spread', [SPREAD_RATIO, SPREAD_KALMAN])
+def test_historico_reajustado_refaz_o_estado(series, tmp_path, modelo_spread):
+    fonte = FonteReplay(series)
+    monitor = _monitor(fonte, str(tmp_path / 'm.sqlite'), modelo_spread=modelo_spread)
+    _ciclo(monitor, fonte, '2024-06-26')
+
+    # Desdobramento 2:1 com data ex em 2024-06-27: o histórico já incorporado ao estado é ajustado
+    ajustadas = {s: df.copy() for s, df in series.items()}
+    anteriores = ajustadas[PAR[1]].index < pd.Timestamp('2024-06-27')
+    ajustadas[PAR[1]].loc[anteriores, 'Close'] /= 2.0
+    fonte._series = ajustadas
+    linha, _ = _ciclo(monitor, fonte, '2024-06-28')
+
+    esperado = _z_recalculado(ajustadas, '2024-06-28', str(tmp_path / 'ref.sqlite'), modelo_spread=modelo_spread)
+    assert linha['Z-Score'] == pytest.approx(esperado, rel=1e-9)
+    np.testing.assert_allclose(
+        monitor._estados[PAR]['fechamentos'],
+        [ajustadas[s]['Close'].loc['2024-06-27'] for s in PAR],
+    )
+
+
+def test_configuracoes_diferentes_no_mesmo_banco(series, tmp_path):
+    caminho = str(tmp_path / 'm.sqlite')
+    fonte = FonteReplay(series)
+    curto = _monitor(fonte, caminho, janela=5, limite=0.1)
+    longo = _monitor(fonte, caminho, janela=60, limite=3.0)
+    for data in ('2024-06-27', '2024-06-28'):
+        for monitor in (curto, longo):
+            _, cruzamentos = _ciclo(monitor, fonte, data)
+            assert all(c['Configuração'] == monitor.configuracao for c in cruzamentos)
+
+    sinais = ler_sinais(caminho).set_index('Configuração')
+    assert sorted(sinais.index) == sorted([curto.configuracao, longo.configuracao])
+    # Cada monitor só compara com o próprio sinal anterior: repetir a barra não gera cruzamento
+    for monitor in (curto, longo):
+        linha, cruzamentos = _ciclo(monitor, fonte, '2024-06-28')
+        assert cruzamentos == []
+        assert linha['Sinal'] == sinais.loc[monitor.configuracao, 'Sinal']
+
+
+def test_cruzamento_registrado_e_repassado_aos_ganchos(series, tmp_path):
+    caminho = str(tmp_path / 'm.sqlite')
+    fonte = FonteReplay(series)
+    recebidos = []
+    monitor = _monitor(fonte, caminho, janela=5, limite=0.5, ao_cruzar=[recebidos.append])
+    datas = pd.bdate_range('2024-05-01', '2024-06-28')
+    cruzamentos = [c for data in datas for c in _ciclo(monitor, fonte, data)[1]]
+
+    assert cruzamentos and recebidos == cruzamentos
+    registrados = ler_cruzamentos(caminho, limite=len(cruzamentos))
+    assert len(registrados) == len(cruzamentos)
+    assert (registrados['Configuração'] == monitor.configuracao).all()
+
+
+def test_banco_antigo_migrado(tmp_path, series):
+    caminho = str(tmp_path / 'antigo.sqlite')
+    with sqlite3.connect(caminho) as conn:
+        conn.execute("CREATE TABLE sinais_atuais (acao1 TEXT NOT NULL, acao2 TEXT NOT NULL, data_barra TEXT, "
+                     "horario TEXT NOT NULL, ratio REAL, z_score REAL, sinal TEXT, PRIMARY KEY (acao1, acao2))")
+        conn.execute("CREATE TABLE cruzamentos (horario TEXT NOT NULL, acao1 TEXT NOT NULL, acao2 TEXT NOT NULL, "
+                     "sinal_anterior TEXT, sinal TEXT, ratio REAL, z_score REAL)")
+        conn.execute("INSERT INTO cruzamentos VALUES ('2024-01-02', 'AAAA3.SA', 'AAAA4.SA', 'Neutro', 'Indefinido', 1.0, NULL)")
+
+    fonte = FonteReplay(series)
+    linha, _ = _ciclo(_monitor(fonte, caminho), fonte, '2024-06-28')
+    assert linha['Data Barra'] == '2024-06-28'
+    antigos = ler_cruzamentos(caminho)
+    assert len(antigos) == 1 and antigos['Configuração'].isna().all()
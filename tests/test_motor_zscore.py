@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import zscores_janelas
+from motor_zscore import AMOSTRA_COMPLETA, EWMA, JANELA_MOVEL, calcular_zscore, criar_motor, motor_de_serie
+
+
+@pytest.fixture
+def ratio(provedor):
+    precos = provedor.barras('AAAA3.SA')['Close'] / provedor.barras('AAAA4.SA')['Close']
+    return precos.iloc[-500:]
+
+
+@pytest.mark.parametrize('modo', [JANELA_MOVEL, EWMA])
+@pytest.mark.parametrize('janela', [5, 20, 60])
+def test_motor_incremental_igual_ao_calculo_em_lote(ratio, modo, janela):
+    motor = criar_motor(modo, janela)
+    incremental = [motor.atualizar(valor) for valor in ratio.to_numpy()]
+    esperado = calcular_zscore(ratio, modo, janela)['Z-Score'].to_numpy()
+    np.testing.assert_allclose(incremental, esperado, rtol=1e-7, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize('modo, janela', [(JANELA_MOVEL, 20), (EWMA, 10)])
+def test_motor_de_serie_continua_o_historico(ratio, modo, janela):
+    motor = motor_de_serie(ratio.iloc[:-1], modo, janela)
+    z_novo = motor.atualizar(float(ratio.iloc[-1]))
+    assert z_novo == pytest.approx(calcular_zscore(ratio, modo, janela)['Z-Score'].iloc[-1], rel=1e-7)
+
+
+def test_motor_amostra_completa_avalia_sem_alterar_estado(ratio):
+    motor = motor_de_serie(ratio, AMOSTRA_COMPLETA)
+    n = motor.n
+    assert motor.zscore(float(ratio.iloc[-1])) == pytest.approx(calcular_zscore(ratio)['Z-Score'].iloc[-1], rel=1e-7)
+    assert motor.n == n
+
+
+def test_zscores_janelas_ignora_lacunas_como_calcular_zscore(ratio):
+    ratio = ratio.copy()
+    ratio.iloc[[30, 31, 200]] = np.nan
+    janelas = [10, 60]
+    z = zscores_janelas(ratio, janelas)
+    for coluna, janela in enumerate(janelas):
+        esperado = calcular_zscore(ratio, JANELA_MOVEL, janela)['Z-Score'].reindex(ratio.index)
+        np.testing.assert_allclose(z[:, coluna], esperado.to_numpy(), rtol=1e-6, atol=1e-9, equal_nan=True)
+    # Uma lacuna não contamina as janelas seguintes
+    assert np.isfinite(z[-1]).all()
+
+
+def test_calcular_zscore_descarta_nan():
+    ratio = pd.Series([1.0, np.nan, 2.0, 3.0], index=pd.bdate_range('2024-01-01', periods=4))
+    assert list(calcular_zscore(ratio).index) == list(ratio.dropna().index)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dados import baixar_lote
+from provedores import ProvedorGravado, ProvedorSintetico, _ProvedorLocal, gravar_fixtures
+from replay import reproduzir
+
+
+def test_sintetico_independe_da_data_final():
+    curto = ProvedorSintetico(fim='2023-12-29').barras('AAAA3.SA')
+    longo = ProvedorSintetico(fim='2024-06-28').barras('AAAA3.SA')
+    pd.testing.assert_frame_equal(curto, longo.loc[:curto.index[-1]])
+
+
+def test_sintetico_recorta_periodo_como_o_yfinance(provedor):
+    dados = provedor.download(['AAAA3.SA', 'BBBB3.SA'], period='1mo', interval='1d')
+    assert isinstance(dados.columns, pd.MultiIndex)
+    assert set(dados.columns.get_level_values(0)) == {'AAAA3.SA', 'BBBB3.SA'}
+    assert dados.index[-1] == pd.Timestamp('2024-06-28')
+    assert dados.index[0] > pd.Timestamp('2024-05-28')
+
+
+def test_fixtures_gravadas_reproduzem_o_provedor(provedor, tmp_path):
+    simbolos = ['AAAA3.SA', 'USO']
+    gravar_fixtures(simbolos, str(tmp_path), provedor=provedor, periodos={'1d': 'max', '5m': '60d'})
+    gravado = ProvedorGravado(str(tmp_path))
+    for intervalo, periodo in (('1d', 'max'), ('5m', '60d')):
+        originais = baixar_lote(simbolos, periodo=periodo, intervalo=intervalo, provedor=provedor)
+        lidos = baixar_lote(simbolos, periodo=periodo, intervalo=intervalo, provedor=gravado)
+        for simbolo in simbolos:
+            np.testing.assert_allclose(lidos[simbolo]['Close'], originais[simbolo]['Close'], rtol=1e-12)
+            assert (lidos[simbolo].index == originais[simbolo].index).all()
+    assert baixar_lote(['ZZZZ3.SA'], provedor=gravado) == {'ZZZZ3.SA': None}
+
+
+def test_replay_deterministico(provedor):
+    argumentos = dict(inicio='2024-03-01', fim='2024-06-28', metodo='Janela móvel', janela=20, limite=1.0)
+    primeiro, estatisticas = reproduzir([('AAAA3.SA', 'AAAA4.SA')], provedor, **argumentos)
+    segundo, _ = reproduzir([('AAAA3.SA', 'AAAA4.SA')], ProvedorSintetico(fim='2024-06-28'), **argumentos)
+    assert estatisticas['barras'] == len(pd.bdate_range('2024-03-01', '2024-06-28'))
+    assert not primeiro.empty
+    pd.testing.assert_frame_equal(primeiro, segundo)
+
+
+def test_provedor_local_exige_barras():
+    with pytest.raises(TypeError):
+        _ProvedorLocal()
@@ -0,0 +1,36 @@
+import threading
+import time
+
+from servico_dados import BaldeTokens
+
+
+def test_balde_lote_grande_nao_bloqueia_as_outras_sessoes():
+    # Balde cheio de novo a cada 0,2 s
+    balde = BaldeTokens(capacidade=10, taxa=50)
+    resultados = {}
+
+    def lote():
+        resultados['lote'] = balde.consumir(30, timeout=1.0)
+
+    inicio = time.monotonic()
+    thread = threading.Thread(target=lote)
+    thread.start()
+    time.sleep(0.05)
+    # Outra sessão pede um símbolo enquanto o lote espera a segunda parte
+    resultados['unico'] = balde.consumir(1, timeout=0.1)
+    resultados['espera_unico'] = time.monotonic() - inicio
+    thread.join()
+
+    assert resultados['unico'] and resultados['lote']
+    assert resultados['espera_unico'] < 0.2
+    # O lote inteiro é cobrado: duas recargas completas além do balde inicial
+    assert time.monotonic() - inicio >= 0.35
+    assert balde._tokens >= 0.0
+
+
+def test_balde_recusa_sem_orcamento():
+    balde = BaldeTokens(capacidade=5, taxa=1)
+    assert balde.consumir(5, timeout=0)
+    assert not balde.consumir(1, timeout=0.1)
+    # Sem reposição, um lote acima da capacidade nunca é atendido
+    assert not BaldeTokens(capacidade=5, taxa=0).consumir(6, timeout=0.1)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paineis import montar_matriz_fechamentos
+from varredura import estatisticas_pares, preselecionar_pares, varrer_pares
+
+SIMBOLOS = ['AAAA3.SA', 'AAAA4.SA', 'BBBB3.SA', 'BBBB4.SA', 'CCCC3.SA', 'USO']
+
+
+@pytest.fixture
+def matriz(provedor):
+    series = {s: provedor.barras(s).iloc[-300:] for s in SIMBOLOS}
+    # Lacunas como as de calendários diferentes e de um ativo listado depois
+    series['USO'] = series['USO'].drop(series['USO'].index[[10, 50, 51]])
+    series['CCCC3.SA'] = series['CCCC3.SA'].iloc[100:]
+    return montar_matriz_fechamentos(series)
+
+
+def _estatisticas_par(matriz, a, b):
+    """Mesmas estatísticas calculadas par a par, só nas datas em que os dois têm preço."""
+    log_ratio = np.log(matriz[a] / matriz[b]).dropna()
+    ultimos = matriz.ffill().iloc[-1]
+    atual = np.log(ultimos[a] / ultimos[b])
+    desvio = log_ratio.std(ddof=0)
+    return len(log_ratio), log_ratio.mean(), desvio, (atual - log_ratio.mean()) / desvio
+
+
+def test_estatisticas_pares_igual_ao_laco_por_par(matriz):
+    n_obs, media, desvio, z_score = estatisticas_pares(matriz)
+    for i, a in enumerate(matriz.columns):
+        for j, b in enumerate(matriz.columns):
+            if i == j:
+                continue
+            n, m, d, z = _estatisticas_par(matriz, a, b)
+            assert n_obs[i, j] == n
+            assert media[i, j] == pytest.approx(m, abs=1e-10)
+            assert desvio[i, j] == pytest.approx(d, rel=1e-8)
+            assert z_score[i, j] == pytest.approx(z, rel=1e-7)
+
+
+def test_varrer_pares_com_lista_igual_ao_universo_filtrado(matriz):
+    todos = varrer_pares(matriz, limite_zscore=0.0)
+    pares = list(zip(todos['Ação 1'], todos['Ação 2']))[::2]
+    escolhidos = varrer_pares(matriz, limite_zscore=0.0, pares=pares)
+    esperado = todos.set_index(['Ação 1', 'Ação 2']).loc[pares].reset_index()
+    pd.testing.assert_frame_equal(
+        escolhidos.sort_values(['Ação 1', 'Ação 2']).reset_index(drop=True),
+        esperado.sort_values(['Ação 1', 'Ação 2']).reset_index(drop=True),
+    )
+
+
+def test_preselecao_junta_simbolos_do_mesmo_grupo(matriz):
+    candidatos = preselecionar_pares(matriz, correlacao_minima=0.5)
+    pares = set(zip(candidatos['Ação 1'], candidatos['Ação 2']))
+    # O provedor sintético correlaciona as classes de ação do mesmo emissor
+    assert ('AAAA3.SA', 'AAAA4.SA') in pares
+    assert ('BBBB3.SA', 'BBBB4.SA') in pares
+    assert not any('USO' in par for par in pares)
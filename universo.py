@@ -0,0 +1,40 @@
+"""Universo de ações (por setor) e commodities de referência, lido de um arquivo JSON.
+
+O arquivo tem as chaves 'acoes' ({categoria: [símbolos]}), 'commodities'
+({símbolo: descrição}) e, opcionalmente, 'categoria_padrao'. O caminho padrão é o
+`universo.json` ao lado deste módulo, ou o da variável de ambiente ARBITRAGEM_UNIVERSO.
+"""
+import json
+import os
+
+CAMINHO_PADRAO = os.environ.get(
+    'ARBITRAGEM_UNIVERSO', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'universo.json')
+)
+
+
+def carregar_universo(caminho=None):
+    """Lê e valida o arquivo do universo; devolve {'acoes', 'commodities', 'categoria_padrao'}.
+
+    Levanta ValueError se faltar alguma seção ou se ela estiver vazia.
+    """
+    with open(caminho or CAMINHO_PADRAO, encoding='utf-8') as arquivo:
+        configuracao = json.load(arquivo)
+    acoes = {
+        str(categoria): list(dict.fromkeys(str(s).strip().upper() for s in simbolos if str(s).strip()))
+        for categoria, simbolos in (configuracao.get('acoes') or {}).items()
+    }
+    acoes = {categoria: simbolos for categoria, simbolos in acoes.items() if simbolos}
+    commodities = {str(s).strip().upper(): str(descricao) for s, descricao in (configuracao.get('commodities') or {}).items()}
+    if not acoes:
+        raise ValueError("Universo sem ações: informe ao menos uma categoria em 'acoes'.")
+    if not commodities:
+        raise ValueError("Universo sem commodities: informe ao menos um símbolo em 'commodities'.")
+    categoria_padrao = configuracao.get('categoria_padrao')
+    if categoria_padrao not in acoes:
+        categoria_padrao = next(iter(acoes))
+    return {'acoes': acoes, 'commodities': commodities, 'categoria_padrao': categoria_padrao}
+
+
+def simbolos_acoes(universo):
+    """Todas as ações do universo, sem repetição e em ordem alfabética."""
+    return tuple(sorted({s for simbolos in universo['acoes'].values() for s in simbolos}))
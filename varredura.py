@@ -0,0 +1,156 @@
+"""Scanner de todos os pares do universo com estatísticas de log-ratio vetorizadas.
+
+O espaço de pares é O(N²): as ~90 ações do `universo.json` já dão uns 4 mil pares, e um
+universo de centenas de ações dá dezenas de milhares. A pré-seleção calcula a correlação dos
+retornos de todos os pares de uma vez, agrupa os símbolos por essa correlação e só propõe
+pares do mesmo grupo, então as estatísticas caras (como a cointegração) rodam só nos candidatos.
+"""
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import squareform
+
+# Correlação mínima dos retornos para um par ser candidato
+CORRELACAO_MINIMA = 0.5
+
+
+def estatisticas_pares(matriz):
+    """Calcula média, desvio e z-score atual do log-ratio de todos os pares de uma vez.
+
+    Devolve matrizes N x N (n_obs, média, desvio, z-score) onde o elemento [i, j] se refere
+    ao log(P_i / P_j). As somas por par vêm de produtos matriciais sobre a máscara de
+    disponibilidade, então o custo é O(N² T) em BLAS, sem laço Python sobre os pares.
+    """
+    log_precos = np.log(matriz.to_numpy(dtype=np.float64))
+    mascara = np.isfinite(log_precos).astype(np.float64)
+    # Centraliza cada coluna para evitar cancelamento numérico em E[x²] - E[x]²
+    centro = np.nanmean(log_precos, axis=0)
+    centro = np.where(np.isfinite(centro), centro, 0.0)
+    soma = np.where(mascara > 0, log_precos - centro, 0.0)
+    quadrados = soma * soma
+
+    # Somatórios apenas nas datas em que os dois símbolos do par têm preço
+    n_obs = mascara.T @ mascara
+    soma_cruzada = soma.T @ mascara  # [i, j] = soma de log P_i onde j também existe
+    soma_pares = soma_cruzada - soma_cruzada.T
+    soma_quadrados = quadrados.T @ mascara + mascara.T @ quadrados - 2.0 * (soma.T @ soma)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media_centrada = soma_pares / n_obs
+        # Desvio populacional (ddof=0), como o scipy.stats.zscore usado no dashboard
+        variancia = np.maximum(soma_quadrados / n_obs - media_centrada * media_centrada, 0.0)
+        desvio = np.sqrt(variancia)
+        # Último preço disponível de cada símbolo (calendários de mercados diferentes)
+        ultimo = np.log(matriz.ffill().iloc[-1].to_numpy(dtype=np.float64)) - centro
+        log_ratio_atual = ultimo[:, None] - ultimo[None, :]
+        z_score = (log_ratio_atual - media_centrada) / desvio
+    media = media_centrada + (centro[:, None] - centro[None, :])
+    return n_obs, media, desvio, z_score
+
+
+def correlacao_retornos(matriz, min_observacoes=20):
+    """Correlação dos retornos log de todos os pares (DataFrame N x N), cada par nas datas comuns.
+
+    Mesma técnica de `estatisticas_pares`: os somatórios por par são produtos matriciais
+    sobre a máscara de disponibilidade. Pares com menos de `min_observacoes` ficam NaN.
+    """
+    retornos = np.diff(np.log(matriz.to_numpy(dtype=np.float64)), axis=0)
+    mascara = np.isfinite(retornos).astype(np.float64)
+    x = np.where(mascara > 0, retornos, 0.0)
+
+    n_obs = mascara.T @ mascara
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = (x.T @ mascara) / n_obs  # [i, j] = média de r_i onde j também existe
+        covariancia = (x.T @ x) / n_obs - media * media.T
+        variancia = np.maximum(((x * x).T @ mascara) / n_obs - media * media, 0.0)
+        correlacao = np.clip(covariancia / np.sqrt(variancia * variancia.T), -1.0, 1.0)
+    correlacao[n_obs < min_observacoes] = np.nan
+    np.fill_diagonal(correlacao, 1.0)
+    return pd.DataFrame(correlacao, index=matriz.columns, columns=matriz.columns)
+
+
+def agrupar_por_correlacao(correlacao, correlacao_minima=CORRELACAO_MINIMA):
+    """Rótulo de grupo de cada símbolo (agrupamento hierárquico por ligação média).
+
+    A distância é √(2(1 - ρ)) e a árvore é cortada na distância equivalente a
+    `correlacao_minima`; pares sem correlação calculada contam como ρ = 0.
+    """
+    n = correlacao.shape[0]
+    if n < 2:
+        return np.ones(n, dtype=int)
+    valores = np.nan_to_num(correlacao.to_numpy(dtype=np.float64), nan=0.0)
+    distancia = np.sqrt(np.maximum(2.0 * (1.0 - (valores + valores.T) / 2.0), 0.0))
+    np.fill_diagonal(distancia, 0.0)
+    arvore = linkage(squareform(distancia, checks=False), method='average')
+    return fcluster(arvore, t=np.sqrt(2.0 * (1.0 - correlacao_minima)), criterion='distance')
+
+
+def preselecionar_pares(matriz, correlacao_minima=CORRELACAO_MINIMA, min_observacoes=20):
+    """Pares candidatos: mesmo grupo de correlação e ρ dos retornos >= `correlacao_minima`.
+
+    Devolve DataFrame 'Ação 1', 'Ação 2', 'Correlação', 'Grupo' ordenado pela correlação,
+    com cada par na ordem das colunas da matriz (como em `varrer_pares`).
+    """
+    colunas = ['Ação 1', 'Ação 2', 'Correlação', 'Grupo']
+    if matriz.empty or matriz.shape[1] < 2:
+        return pd.DataFrame(columns=colunas)
+
+    correlacao = correlacao_retornos(matriz, min_observacoes)
+    grupos = agrupar_por_correlacao(correlacao, correlacao_minima)
+    i, j = np.triu_indices(matriz.shape[1], k=1)
+    rho = correlacao.to_numpy()[i, j]
+    with np.errstate(invalid='ignore'):
+        selecionados = (grupos[i] == grupos[j]) & (rho >= correlacao_minima)
+    i, j, rho = i[selecionados], j[selecionados], rho[selecionados]
+    ordem = np.argsort(-rho, kind='stable')
+    simbolos = np.asarray(matriz.columns)
+    return pd.DataFrame({
+        'Ação 1': simbolos[i[ordem]],
+        'Ação 2': simbolos[j[ordem]],
+        'Correlação': rho[ordem],
+        'Grupo': grupos[i[ordem]],
+    }, columns=colunas)
+
+
+def varrer_pares(matriz, limite_zscore=1.0, min_observacoes=20, pares=None):
+    """Devolve a tabela de pares com |z-score| acima do limite, ordenada pelo desvio.
+
+    Considera cada par uma única vez (i < j), já que o z-score do log-ratio é antissimétrico.
+    Com `pares` [(ação 1, ação 2), ...] (ex.: os pré-selecionados), avalia só esses.
+    """
+    colunas = ['Ação 1', 'Ação 2', 'Ratio Atual', 'Média Log-Ratio', 'Desvio Log-Ratio', 'Z-Score', 'Sinal']
+    if matriz.empty or matriz.shape[1] < 2:
+        return pd.DataFrame(columns=colunas)
+
+    n_obs, media, desvio, z_score = estatisticas_pares(matriz)
+    if pares is None:
+        i, j = np.triu_indices(matriz.shape[1], k=1)
+    else:
+        posicoes = {s: k for k, s in enumerate(matriz.columns)}
+        indices = np.array(
+            [(posicoes[a], posicoes[b]) for a, b in pares if a in posicoes and b in posicoes], dtype=np.intp
+        ).reshape(-1, 2)
+        i, j = indices[:, 0], indices[:, 1]
+    z = z_score[i, j]
+    validos = (n_obs[i, j] >= min_observacoes) & np.isfinite(z) & (desvio[i, j] > 0)
+    selecionados = validos & (np.abs(z) > limite_zscore)
+    i, j, z = i[selecionados], j[selecionados], z[selecionados]
+    ordem = np.argsort(-np.abs(z), kind='stable')
+    i, j, z = i[ordem], j[ordem], z[ordem]
+
+    simbolos = np.asarray(matriz.columns)
+    ultimo = matriz.ffill().iloc[-1].to_numpy(dtype=np.float64)
+    # Mesmo texto de sinal do dashboard (laço apenas sobre as linhas do resultado)
+    sinal = [
+        f"Vender {a} / Comprar {b}" if valor > 0 else f"Comprar {a} / Vender {b}"
+        for a, b, valor in zip(simbolos[i], simbolos[j], z)
+    ]
+    return pd.DataFrame({
+        'Ação 1': simbolos[i],
+        'Ação 2': simbolos[j],
+        'Ratio Atual': ultimo[i] / ultimo[j],
+        'Média Log-Ratio': media[i, j],
+        'Desvio Log-Ratio': desvio[i, j],
+        'Z-Score': z,
+        'Sinal': sinal,
+    }, columns=colunas)